@@ -0,0 +1,170 @@
+# admission.py
+"""
+Admission control: a sandbox starts only while the host has memory and CPU for it.
+
+A sandbox may use up to its memory limit (docker --memory with the same
+--memory-swap; its tmpfs work directory is charged to that cgroup too), so a
+burst of runs at the default 1024 MB can promise more memory than the host
+has. The host OOM killer then picks a victim, instead of the sandbox's own
+cgroup producing a clean Memory Limit Exceeded. An AdmissionController books
+each sandbox's memory limit and CPUs against a host budget before the sandbox
+starts and returns them once the sandbox is removed (the reaper reports that;
+until then its tmpfs may still hold memory):
+
+    admission = AdmissionController(memory_budget_mb=28 * 1024, cpu_budget=8)
+    results = execute_batch(language="c++", code=src, inputs=tests, admission=admission)
+
+Requests that do not fit wait in arrival order, so a large one is not starved
+by smaller ones behind it. A request is rejected with a "Judge busy: ..."
+error (verdict BUSY) when it is larger than the whole budget, when max_queue
+requests are already waiting, or when it has waited max_wait_s.
+"""
+import os
+import threading
+import time
+from collections import deque
+
+from metrics import get_registry
+
+# share of the host's memory the sandboxes may book by default; the rest is for the host
+DEFAULT_MEMORY_FRACTION = 0.8
+
+
+def host_memory_mb():
+    """Total memory of the host in MB (MemTotal)."""
+    try:
+        with open("/proc/meminfo") as f:
+            for line in f:
+                if line.startswith("MemTotal:"):
+                    return int(line.split()[1]) // 1024
+    except OSError:
+        pass
+    return os.sysconf("SC_PAGE_SIZE") * os.sysconf("SC_PHYS_PAGES") // (1024 * 1024)
+
+
+class Reservation:
+    """Memory and CPUs booked for one sandbox; give it back with AdmissionController.release."""
+
+    def __init__(self, memory_mb, cpus):
+        self.memory_mb = memory_mb
+        self.cpus = cpus
+        self.released = False
+
+
+class AdmissionController:
+    """
+    Books memory_mb and cpus per sandbox against memory_budget_mb (default: DEFAULT_MEMORY_FRACTION
+    of the host's memory) and cpu_budget (default: the cores this process may use).
+    acquire() waits for room up to max_wait_s, behind at most max_queue earlier requests
+    (None: no limit). stats reports bookings, utilization and rejections for sizing machines;
+    admissions and rejections are also counted in judge_admission_total{outcome} and waits
+    observed in judge_admission_wait_seconds.
+    """
+
+    def __init__(self, memory_budget_mb=None, cpu_budget=None, max_queue=None, max_wait_s=30.0):
+        if memory_budget_mb is None:
+            memory_budget_mb = int(host_memory_mb() * DEFAULT_MEMORY_FRACTION)
+        if cpu_budget is None:
+            cpu_budget = len(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else os.cpu_count() or 1
+        self.memory_budget_mb = memory_budget_mb
+        self.cpu_budget = cpu_budget
+        self.max_queue = max_queue
+        self.max_wait_s = max_wait_s
+        self._cond = threading.Condition()
+        self._waiters = deque()
+        self._memory_mb = 0
+        self._cpus = 0
+        self._in_flight = 0
+        self._peak_memory_mb = 0
+        self._waited = 0
+        self._wait_total_s = 0.0
+        self._wait_max_s = 0.0
+        self._counts = {"admitted": 0, "too_large": 0, "queue_full": 0, "timeout": 0}
+
+    def acquire(self, memory_mb, cpus=1, timeout=None):
+        """
+        Book memory_mb and cpus for a sandbox, waiting up to timeout (default max_wait_s).
+        Returns (Reservation, None), or (None, "Judge busy: ...") if it was not admitted.
+        """
+        timeout = self.max_wait_s if timeout is None else timeout
+        started = time.monotonic()
+        with self._cond:
+            if memory_mb > self.memory_budget_mb or cpus > self.cpu_budget:
+                return self._reject("too_large", f"Judge busy: {memory_mb} MB / {cpus} CPU exceeds the host budget "
+                                                 f"of {self.memory_budget_mb} MB / {self.cpu_budget} CPU")
+            if not self._waiters and self._fits(memory_mb, cpus):
+                return self._admit(memory_mb, cpus, 0.0), None
+            if self.max_queue is not None and len(self._waiters) >= self.max_queue:
+                return self._reject("queue_full", f"Judge busy: {len(self._waiters)} sandboxes already waiting "
+                                                  f"for memory or CPU")
+            ticket = object()
+            self._waiters.append(ticket)
+            try:
+                deadline = started + timeout
+                while self._waiters[0] is not ticket or not self._fits(memory_mb, cpus):
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        return self._reject("timeout", f"Judge busy: no room for {memory_mb} MB within {timeout} s "
+                                                       f"({self._memory_mb} of {self.memory_budget_mb} MB booked)")
+                    self._cond.wait(remaining)
+                return self._admit(memory_mb, cpus, time.monotonic() - started), None
+            finally:
+                self._waiters.remove(ticket)
+                # the next waiter may fit now
+                self._cond.notify_all()
+
+    def release(self, reservation):
+        """Give a reservation back; releasing twice is a no-op."""
+        with self._cond:
+            if reservation.released:
+                return
+            reservation.released = True
+            self._memory_mb -= reservation.memory_mb
+            self._cpus -= reservation.cpus
+            self._in_flight -= 1
+            self._cond.notify_all()
+
+    @property
+    def stats(self):
+        with self._cond:
+            return dict(
+                self._counts,
+                rejected=self._counts["too_large"] + self._counts["queue_full"] + self._counts["timeout"],
+                in_flight=self._in_flight,
+                waiting=len(self._waiters),
+                memory_budget_mb=self.memory_budget_mb,
+                memory_booked_mb=self._memory_mb,
+                memory_peak_mb=self._peak_memory_mb,
+                memory_utilization=self._memory_mb / self.memory_budget_mb if self.memory_budget_mb else 0.0,
+                cpu_budget=self.cpu_budget,
+                cpus_booked=self._cpus,
+                cpu_utilization=self._cpus / self.cpu_budget if self.cpu_budget else 0.0,
+                waited=self._waited,
+                wait_avg_s=self._wait_total_s / self._waited if self._waited else 0.0,
+                wait_max_s=self._wait_max_s,
+            )
+
+    # internals (the caller holds the lock)
+
+    def _fits(self, memory_mb, cpus):
+        return self._memory_mb + memory_mb <= self.memory_budget_mb and self._cpus + cpus <= self.cpu_budget
+
+    def _admit(self, memory_mb, cpus, waited_s):
+        self._memory_mb += memory_mb
+        self._cpus += cpus
+        self._in_flight += 1
+        self._peak_memory_mb = max(self._peak_memory_mb, self._memory_mb)
+        self._counts["admitted"] += 1
+        if waited_s:
+            self._waited += 1
+            self._wait_total_s += waited_s
+            self._wait_max_s = max(self._wait_max_s, waited_s)
+        registry = get_registry()
+        registry.inc("judge_admission_total", {"outcome": "admitted"})
+        registry.observe("judge_admission_wait_seconds", waited_s)
+        return Reservation(memory_mb, cpus)
+
+    def _reject(self, reason, message):
+        self._counts[reason] += 1
+        get_registry().inc("judge_admission_total", {"outcome": reason})
+        return None, message
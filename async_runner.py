@@ -0,0 +1,441 @@
+# async_runner.py
+import asyncio
+import io
+import json
+import os
+import struct
+import tarfile
+import time
+import traceback
+import urllib.parse
+import uuid
+import weakref
+
+from docker_backend import (CliBackend, EngineApiBackend, ExecResult, DockerError, OutputCapture, EXIT_CODE_WAIT_S,
+                            get_backend, _api_error)
+from image_manager import get_image_manager
+from languages import get_language
+from reaper import container_labels, get_reaper
+from one import (IMAGE_NAME, WORKDIR, OUTPUT_LIMIT_BYTES, CHECKER_MODES,
+                 _new_result, _normalize_stdin, _compile_command, _run_main, _run_argv,
+                 _host_timeout, _new_marker, _fill_run_result, _close_output, _apply_checker, _make_checks, _decode)
+
+
+def _iter_tar(files, chunk_size=1 << 16):
+    """
+    Yield a tar stream for files (same entries as one.upload_files) in chunks, reading
+    file data lazily so large inputs are never held in memory as a whole.
+    """
+    for entry in files:
+        name, data = entry[0], entry[1]
+        mode = entry[2] if len(entry) > 2 else 0o644
+        opened = None
+        if isinstance(data, str):
+            data = data.encode("utf-8")
+        if isinstance(data, bytes):
+            size, src = len(data), io.BytesIO(data)
+        elif isinstance(data, os.PathLike):
+            src = opened = open(data, "rb")
+            size = os.fstat(src.fileno()).st_size
+        else:
+            start = data.tell()
+            size = data.seek(0, io.SEEK_END) - start
+            data.seek(start)
+            src = data
+        try:
+            info = tarfile.TarInfo(name)
+            info.size = size
+            info.mode = mode
+            info.mtime = int(time.time())
+            yield info.tobuf(tarfile.DEFAULT_FORMAT, "utf-8", "surrogateescape")
+            remaining = size
+            while remaining:
+                chunk = src.read(min(chunk_size, remaining))
+                if not chunk:
+                    raise OSError(f"{name} shrank while uploading")
+                remaining -= len(chunk)
+                yield chunk
+            if size % tarfile.BLOCKSIZE:
+                yield tarfile.NUL * (tarfile.BLOCKSIZE - size % tarfile.BLOCKSIZE)
+        finally:
+            if opened is not None:
+                opened.close()
+    yield tarfile.NUL * (2 * tarfile.BLOCKSIZE)
+
+
+class AsyncCliBackend:
+    """
+    docker CLI driven through asyncio subprocesses; a cancelled call kills its CLI process.
+    sync is the blocking backend for the same daemon, used off the event loop for image
+    checks and container removal.
+    """
+
+    name = "cli"
+
+    def __init__(self, sync=None):
+        self.sync = sync or CliBackend()
+
+    async def _run(self, argv, stdin=None, output_limit=None):
+        proc = await asyncio.create_subprocess_exec(
+            *argv, stdin=asyncio.subprocess.PIPE if stdin is not None else asyncio.subprocess.DEVNULL,
+            stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE)
+
+        async def feed():
+            if stdin is None:
+                return
+            try:
+                for chunk in ([stdin] if isinstance(stdin, bytes) else stdin):
+                    proc.stdin.write(chunk)
+                    await proc.stdin.drain()
+                proc.stdin.close()
+            except (BrokenPipeError, ConnectionResetError):
+                pass
+
+        captures = (OutputCapture(output_limit), OutputCapture(output_limit))
+
+        async def drain(stream, capture):
+            while True:
+                chunk = await stream.read(65536)
+                if not chunk:
+                    return
+                if not capture.write(chunk):
+                    proc.kill()
+                    return
+
+        try:
+            await asyncio.gather(feed(), drain(proc.stdout, captures[0]), drain(proc.stderr, captures[1]))
+            await proc.wait()
+        except BaseException:
+            if proc.returncode is None:
+                proc.kill()
+            raise
+        exceeded = any(c.exceeded for c in captures)
+        return ExecResult(None if exceeded else proc.returncode, captures[0].value(), captures[1].value(),
+                          exceeded)
+
+    async def image_exists(self, image_name):
+        return (await self._run(["docker", "image", "inspect", image_name])).exit_code == 0
+
+    async def run_container(self, name, image_name, cmd, memory_limit_mb, tmpfs=None, labels=None):
+        run_cmd = ["docker", "run", "--name", name,
+                   "--memory", f"{memory_limit_mb}m", "--memory-swap", f"{memory_limit_mb}m"]
+        for path, options in (tmpfs or {}).items():
+            run_cmd += ["--tmpfs", f"{path}:{options}"]
+        for key, value in (labels or {}).items():
+            run_cmd += ["--label", f"{key}={value}"]
+        p = await self._run(run_cmd + ["-d", image_name] + list(cmd))
+        if p.exit_code != 0:
+            return None, f"Failed to start container: {_decode(p.stderr).strip() or _decode(p.stdout).strip()}"
+        return _decode(p.stdout).strip(), None
+
+    async def remove_container(self, container):
+        await self._run(["docker", "rm", "-f", container])
+
+    async def exec(self, container, cmd, stdin=None, output_limit=None):
+        """stdin may be None, bytes, or an iterable of byte chunks. See CliBackend.exec for output_limit."""
+        argv = ["docker", "exec"] + (["-i"] if stdin is not None else []) + [container] + list(cmd)
+        return await self._run(argv, stdin, output_limit)
+
+
+class AsyncEngineApiBackend:
+    """
+    Engine API over the unix socket with asyncio streams (one short connection per request).
+    sync is as in AsyncCliBackend.
+    """
+
+    name = "api"
+
+    def __init__(self, socket_path, sync=None):
+        self.socket_path = socket_path
+        self.sync = sync or EngineApiBackend(socket_path)
+
+    async def _open(self, method, path, body=b"", query=None, headers=None):
+        if query:
+            path = f"{path}?{urllib.parse.urlencode(query)}"
+        headers = dict(headers or {})
+        if isinstance(body, (dict, list)):
+            body = json.dumps(body).encode("utf-8")
+            headers.setdefault("Content-Type", "application/json")
+        headers.setdefault("Connection", "close")
+        reader, writer = await asyncio.open_unix_connection(self.socket_path)
+        head = f"{method} {path} HTTP/1.1\r\nHost: docker\r\nContent-Length: {len(body)}\r\n"
+        head += "".join(f"{k}: {v}\r\n" for k, v in headers.items())
+        writer.write(head.encode("ascii") + b"\r\n" + body)
+        await writer.drain()
+        raw = await reader.readuntil(b"\r\n\r\n")
+        lines = raw.decode("latin-1").split("\r\n")
+        status = int(lines[0].split(" ", 2)[1])
+        resp_headers = {k.strip().lower(): v.strip() for k, _, v in (l.partition(":") for l in lines[1:] if l)}
+        return status, resp_headers, reader, writer
+
+    async def _request(self, method, path, body=b"", query=None):
+        status, headers, reader, writer = await self._open(method, path, body, query)
+        try:
+            if headers.get("transfer-encoding", "").lower() == "chunked":
+                data = b""
+                while True:
+                    size = int((await reader.readline()).split(b";")[0], 16)
+                    if size == 0:
+                        break
+                    data += await reader.readexactly(size)
+                    await reader.readline()
+            elif "content-length" in headers:
+                data = await reader.readexactly(int(headers["content-length"]))
+            else:
+                data = await reader.read()
+        finally:
+            writer.close()
+        return status, data
+
+    async def _json(self, method, path, body=b"", query=None):
+        status, data = await self._request(method, path, body, query)
+        if status >= 300:
+            raise DockerError(_api_error(status, data))
+        return json.loads(data) if data else None
+
+    async def image_exists(self, image_name):
+        status, _ = await self._request("GET", f"/images/{urllib.parse.quote(image_name, safe='/:@')}/json")
+        return status == 200
+
+    async def run_container(self, name, image_name, cmd, memory_limit_mb, tmpfs=None, labels=None):
+        config = {
+            "Image": image_name,
+            "Cmd": list(cmd),
+            "HostConfig": {
+                "Memory": memory_limit_mb * 1024 * 1024,
+                "MemorySwap": memory_limit_mb * 1024 * 1024,
+                "Tmpfs": dict(tmpfs or {}),
+            },
+        }
+        if labels:
+            config["Labels"] = dict(labels)
+        try:
+            created = await self._json("POST", "/containers/create", config, {"name": name})
+            status, data = await self._request("POST", f"/containers/{created['Id']}/start")
+            if status not in (204, 304):
+                return None, f"Failed to start container: {_api_error(status, data)}"
+        except (OSError, DockerError) as e:
+            return None, f"Failed to start container: {e}"
+        return created["Id"], None
+
+    async def remove_container(self, container):
+        try:
+            await self._request("DELETE", f"/containers/{container}", query={"force": "1", "v": "1"})
+        except OSError:
+            pass
+
+    async def exec(self, container, cmd, stdin=None, output_limit=None):
+        """stdin may be None, bytes, or an iterable of byte chunks. See CliBackend.exec for output_limit."""
+        created = await self._json("POST", f"/containers/{container}/exec", {
+            "AttachStdin": stdin is not None, "AttachStdout": True, "AttachStderr": True,
+            "Tty": False, "Cmd": list(cmd),
+        })
+        exec_id = created["Id"]
+        status, _, reader, writer = await self._open(
+            "POST", f"/exec/{exec_id}/start", {"Detach": False, "Tty": False},
+            headers={"Connection": "Upgrade", "Upgrade": "tcp"})
+        try:
+            if status not in (101, 200):
+                raise DockerError(f"exec start failed with HTTP {status}")
+            if stdin is not None:
+                try:
+                    for chunk in ([stdin] if isinstance(stdin, bytes) else stdin):
+                        writer.write(chunk)
+                        await writer.drain()
+                    writer.write_eof()
+                except (BrokenPipeError, ConnectionResetError):
+                    pass
+            captures = (OutputCapture(output_limit), OutputCapture(output_limit))
+            while True:
+                try:
+                    header = await reader.readexactly(8)
+                    stream_id, size = struct.unpack(">BxxxL", header)
+                    payload = await reader.readexactly(size)
+                except asyncio.IncompleteReadError:
+                    break
+                if stream_id in (1, 2) and not captures[stream_id - 1].write(payload):
+                    break
+        finally:
+            writer.close()
+        if any(c.exceeded for c in captures):
+            return ExecResult(None, captures[0].value(), captures[1].value(), True)
+        # the exit code can lag the end of the stream by a moment
+        limit = time.monotonic() + EXIT_CODE_WAIT_S
+        delay = 0.005
+        while True:
+            info = await self._json("GET", f"/exec/{exec_id}/json")
+            if not info.get("Running") and info.get("ExitCode") is not None:
+                break
+            if time.monotonic() >= limit:
+                raise DockerError(f"exec {exec_id[:12]} still running after its output ended")
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, 0.1)
+        return ExecResult(info["ExitCode"], captures[0].value(), captures[1].value())
+
+
+def get_async_backend():
+    """Async counterpart of docker_backend.get_backend() (API if the sync default is API)."""
+    backend = get_backend()
+    if isinstance(backend, EngineApiBackend):
+        return AsyncEngineApiBackend(backend.socket_path, sync=backend)
+    return AsyncCliBackend(sync=backend)
+
+
+class ContainerLimiter:
+    """
+    Semaphore-style cap on sandbox containers alive at once across concurrent
+    execute_code_async calls. Exposes in_flight and waiting for monitoring.
+    A slot taken with acquire() is freed by release(), or from another thread (the reaper's,
+    once the container is removed) by the callable release_threadsafe(loop) returns.
+    """
+
+    def __init__(self, max_containers):
+        self.max_containers = max_containers
+        self.in_flight = 0
+        self.waiting = 0
+        self._sem = asyncio.Semaphore(max_containers)
+
+    async def acquire(self):
+        self.waiting += 1
+        try:
+            await self._sem.acquire()
+        finally:
+            self.waiting -= 1
+        self.in_flight += 1
+
+    def release(self):
+        self.in_flight -= 1
+        self._sem.release()
+
+    def release_threadsafe(self, loop):
+        return lambda: loop.call_soon_threadsafe(self.release)
+
+    async def __aenter__(self):
+        await self.acquire()
+        return self
+
+    async def __aexit__(self, *exc):
+        self.release()
+
+
+DEFAULT_MAX_CONTAINERS = os.cpu_count() or 4
+
+# one default limiter per event loop (a semaphore cannot be shared between loops)
+_default_limiters = weakref.WeakKeyDictionary()
+
+
+def default_limiter():
+    loop = asyncio.get_running_loop()
+    if loop not in _default_limiters:
+        _default_limiters[loop] = ContainerLimiter(DEFAULT_MAX_CONTAINERS)
+    return _default_limiters[loop]
+
+
+async def execute_code_async(language='python',
+                             code='print("this is test code\\nsubmit ur own code, this is the default code")',
+                             stdin='',
+                             time_limit_s=2,
+                             memory_limit_mb=1024,
+                             image_name=IMAGE_NAME,
+                             limiter=None,
+                             backend=None,
+                             output_limit_bytes=OUTPUT_LIMIT_BYTES,
+                             expected_output=None,
+                             checker_mode="tokens",
+                             checker_eps=1e-6,
+                             python_fork=False,
+                             images=None,
+                             reaper=None):
+    """
+    asyncio-native execute_code: same arguments and result dict, but every docker step is
+    awaited instead of blocking a thread. At most limiter.max_containers calls hold a
+    container at once (default: one limiter of DEFAULT_MAX_CONTAINERS per event loop).
+    The container starts from the digest images (default: the process-wide ImageManager)
+    pinned, and is handed to reaper (default reaper.get_reaper()) for removal, so the result
+    does not wait for it. Cancelling the task stops the current step and still reaps the container.
+    """
+    backend = backend or get_async_backend()
+    limiter = limiter or default_limiter()
+    stdin = _normalize_stdin(stdin)
+    result = _new_result()
+
+    lang = get_language(language)
+    if lang is None:
+        result["err_message"] = f"Unsupported language: {language}"
+        return result
+    time_limit_s = time_limit_s * lang.time_multiplier
+    if checker_mode not in CHECKER_MODES:
+        result["err_message"] = f"Unknown checker mode: {checker_mode}"
+        return result
+
+    container_name = f"judge_{uuid.uuid4().hex[:8]}"
+    container_started = False
+
+    await limiter.acquire()
+    try:
+        # a lookup in memory unless the pin is due for a re-check; that blocks, so off the loop
+        image_ref, err = await asyncio.get_running_loop().run_in_executor(
+            None, (images or get_image_manager()).resolve, image_name, backend.sync)
+        if err:
+            result["err_message"] = err
+            return result
+
+        # marked before awaiting so a cancellation mid-start still removes it by name
+        container_started = True
+        container_id, err = await backend.run_container(
+            container_name, image_ref, ["sleep", "300"], memory_limit_mb,
+            tmpfs={WORKDIR: f"rw,exec,size={memory_limit_mb}m,mode=1777"}, labels=container_labels("300"))
+        if err:
+            result["err_message"] = err
+            return result
+
+        up = await backend.exec(container_id, ["tar", "-xf", "-", "-C", WORKDIR],
+                                stdin=_iter_tar([(lang.source, code), ("input.txt", stdin)]))
+        if up.exit_code != 0:
+            result["err_message"] = f"Uploading files failed: {_decode(up.stderr).strip()}"
+            return result
+
+        if lang.compiler:
+            started = time.perf_counter()
+            cp = await backend.exec(container_id, ["sh", "-c", _compile_command(lang)])
+            result["compile_time_ms"] = round((time.perf_counter() - started) * 1000.0, 3)
+            if cp.exit_code != 0:
+                result["compile_error"] = _decode(cp.stdout) + _decode(cp.stderr)
+                result["err_message"] = "Compilation failed"
+                return result
+
+        marker = _new_marker()
+        run_main = _run_main(lang, python_fork)
+        run_argv = _run_argv(run_main, "input.txt", time_limit_s, marker)
+        try:
+            run = await asyncio.wait_for(backend.exec(container_id, run_argv, output_limit=output_limit_bytes),
+                                         _host_timeout(time_limit_s))
+        except asyncio.TimeoutError:
+            result["timed_out"] = True
+            result["err_message"] = f"Host-side timeout expired after {_host_timeout(time_limit_s)}s"
+            return result
+
+        try:
+            _fill_run_result(result, run, time_limit_s, memory_limit_mb, output_limit_bytes, marker)
+            check = _make_checks(None if expected_output is None else [expected_output], 1,
+                                 checker_mode, checker_eps)[0]
+            if check is not None and result["success"]:
+                # the comparison reads files, keep it off the event loop
+                await asyncio.get_running_loop().run_in_executor(None, _apply_checker, result, run.stdout, check)
+        finally:
+            _close_output(run)
+        # an over-limit program is still running; removing the container below stops it
+        return result
+
+    except Exception as e:
+        tb = traceback.format_exc()
+        result["err_message"] = f"Runner exception: {e}\n{tb}"
+        return result
+
+    finally:
+        if container_started:
+            # the slot stays taken until the container is really gone
+            (reaper or get_reaper()).reap(container_name, backend.sync,
+                                          on_removed=limiter.release_threadsafe(asyncio.get_running_loop()))
+        else:
+            limiter.release()
@@ -0,0 +1,267 @@
+# bench.py
+"""
+Benchmark of the runner itself: representative workloads go through each
+runner and the report gives throughput and p50/p99 latency per phase.
+
+    python bench.py                          # fake docker daemon, every runner and workload
+    python bench.py --docker                 # the real docker daemon
+    python bench.py --save-baseline base.json
+    python bench.py --baseline base.json     # exit status 1 on a regression
+
+By default Docker is replaced by fake_docker_daemon.FakeDockerDaemon with an
+exec handler that answers every compile and run instantly with canned output
+(see FakeJudge). Programs never run, so the numbers are the runner's own
+overhead: HTTP round trips, tar uploads, output capture, parsing and checking.
+The same workload always produces the same output, so runs can be compared
+across commits on machines without Docker.
+
+Runners:
+  good_one    good_one.execute_code
+  one         one.execute_code
+  one_pool    one.execute_code with a warm ContainerPool and a CompileCache
+  batch       one.execute_batch, all iterations of a workload as one batch
+  async       async_runner.execute_code_async
+
+Phases are the ones from one.execute_code(timings=True) (image, container,
+upload, compile, run, check, cleanup) plus "total"; runners that do not
+report phases only get "total".
+"""
+import argparse
+import asyncio
+import json
+import re
+import shutil
+import sys
+import tempfile
+import time
+
+import async_runner
+import good_one
+import one
+from compile_cache import CompileCache
+from container_pool import ContainerPool
+from docker_backend import EngineApiBackend, get_backend
+from fake_docker_daemon import FakeDockerDaemon, default_exec_handler
+
+RUNNERS = ("good_one", "one", "one_pool", "batch", "async")
+
+# name -> (language, code, stdin, behaviour of the fake run)
+WORKLOADS = {
+    "hello": ("python", 'print("Hello, World!")', "",
+              {"stdout": b"Hello, World!\n"}),
+    "cpp_compile": ("c++", "#include <bits/stdc++.h>\n"
+                    + "".join(f"template <int N> struct S{i} {{ static const long v = N * {i}; }};\n"
+                              for i in range(2000))
+                    + "int main() { std::cout << S1999<3>::v << std::endl; }\n", "",
+                    {"stdout": b"11994\n", "cpu_time_ms": 1.0}),
+    "large_stdin": ("python", "import sys\nprint(sum(map(int, sys.stdin.buffer.read().split())))",
+                    " ".join(["12345"] * 2000000) + "\n",
+                    {"stdout": b"24690000000\n", "cpu_time_ms": 150.0}),
+    "large_stdout": ("python", "import sys\nsys.stdout.write('x' * (32 << 20))", "",
+                     {"stdout": b"x" * (32 << 20), "cpu_time_ms": 40.0}),
+    "tle": ("python", "while True: pass", "",
+            {"exit_code": 124, "cpu_time_ms": 2001.0, "limit_exceeded": "cpu"}),
+    "mle": ("python", "x = bytearray(2 << 30)", "",
+            {"exit_code": 137, "stderr": b"Killed\n", "peak_memory_kb": 1048576, "oom_killed": True}),
+}
+
+
+class FakeJudge:
+    """
+    Exec handler for FakeDockerDaemon that answers the runner's compile and
+    judge_run.py commands without running anything. Each run returns the
+    behaviour of the workload set in .behaviour, with a stats line in the
+    wrapper's format.
+    """
+
+    def __init__(self):
+        self.behaviour = {}
+
+    def __call__(self, container, cmd, stdin):
+        if cmd[:2] == ["python3", "-c"] and len(cmd) > 8 and cmd[8] in ("--", one.FORK_PYTHON):
+            return self._run(cmd[3])
+        if cmd[:1] in (["sh"], ["/bin/sh"]) and cmd[1:2] == ["-c"]:
+            # compile: leave a binary behind so the compile cache has something to store
+            m = re.search(r"-o (\S+)", cmd[2])
+            if m:
+                container.files[f"{one.WORKDIR}/{m.group(1)}"] = b"\x7fELF fake binary"
+            return 0, b"", b""
+        return default_exec_handler(container, cmd, stdin)
+
+    def _run(self, marker):
+        b = self.behaviour
+        exit_code = b.get("exit_code", 0)
+        stats = {
+            "exit_code": exit_code if exit_code < 124 else None,
+            "signal": 9 if exit_code >= 124 else None,
+            "cpu_time_ms": b.get("cpu_time_ms", 0.5),
+            "wall_time_ms": b.get("cpu_time_ms", 0.5) + 1.0,
+            "peak_memory_kb": b.get("peak_memory_kb", 9216),
+            "oom_killed": b.get("oom_killed", False),
+            "limit_exceeded": b.get("limit_exceeded"),
+            "cgroup": True,
+        }
+        stderr = b.get("stderr", b"") + f"\n{marker} {json.dumps(stats)}\n".encode()
+        return exit_code, b.get("stdout", b""), stderr
+
+
+def percentile(values, q):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+
+def _record(samples, phases_ms, total_ms):
+    for name, ms in dict(phases_ms or {}, total=total_ms).items():
+        samples.setdefault(name, []).append(ms)
+
+
+def bench_runner(runner, workload, iterations, backend, async_backend, pool, compile_cache):
+    """Run one workload `iterations` times. Returns ({phase: [ms, ...]}, elapsed seconds, failures)."""
+    language, code, stdin, behaviour = WORKLOADS[workload]
+    expected = behaviour.get("stdout") if workload in ("hello", "cpp_compile") else None
+    samples = {}
+    failures = 0
+    started = time.perf_counter()
+    if runner == "batch":
+        t = time.perf_counter()
+        results = one.execute_batch(language=language, code=code, inputs=[stdin] * iterations, backend=backend,
+                                    expected_outputs=None if expected is None else [expected] * iterations,
+                                    timings=True)
+        total_ms = (time.perf_counter() - t) * 1000.0 / iterations
+        for r in results:
+            _record(samples, r.get("phases_ms"), total_ms)
+            failures += bool(r["err_message"]) and workload not in ("tle", "mle")
+        return samples, time.perf_counter() - started, failures
+    loop = asyncio.new_event_loop() if runner == "async" else None
+    try:
+        for _ in range(iterations):
+            t = time.perf_counter()
+            if runner == "good_one":
+                r = good_one.execute_code(language=language, code=code, stdin=stdin, backend=backend)
+                err = r["err"]
+            elif runner == "async":
+                r = loop.run_until_complete(async_runner.execute_code_async(
+                    language=language, code=code, stdin=stdin, backend=async_backend, expected_output=expected))
+                err = r["err_message"]
+            else:
+                pooled = runner == "one_pool"
+                r = one.execute_code(language=language, code=code, stdin=stdin, backend=backend,
+                                     expected_output=expected, timings=True,
+                                     pool=pool if pooled else None, compile_cache=compile_cache if pooled else None)
+                err = r["err_message"]
+            _record(samples, r.get("phases_ms"), (time.perf_counter() - t) * 1000.0)
+            failures += bool(err) and workload not in ("tle", "mle")
+    finally:
+        if loop is not None:
+            loop.close()
+    return samples, time.perf_counter() - started, failures
+
+
+def run_benchmarks(runners, workloads, iterations, warmup, docker=False):
+    """Returns {"runner/workload": {"throughput": runs/s, "failures": n, "phases": {phase: {p50_ms, p99_ms}}}}."""
+    daemon = None
+    judge = FakeJudge()
+    if docker:
+        backend, async_backend = get_backend(), async_runner.get_async_backend()
+    else:
+        daemon = FakeDockerDaemon(images=[one.IMAGE_NAME], exec_handler=judge).start()
+        backend = EngineApiBackend(daemon.socket_path)
+        async_backend = async_runner.AsyncEngineApiBackend(daemon.socket_path, sync=backend)
+    cache_dir = tempfile.mkdtemp(prefix="bench_compile_cache_")
+    report = {}
+    try:
+        with ContainerPool(size=1, backend=backend) as pool:
+            pool.warm()
+            compile_cache = CompileCache(cache_dir)
+            for workload in workloads:
+                judge.behaviour = WORKLOADS[workload][3]
+                for runner in runners:
+                    if warmup:
+                        bench_runner(runner, workload, warmup, backend, async_backend, pool, compile_cache)
+                    samples, elapsed, failures = bench_runner(runner, workload, iterations, backend,
+                                                              async_backend, pool, compile_cache)
+                    report[f"{runner}/{workload}"] = {
+                        "throughput": iterations / elapsed if elapsed else 0.0,
+                        "failures": failures,
+                        "phases": {name: {"p50_ms": percentile(v, 0.50), "p99_ms": percentile(v, 0.99)}
+                                   for name, v in samples.items()},
+                    }
+    finally:
+        shutil.rmtree(cache_dir, ignore_errors=True)
+        if daemon is not None:
+            daemon.stop()
+    return report
+
+
+def format_report(report):
+    lines = [f"{'runner/workload':<26} {'runs/s':>9} {'phase':<10} {'p50 ms':>10} {'p99 ms':>10}"]
+    for key, entry in report.items():
+        first = True
+        for phase, p in sorted(entry["phases"].items(), key=lambda item: item[0] == "total"):
+            head = f"{key:<26} {entry['throughput']:>9.1f}" if first else " " * 36
+            lines.append(f"{head} {phase:<10} {p['p50_ms']:>10.2f} {p['p99_ms']:>10.2f}")
+            first = False
+        if entry["failures"]:
+            lines.append(f"{'':<36} {entry['failures']} unexpected failures")
+    return "\n".join(lines)
+
+
+def compare(report, baseline, tolerance):
+    """Regressions: entries whose total p50 grew, or throughput fell, by more than tolerance."""
+    regressions = []
+    for key, entry in report.items():
+        base = baseline.get(key)
+        if base is None:
+            continue
+        p50, base_p50 = entry["phases"]["total"]["p50_ms"], base["phases"]["total"]["p50_ms"]
+        if p50 > base_p50 * (1 + tolerance):
+            regressions.append(f"{key}: total p50 {base_p50:.2f} ms -> {p50:.2f} ms")
+        if entry["throughput"] < base["throughput"] / (1 + tolerance):
+            regressions.append(f"{key}: throughput {base['throughput']:.1f} -> {entry['throughput']:.1f} runs/s")
+        if entry["failures"] > base["failures"]:
+            regressions.append(f"{key}: {entry['failures']} unexpected failures (baseline {base['failures']})")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the judge runner.")
+    parser.add_argument("--docker", action="store_true", help="use the real docker daemon instead of the fake one")
+    parser.add_argument("--runners", default=",".join(RUNNERS), help="comma-separated subset of " + ", ".join(RUNNERS))
+    parser.add_argument("--workloads", default=",".join(WORKLOADS),
+                        help="comma-separated subset of " + ", ".join(WORKLOADS))
+    parser.add_argument("--iterations", type=int, default=20)
+    parser.add_argument("--warmup", type=int, default=2)
+    parser.add_argument("--output", help="also write the report to this file")
+    parser.add_argument("--save-baseline", help="write the results as JSON, for a later --baseline")
+    parser.add_argument("--baseline", help="compare against a saved baseline and fail on regressions")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed slowdown against the baseline")
+    args = parser.parse_args(argv)
+
+    runners = [r for r in args.runners.split(",") if r]
+    workloads = [w for w in args.workloads.split(",") if w]
+    unknown = sorted(set(runners) - set(RUNNERS)) + sorted(set(workloads) - set(WORKLOADS))
+    if unknown:
+        parser.error(f"unknown runner or workload: {', '.join(unknown)}")
+
+    report = run_benchmarks(runners, workloads, args.iterations, args.warmup, docker=args.docker)
+    text = format_report(report)
+    print(text)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    if args.save_baseline:
+        with open(args.save_baseline, "w") as f:
+            json.dump(report, f, indent=2)
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(report, json.load(f), args.tolerance)
+        for line in regressions:
+            print(f"REGRESSION {line}", file=sys.stderr)
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,163 @@
+# checker.py
+"""
+Streaming output checker. Expected and actual output are read in chunks and
+compared as they go, so neither side is ever held in memory as a whole; the
+comparison stops at the first mismatch and reports where it happened.
+
+Modes:
+  exact       byte for byte
+  tokens      whitespace-separated tokens, layout ignored entirely
+  whitespace  line by line, ignoring how much whitespace separates tokens,
+              trailing whitespace and trailing blank lines
+  float       tokens; numbers match within eps, absolute or relative
+  float_abs   tokens; numbers match if |expected - actual| <= eps
+  float_rel   tokens; numbers match if |expected - actual| <= eps * |expected|
+"""
+import io
+import math
+import os
+import re
+from itertools import zip_longest
+
+MODES = ("exact", "tokens", "whitespace", "float", "float_abs", "float_rel")
+CHUNK_SIZE = 1 << 16
+NEWLINE = b"\n"
+
+_TOKEN_RE = re.compile(rb"\S+|\n")
+_NUMBER_RE = re.compile(rb"[+-]?(\d+\.?\d*|\.\d+)([eE][+-]?\d+)?")
+
+
+def check_output(expected, actual, mode="tokens", eps=1e-6):
+    """
+    Compare actual program output with the expected output.
+    expected/actual may be bytes, str, an os.PathLike path or a binary file object
+    (read from its current position). Returns (True, "") or (False, message).
+    """
+    if mode not in MODES:
+        return False, f"Unknown checker mode: {mode}"
+    with _open(expected) as exp, _open(actual) as act:
+        if mode == "exact":
+            return _compare_exact(exp, act)
+        exp_tokens, act_tokens = _tokens(exp), _tokens(act)
+        if mode == "whitespace":
+            exp_tokens, act_tokens = _collapse_newlines(exp_tokens), _collapse_newlines(act_tokens)
+        else:
+            exp_tokens = (t for t in exp_tokens if t[0] != NEWLINE)
+            act_tokens = (t for t in act_tokens if t[0] != NEWLINE)
+        if mode.startswith("float"):
+            equal = _float_equal(eps if mode != "float_rel" else None, eps if mode != "float_abs" else None)
+        else:
+            equal = bytes.__eq__
+        return _compare_tokens(exp_tokens, act_tokens, equal)
+
+
+class _open:
+    """Context manager giving a binary file object for any accepted source."""
+
+    def __init__(self, source):
+        self._source = source
+        self._opened = None
+
+    def __enter__(self):
+        source = self._source
+        if isinstance(source, str):
+            return io.BytesIO(source.encode("utf-8"))
+        if isinstance(source, (bytes, bytearray, memoryview)):
+            return io.BytesIO(bytes(source))
+        if isinstance(source, os.PathLike):
+            self._opened = open(source, "rb")
+            return self._opened
+        return source
+
+    def __exit__(self, *exc):
+        if self._opened is not None:
+            self._opened.close()
+
+
+def _compare_exact(exp, act):
+    offset, line = 0, 1
+    while True:
+        e = exp.read(CHUNK_SIZE)
+        a = act.read(CHUNK_SIZE)
+        if e != a:
+            i = len(os.path.commonprefix([e, a]))
+            where = f"byte {offset + i + 1} (line {line + e.count(NEWLINE, 0, i)})"
+            if i == len(a):
+                return False, f"Output ended early at {where}: expected {_show(e[i:])}"
+            if i == len(e):
+                return False, f"Extra output at {where}: found {_show(a[i:])}"
+            return False, f"Mismatch at {where}: expected {_show(e[i:])}, found {_show(a[i:])}"
+        if not e:
+            return True, ""
+        offset += len(e)
+        line += e.count(NEWLINE)
+
+
+def _tokens(stream):
+    """Yield (token, line, index_in_line) from a binary stream; newlines come through as b"\\n"."""
+    line, index = 1, 0
+    rest = b""
+    while True:
+        chunk = stream.read(CHUNK_SIZE)
+        data = rest + chunk
+        rest = b""
+        for m in _TOKEN_RE.finditer(data):
+            token = m.group()
+            if token == NEWLINE:
+                yield token, line, index + 1
+                line, index = line + 1, 0
+                continue
+            if chunk and m.end() == len(data):
+                # may continue in the next chunk
+                rest = token
+                break
+            index += 1
+            yield token, line, index
+        if not chunk:
+            return
+
+
+def _collapse_newlines(tokens):
+    """Turn each run of newlines into one token, dropping the run at the very end."""
+    pending = None
+    for token in tokens:
+        if token[0] == NEWLINE:
+            pending = token if pending is None else (pending[0] + NEWLINE,) + pending[1:]
+            continue
+        if pending is not None:
+            yield pending
+            pending = None
+        yield token
+
+
+def _float_equal(abs_eps, rel_eps):
+    def equal(e, a):
+        if e == a:
+            return True
+        if not (_NUMBER_RE.fullmatch(e) and _NUMBER_RE.fullmatch(a)):
+            return False
+        x, y = float(e), float(a)
+        if math.isinf(x) or math.isinf(y):
+            return x == y
+        diff = abs(x - y)
+        return (abs_eps is not None and diff <= abs_eps) or (rel_eps is not None and diff <= rel_eps * abs(x))
+    return equal
+
+
+def _compare_tokens(exp_tokens, act_tokens, equal):
+    for exp, act in zip_longest(exp_tokens, act_tokens):
+        if act is None:
+            return False, f"Output ended early at line {exp[1]}: expected {_show(exp[0])}"
+        if exp is None:
+            return False, f"Extra output at line {act[1]}: found {_show(act[0])}"
+        if not equal(exp[0], act[0]):
+            return False, (f"Mismatch at line {act[1]}, token {act[2]}: "
+                           f"expected {_show(exp[0])}, found {_show(act[0])}")
+    return True, ""
+
+
+def _show(data, limit=40):
+    if data.startswith(NEWLINE):
+        return "end of line"
+    text = data[:limit].decode("utf-8", "replace")
+    return repr(text + ("..." if len(data) > limit else ""))
@@ -0,0 +1,64 @@
+# compile_cache.py
+import hashlib
+import json
+import os
+
+from disk_cache import DiskLRUCache
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "annaforces-judge", "compile")
+
+_BINARY = b"B"
+_ERROR = b"E"
+
+
+class CompileCache:
+    """
+    Host-side cache of compiled C/C++ artifacts and compile errors.
+
+    Entries are keyed by a hash of (language, source, compiler version, flags), so a rejudge
+    or duplicate submission skips the compile step entirely. The cache is bounded to
+    max_bytes on disk with least-recently-used eviction; see hits / misses / stats.
+    """
+
+    def __init__(self, directory=DEFAULT_CACHE_DIR, max_bytes=256 * 1024 * 1024):
+        self._store = DiskLRUCache(directory, max_bytes)
+
+    @staticmethod
+    def key(language, source, compiler_version, flags):
+        payload = json.dumps([language, compiler_version, list(flags)]).encode("utf-8")
+        h = hashlib.sha256(payload)
+        h.update(b"\0")
+        h.update(source.encode("utf-8"))
+        return h.hexdigest()
+
+    def get(self, key):
+        """
+        Return None on a miss, else a dict:
+          - ok (bool): True if the source compiled
+          - binary (bytes): the compiled executable (when ok)
+          - compile_error (str): compiler output (when not ok)
+        """
+        data = self._store.get(key)
+        if data is None:
+            return None
+        if data[:1] == _BINARY:
+            return {"ok": True, "binary": data[1:], "compile_error": ""}
+        return {"ok": False, "binary": b"", "compile_error": data[1:].decode("utf-8", "replace")}
+
+    def put_binary(self, key, binary):
+        self._store.put(key, _BINARY + binary)
+
+    def put_error(self, key, compile_error):
+        self._store.put(key, _ERROR + compile_error.encode("utf-8"))
+
+    @property
+    def hits(self):
+        return self._store.stats["hits"]
+
+    @property
+    def misses(self):
+        return self._store.stats["misses"]
+
+    @property
+    def stats(self):
+        return dict(self._store.stats, entries=len(self._store), bytes=self._store.total_bytes)
@@ -0,0 +1,198 @@
+# container_pool.py
+import threading
+import uuid
+from collections import deque
+
+from docker_backend import get_backend
+from image_manager import get_image_manager
+from one import IMAGE_NAME, WORKDIR, start_container, safe_remove_container
+
+# wipe the work/tmp dirs (leftover processes are killed first, see _scrub)
+SCRUB_CMD = (
+    f"rm -rf {WORKDIR}/* {WORKDIR}/.[!.]* {WORKDIR}/..?* /tmp/* /tmp/.[!.]* 2>/dev/null; "
+    f"mkdir -p {WORKDIR} && test -z \"$(ls -A {WORKDIR})\""
+)
+
+
+class ContainerPool:
+    """
+    Pool of pre-started sandbox containers keyed by (image, memory_limit_mb, cpuset_cpus, binds),
+    where image is the pinned digest the runners resolved (see image_manager.py).
+
+    acquire() hands out a clean, running container; release() gives it back.
+    Released containers are scrubbed (leftover processes killed, /sandbox/temp wiped)
+    by a background thread before they are handed out again. A container is recycled
+    after max_uses runs, or as soon as it is reported unhealthy or fails its scrub.
+    The same thread keeps `size` idle containers ready for every key seen so far.
+    """
+
+    def __init__(self, size=2, max_uses=50, refill_interval_s=1.0, backend=None):
+        self.backend = backend or get_backend()
+        self.size = size
+        self.max_uses = max_uses
+        self.refill_interval_s = refill_interval_s
+        self._idle = {}        # key -> deque of container ids
+        self._starting = {}    # key -> number of containers being started
+        self._dirty = deque()  # (key, container_id) waiting for a scrub
+        self._retired = deque()
+        self._owner = {}       # container_id -> key
+        self._uses = {}        # container_id -> number of runs
+        self._closed = False
+        self._cond = threading.Condition()
+        self.stats = {"hits": 0, "misses": 0, "started": 0, "recycled": 0, "scrub_failures": 0}
+        self._thread = threading.Thread(target=self._maintain, name="container-pool", daemon=True)
+        self._thread.start()
+
+    def warm(self, image_name=IMAGE_NAME, memory_limit_mb=1024, cpuset_cpus=None, binds=None, images=None):
+        """
+        Register a key so the background thread fills it before the first request. The tag is
+        resolved through images (default: the process-wide ImageManager) to the digest requests
+        will ask for. Returns None or an error message.
+        """
+        image_ref, err = (images or get_image_manager()).resolve(image_name, self.backend)
+        if err:
+            return err
+        with self._cond:
+            self._idle.setdefault((image_ref, memory_limit_mb, cpuset_cpus, tuple(binds or ())), deque())
+            self._cond.notify()
+        return None
+
+    def acquire(self, image_name=IMAGE_NAME, memory_limit_mb=1024, cpuset_cpus=None, binds=None):
+        """Return (container_id, None) or (None, error_message)."""
+        key = (image_name, memory_limit_mb, cpuset_cpus, tuple(binds or ()))
+        with self._cond:
+            if self._closed:
+                return None, "container pool is closed"
+            idle = self._idle.setdefault(key, deque())
+            if idle:
+                container_id = idle.popleft()
+                self._uses[container_id] += 1
+                self.stats["hits"] += 1
+                self._cond.notify()
+                return container_id, None
+            self.stats["misses"] += 1
+            self._cond.notify()
+        # cold path: nothing warm for this key yet, start one on the caller's thread
+        container_id, err = self._start(key)
+        if err:
+            return None, err
+        with self._cond:
+            self._uses[container_id] += 1
+        return container_id, None
+
+    def release(self, container_id, healthy=True):
+        """Give a container back. Unhealthy or worn-out containers are removed instead."""
+        with self._cond:
+            key = self._owner.get(container_id)
+            if key is None:
+                return
+            closed = self._closed
+            if closed or not healthy or self._uses[container_id] >= self.max_uses:
+                self._forget(container_id)
+                self.stats["recycled"] += 1
+                if not closed:
+                    self._retired.append(container_id)
+            else:
+                self._dirty.append((key, container_id))
+            self._cond.notify()
+        if closed:
+            safe_remove_container(container_id, backend=self.backend)
+
+    def close(self):
+        """Stop the background thread and remove every container owned by the pool."""
+        with self._cond:
+            self._closed = True
+            self._cond.notify()
+        self._thread.join()
+        with self._cond:
+            leftovers = list(self._owner)
+            for container_id in leftovers:
+                self._forget(container_id)
+            leftovers.extend(self._retired)
+            self._retired.clear()
+        for container_id in leftovers:
+            safe_remove_container(container_id, backend=self.backend)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    # internals
+
+    def _start(self, key):
+        image_name, memory_limit_mb, cpuset_cpus, binds = key
+        container_id, err = start_container(f"judge_pool_{uuid.uuid4().hex[:8]}",
+                                            image_name, memory_limit_mb, keepalive="infinity",
+                                            backend=self.backend, cpuset_cpus=cpuset_cpus, binds=binds)
+        if err:
+            return None, err
+        with self._cond:
+            self._owner[container_id] = key
+            self._uses[container_id] = 0
+            self.stats["started"] += 1
+        return container_id, None
+
+    def _forget(self, container_id):
+        key = self._owner.pop(container_id, None)
+        self._uses.pop(container_id, None)
+        if key in self._idle:
+            try:
+                self._idle[key].remove(container_id)
+            except ValueError:
+                pass
+
+    def _scrub(self, container_id):
+        try:
+            # a program left running could recreate files behind the wipe
+            self.backend.kill_processes(container_id)
+            return self.backend.exec(container_id, ["sh", "-c", SCRUB_CMD], timeout=30).exit_code == 0
+        except Exception:
+            return False
+
+    def _maintain(self):
+        while True:
+            with self._cond:
+                if self._closed:
+                    return
+                retired = list(self._retired)
+                self._retired.clear()
+                dirty = list(self._dirty)
+                self._dirty.clear()
+                missing = []
+                for key, idle in self._idle.items():
+                    n = self.size - len(idle) - self._starting.get(key, 0)
+                    if n > 0:
+                        self._starting[key] = self._starting.get(key, 0) + n
+                        missing.extend([key] * n)
+
+            for container_id in retired:
+                safe_remove_container(container_id, backend=self.backend)
+
+            for key, container_id in dirty:
+                ok = self._scrub(container_id)
+                with self._cond:
+                    if container_id not in self._owner:
+                        continue
+                    if ok and not self._closed:
+                        self._idle[key].append(container_id)
+                        self._cond.notify()
+                        continue
+                    self.stats["scrub_failures"] += 1
+                    self._forget(container_id)
+                safe_remove_container(container_id, backend=self.backend)
+
+            for key in missing:
+                container_id, err = self._start(key)
+                with self._cond:
+                    self._starting[key] -= 1
+                    if err is None:
+                        if self._closed:
+                            self._retired.append(container_id)
+                        else:
+                            self._idle[key].append(container_id)
+
+            with self._cond:
+                if not self._closed and not self._dirty and not self._retired:
+                    self._cond.wait(self.refill_interval_s)
@@ -0,0 +1,145 @@
+# disk_cache.py
+import os
+import threading
+import uuid
+from collections import OrderedDict
+
+
+class DiskLRUCache:
+    """
+    Size-bounded key -> file cache in a host directory with least-recently-used eviction.
+    Keys must be safe file names (hex digests). Recency survives restarts via file mtimes.
+    Pinned keys (see pin/unpin) are never evicted, so files in use stay on disk.
+    Thread-safe; counts hits, misses and evictions in self.stats.
+    """
+
+    def __init__(self, directory, max_bytes):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # key -> size, least recently used first
+        self._bytes = 0
+        self._pins = {}  # key -> pin count
+        self.stats = {"hits": 0, "misses": 0, "evictions": 0}
+        os.makedirs(directory, exist_ok=True)
+        found = []
+        for name in os.listdir(directory):
+            path = os.path.join(directory, name)
+            if name.startswith(".") or not os.path.isfile(path):
+                continue
+            st = os.stat(path)
+            found.append((st.st_mtime, name, st.st_size))
+        for _, name, size in sorted(found):
+            self._entries[name] = size
+            self._bytes += size
+        with self._lock:
+            self._evict()
+
+    def path(self, key):
+        return os.path.join(self.directory, key)
+
+    def __contains__(self, key):
+        with self._lock:
+            return key in self._entries
+
+    def __len__(self):
+        with self._lock:
+            return len(self._entries)
+
+    @property
+    def total_bytes(self):
+        return self._bytes
+
+    def get_path(self, key):
+        """Return the file path for key (marking it recently used), or None on a miss."""
+        with self._lock:
+            if key not in self._entries:
+                self.stats["misses"] += 1
+                return None
+            self._entries.move_to_end(key)
+            self.stats["hits"] += 1
+        try:
+            os.utime(self.path(key))
+        except OSError:
+            pass
+        return self.path(key)
+
+    def get(self, key):
+        """Return the cached bytes for key, or None on a miss."""
+        path = self.get_path(key)
+        if path is None:
+            return None
+        try:
+            with open(path, "rb") as f:
+                return f.read()
+        except OSError:
+            self.discard(key)
+            return None
+
+    def put(self, key, data=None, fileobj=None, chunk_size=1 << 20):
+        """Store bytes (or the contents of a binary file object) under key. Return the file path."""
+        tmp_path = os.path.join(self.directory, f".tmp-{uuid.uuid4().hex}")
+        size = 0
+        with open(tmp_path, "wb") as f:
+            if fileobj is None:
+                f.write(data)
+                size = len(data)
+            else:
+                while True:
+                    chunk = fileobj.read(chunk_size)
+                    if not chunk:
+                        break
+                    f.write(chunk)
+                    size += len(chunk)
+        os.replace(tmp_path, self.path(key))
+        with self._lock:
+            self._bytes -= self._entries.pop(key, 0)
+            self._entries[key] = size
+            self._bytes += size
+            self._evict(keep=key)
+        return self.path(key)
+
+    def pin(self, key):
+        """Mark key recently used and protect it from eviction until unpin(). False on a miss."""
+        if self.get_path(key) is None:
+            return False
+        with self._lock:
+            if key not in self._entries:
+                return False
+            self._pins[key] = self._pins.get(key, 0) + 1
+        return True
+
+    def unpin(self, key):
+        with self._lock:
+            n = self._pins.pop(key, 0) - 1
+            if n > 0:
+                self._pins[key] = n
+            self._evict()
+
+    def discard(self, key):
+        with self._lock:
+            if key in self._entries:
+                self._bytes -= self._entries.pop(key)
+        try:
+            os.remove(self.path(key))
+        except OSError:
+            pass
+
+    def keys(self):
+        """Keys from least to most recently used."""
+        with self._lock:
+            return list(self._entries)
+
+    def _evict(self, keep=None):
+        # caller holds the lock
+        for key in list(self._entries):
+            if self._bytes <= self.max_bytes:
+                break
+            if key == keep or key in self._pins:
+                continue
+            self._bytes -= self._entries.pop(key)
+            self.stats["evictions"] += 1
+            try:
+                os.remove(self.path(key))
+            except OSError:
+                pass
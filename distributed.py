@@ -0,0 +1,595 @@
+# distributed.py
+"""
+Judging spread over several processes or machines: one coordinator, many workers.
+
+    coord = Coordinator(host="0.0.0.0", port=7700, secret="s3cret").start()    # in the web tier
+    future = coord.submit("contest", language="c++", code=src, inputs=tests, expected_outputs=answers)
+    results = future.result()       # one result dict per input, as from execute_batch
+
+    python3 distributed.py worker coordinator-host:7700 --secret s3cret       # on every judge machine
+
+Protocol: one JSON object per line over TCP; the worker asks and the
+coordinator answers. Every worker slot (one per CPU core, pinned to it as in
+JudgeScheduler) keeps a connection and long-polls "pull" for jobs; another
+connection sends "heartbeat" every heartbeat_s. A job is re-queued when the
+connection of the slot running it closes (the worker process died) or when its
+worker misses heartbeats for worker_timeout_s (hung or cut off); after
+max_attempts it fails with a result per test case instead. A late result for a
+re-queued job is ignored.
+
+Routing: test inputs and expected outputs travel as content hashes, and each
+worker keeps them in its own testdata_cache.TestDataCache. A job carries only
+the files its worker does not hold yet. A worker reports the hashes it holds
+and the programs (language + code) it has compiled. A pulling worker gets the
+first job of the highest waiting priority whose data or program it holds. A
+job held by another live worker waits up to locality_wait_s for that worker
+before anyone else takes it (delay scheduling).
+
+The coordinator runs code from anyone who can reach it; bind it to a private
+address and set a secret.
+"""
+import argparse
+import base64
+import bisect
+import hashlib
+import hmac
+import io
+import itertools
+import json
+import os
+import pathlib
+import socket
+import socketserver
+import threading
+import time
+from concurrent.futures import Future
+
+from admission import AdmissionController
+from compile_cache import CompileCache
+from image_manager import get_image_manager
+from one import execute_batch, _new_result, _normalize_stdin
+from scheduler import PRIORITIES, PRIORITY_PRACTICE
+from testdata_cache import TestDataCache
+
+DEFAULT_PORT = 7700
+# programs a worker reports when it (re)registers, most recent first
+MAX_REPORTED_PROGRAMS = 4096
+
+
+def program_key(language, code):
+    """What workers report for the programs they have compiled."""
+    h = hashlib.sha256(language.encode("utf-8"))
+    h.update(b"\0")
+    h.update(code.encode("utf-8"))
+    return h.hexdigest()
+
+
+def _read_input(stdin):
+    """Test data as bytes, from anything execute_batch accepts as stdin."""
+    if isinstance(stdin, str):
+        return stdin.encode("utf-8")
+    if isinstance(stdin, (bytes, bytearray)):
+        return bytes(stdin)
+    if isinstance(stdin, os.PathLike):
+        with open(stdin, "rb") as f:
+            return f.read()
+    return stdin.read()
+
+
+def _send(wfile, msg):
+    wfile.write(json.dumps(msg).encode("utf-8") + b"\n")
+    wfile.flush()
+
+
+def _recv(rfile):
+    line = rfile.readline()
+    return json.loads(line) if line else None
+
+
+class _Job:
+    def __init__(self, job_id, priority, future, kwargs, input_hashes, expected_hashes, program):
+        self.id = job_id
+        self.priority = priority
+        self.future = future
+        self.kwargs = kwargs
+        self.input_hashes = input_hashes
+        self.expected_hashes = expected_hashes
+        self.program = program
+        self.queued_at = time.monotonic()
+        self.attempts = 0
+        self.worker = None
+        self.conn = None
+
+    @property
+    def hashes(self):
+        return set(self.input_hashes) | {h for h in self.expected_hashes if h}
+
+
+class _Worker:
+    def __init__(self, name, slots):
+        self.name = name
+        self.slots = slots
+        self.holds = set()
+        self.programs = set()
+        self.conns = 0
+        self.busy = 0
+        self.last_seen = time.monotonic()
+
+    def affinity(self, job):
+        return len(self.holds & job.hashes) + (job.program in self.programs)
+
+
+class _Connection:
+    def __init__(self):
+        self.worker = None
+        self.jobs = set()
+
+
+class _Server(socketserver.ThreadingMixIn, socketserver.TCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+class _Handler(socketserver.StreamRequestHandler):
+    def handle(self):
+        coord = self.server.coordinator
+        conn = _Connection()
+        try:
+            while True:
+                msg = _recv(self.rfile)
+                if msg is None:
+                    return
+                reply = coord._handle(conn, msg)
+                _send(self.wfile, reply)
+                if reply.get("close"):
+                    return
+        except (OSError, ValueError):
+            pass
+        finally:
+            coord._disconnected(conn)
+
+
+class Coordinator:
+    """
+    Accepts jobs with submit() and hands them to the workers that connect to (host, port)
+    (port=0 picks a free one; see address). Jobs wait in priority order (contest > practice >
+    rejudge) until a worker pulls them. stats() reports workers, queue depth, re-queues and how
+    many dispatches found their data on the worker (local) or shipped it (remote).
+    """
+
+    def __init__(self, host="127.0.0.1", port=DEFAULT_PORT, secret=None, heartbeat_s=2.0, worker_timeout_s=10.0,
+                 max_attempts=3, locality_wait_s=0.5, lookahead=64):
+        self.host = host
+        self.port = port
+        self.secret = secret
+        self.heartbeat_s = heartbeat_s
+        self.worker_timeout_s = worker_timeout_s
+        self.max_attempts = max_attempts
+        self.locality_wait_s = locality_wait_s
+        self.lookahead = lookahead
+        self._cond = threading.Condition()
+        self._queue = []     # sorted (priority, job_id); ids grow with submission order
+        self._jobs = {}      # job_id -> _Job, queued or running
+        self._data = {}      # hash -> [bytes, number of jobs using it]
+        self._workers = {}   # name -> _Worker
+        self._seq = itertools.count()
+        self._closed = False
+        self._server = None
+        self._threads = []
+        self._counts = {"submitted": 0, "completed": 0, "failed": 0, "requeued": 0, "local": 0, "remote": 0,
+                        "workers_lost": 0}
+
+    @property
+    def address(self):
+        return self._server.server_address[:2] if self._server else (self.host, self.port)
+
+    def start(self):
+        self._server = _Server((self.host, self.port), _Handler)
+        self._server.coordinator = self
+        self._threads = [threading.Thread(target=self._server.serve_forever, name="coordinator-server", daemon=True),
+                         threading.Thread(target=self._monitor, name="coordinator-monitor", daemon=True)]
+        for t in self._threads:
+            t.start()
+        return self
+
+    def submit(self, priority=PRIORITY_PRACTICE, inputs=("",), expected_outputs=None, **job_kwargs):
+        """
+        Queue a batch and return a concurrent.futures.Future for its list of result dicts.
+        inputs and expected_outputs are as in execute_batch; the other job_kwargs (language,
+        code, time_limit_s, checker_mode, ...) go to execute_batch on the worker and must be
+        JSON-serializable.
+        """
+        priority = PRIORITIES.get(priority, priority)
+        json.dumps(job_kwargs)  # fail here rather than on the wire
+        # normalized as execute_batch does, so a worker runs on the same bytes as a local judge
+        inputs = [_read_input(_normalize_stdin(stdin)) for stdin in inputs]
+        expected = [None if e is None else _read_input(e) for e in (expected_outputs or [None] * len(inputs))]
+        if len(expected) != len(inputs):
+            raise ValueError("expected_outputs must have one entry per input")
+        input_hashes = [hashlib.sha256(data).hexdigest() for data in inputs]
+        expected_hashes = [None if data is None else hashlib.sha256(data).hexdigest() for data in expected]
+        future = Future()
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("coordinator is shut down")
+            job = _Job(next(self._seq), priority, future, job_kwargs, input_hashes, expected_hashes,
+                       program_key(job_kwargs.get("language", "python"), job_kwargs.get("code", "")))
+            for h, data in zip(input_hashes + expected_hashes, inputs + expected):
+                if h is not None:
+                    self._data.setdefault(h, [data, 0])[1] += 1
+            self._jobs[job.id] = job
+            bisect.insort(self._queue, (job.priority, job.id))
+            self._counts["submitted"] += 1
+            self._cond.notify_all()
+        return future
+
+    def stats(self):
+        with self._cond:
+            now = time.monotonic()
+            return dict(
+                self._counts,
+                queue_depth=len(self._queue),
+                running=len(self._jobs) - len(self._queue),
+                workers={w.name: {"slots": w.slots, "busy": w.busy, "holds": len(w.holds),
+                                  "programs": len(w.programs), "last_seen_s": round(now - w.last_seen, 3)}
+                         for w in self._workers.values()},
+            )
+
+    def shutdown(self, cancel_pending=True):
+        """Stop serving; queued and running jobs are cancelled (their futures raise)."""
+        with self._cond:
+            self._closed = True
+            jobs = list(self._jobs.values()) if cancel_pending else []
+            self._jobs.clear()
+            self._queue.clear()
+            self._cond.notify_all()
+        for job in jobs:
+            if not job.future.done():
+                job.future.set_exception(RuntimeError("coordinator shut down"))
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.shutdown()
+
+    # connection handling (server threads)
+
+    def _handle(self, conn, msg):
+        op = msg.get("op")
+        if op == "register":
+            return self._register(conn, msg)
+        with self._cond:
+            worker = conn.worker
+            if worker is None or self._workers.get(worker.name) is not worker:
+                # never registered, or declared dead by the monitor: register again
+                return {"ok": False, "error": "unregistered"}
+            worker.last_seen = time.monotonic()
+        if op == "heartbeat":
+            return {"ok": True}
+        if op == "pull":
+            return self._pull(conn, worker, float(msg.get("wait_s", self.heartbeat_s)))
+        if op == "result":
+            return self._result(conn, worker, msg)
+        if op == "fetch":
+            with self._cond:
+                return {"ok": True, "data": {h: base64.b64encode(self._data[h][0]).decode("ascii")
+                                             for h in msg["hashes"] if h in self._data}}
+        return {"ok": False, "error": f"unknown op: {op}"}
+
+    def _register(self, conn, msg):
+        if self.secret is not None and not hmac.compare_digest(str(msg.get("secret", "")), self.secret):
+            return {"ok": False, "error": "bad secret", "close": True}
+        with self._cond:
+            worker = self._workers.get(msg["worker"])
+            if worker is None:
+                worker = self._workers[msg["worker"]] = _Worker(msg["worker"], int(msg.get("slots", 1)))
+            worker.holds.update(msg.get("holds", ()))
+            worker.programs.update(msg.get("programs", ()))
+            worker.last_seen = time.monotonic()
+            if conn.worker is not worker:
+                conn.worker = worker
+                worker.conns += 1
+            self._cond.notify_all()
+        return {"ok": True, "heartbeat_s": self.heartbeat_s}
+
+    def _pull(self, conn, worker, wait_s):
+        deadline = time.monotonic() + min(wait_s, self.worker_timeout_s / 2)
+        with self._cond:
+            while True:
+                if self._closed:
+                    return {"ok": True, "job": None, "shutdown": True}
+                if self._workers.get(worker.name) is not worker:
+                    return {"ok": False, "error": "unregistered"}
+                idx, local = self._pick(worker)
+                if idx is not None:
+                    return {"ok": True, "job": self._assign(conn, worker, self._queue.pop(idx)[1], local)}
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return {"ok": True, "job": None}
+                # wake up again when held-back jobs stop waiting for their worker
+                self._cond.wait(min(remaining, self.locality_wait_s or remaining))
+
+    def _pick(self, worker):
+        """
+        (queue index, local) of the job for worker, or (None, False). Only jobs of the highest
+        waiting priority class are considered: locality breaks ties, it never reorders priorities.
+        Caller holds the lock.
+        """
+        if not self._queue:
+            return None, False
+        now = time.monotonic()
+        head = self._queue[0][0]
+        fallback = None
+        best, best_affinity = None, 0
+        for idx, (priority, job_id) in enumerate(self._queue[:self.lookahead]):
+            if priority != head:
+                break
+            job = self._jobs[job_id]
+            affinity = worker.affinity(job)
+            if affinity > best_affinity:
+                best, best_affinity = idx, affinity
+            elif fallback is None and not affinity and not self._held_elsewhere(worker, job, now):
+                fallback = idx
+        if best is not None:
+            return best, True
+        return fallback, False
+
+    def _held_elsewhere(self, worker, job, now):
+        if now - job.queued_at >= self.locality_wait_s:
+            return False
+        # only worth waiting for a worker with a free slot
+        return any(w is not worker and w.busy < w.slots and w.affinity(job) for w in self._workers.values())
+
+    def _assign(self, conn, worker, job_id, local):
+        job = self._jobs[job_id]
+        job.attempts += 1
+        job.worker = worker
+        job.conn = conn
+        conn.jobs.add(job.id)
+        worker.busy += 1
+        self._counts["local" if local else "remote"] += 1
+        ship = {h: base64.b64encode(self._data[h][0]).decode("ascii") for h in job.hashes if h not in worker.holds}
+        # it has them once this job ran there
+        worker.holds |= job.hashes
+        return {"id": job.id, "attempt": job.attempts, "kwargs": job.kwargs, "input_hashes": job.input_hashes,
+                "expected_hashes": job.expected_hashes, "data": ship}
+
+    def _result(self, conn, worker, msg):
+        with self._cond:
+            worker.holds.update(msg.get("holds", ()))
+            worker.programs.update(msg.get("programs", ()))
+            job = self._jobs.get(msg["id"])
+            if job is None or job.conn is not conn or job.attempts != msg["attempt"]:
+                return {"ok": True, "stale": True}
+            self._finish(job)
+            self._counts["completed"] += 1
+        job.future.set_result(msg["results"])
+        return {"ok": True}
+
+    def _finish(self, job):
+        # caller holds the lock
+        del self._jobs[job.id]
+        if job.conn is not None:
+            job.conn.jobs.discard(job.id)
+            job.conn = None
+            job.worker.busy -= 1
+        for h in job.hashes:
+            entry = self._data[h]
+            entry[1] -= 1
+            if not entry[1]:
+                del self._data[h]
+
+    def _requeue(self, job, reason):
+        """Put a job that lost its worker back in the queue, or fail it. Caller holds the lock."""
+        job.conn.jobs.discard(job.id)
+        job.conn = None
+        job.worker.busy -= 1
+        if job.attempts < self.max_attempts:
+            bisect.insort(self._queue, (job.priority, job.id))
+            self._counts["requeued"] += 1
+            self._cond.notify_all()
+            return None
+        self._finish(job)
+        self._counts["failed"] += 1
+        message = f"Judge worker lost ({reason}) on {job.attempts} attempts"
+        return job, [dict(_new_result(), err_message=message) for _ in job.input_hashes]
+
+    def _fail(self, failed):
+        for item in failed:
+            if item is not None:
+                job, results = item
+                job.future.set_result(results)
+
+    def _disconnected(self, conn):
+        with self._cond:
+            failed = [self._requeue(self._jobs[job_id], "connection closed") for job_id in list(conn.jobs)]
+            worker = conn.worker
+            if worker is not None and self._workers.get(worker.name) is worker:
+                worker.conns -= 1
+                if not worker.conns:
+                    del self._workers[worker.name]
+                    self._counts["workers_lost"] += 1
+        self._fail(failed)
+
+    def _monitor(self):
+        while True:
+            with self._cond:
+                if self._closed:
+                    return
+                self._cond.wait(self.heartbeat_s)
+                now = time.monotonic()
+                failed = []
+                for worker in [w for w in self._workers.values() if now - w.last_seen > self.worker_timeout_s]:
+                    del self._workers[worker.name]
+                    self._counts["workers_lost"] += 1
+                    for job in [j for j in self._jobs.values() if j.conn is not None and j.worker is worker]:
+                        failed.append(self._requeue(job, "missed heartbeats"))
+            self._fail(failed)
+
+
+class JudgeWorker:
+    """
+    Worker side: one slot per CPU in cpus (default: every core), each pulling jobs from the
+    coordinator at address (host, port) and running them with runner (execute_batch) pinned to
+    its core. Test data received from the coordinator is kept in testdata and compiled
+    binaries in compile_cache, so that repeat jobs of a problem are routed back here.
+    name must be unique among the coordinator's workers; runner_kwargs go to every runner call.
+    """
+
+    def __init__(self, address, cpus=None, secret=None, name=None, testdata=None, compile_cache=None,
+                 runner=execute_batch, heartbeat_s=2.0, **runner_kwargs):
+        if cpus is None:
+            cpus = sorted(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else range(os.cpu_count() or 1)
+        self.address = tuple(address)
+        self.cpus = list(cpus)
+        self.secret = secret
+        self.name = name or socket.gethostname()
+        self.testdata = testdata or TestDataCache()
+        self.compile_cache = compile_cache or CompileCache()
+        self.runner = runner
+        self.heartbeat_s = heartbeat_s
+        self.runner_kwargs = runner_kwargs
+        self._programs = {}  # program key -> None, oldest first
+        self._lock = threading.Lock()
+        self._stopping = threading.Event()
+        self._threads = []
+        self.jobs_done = 0
+
+    def start(self):
+        self._threads = [threading.Thread(target=self._slot, args=(cpu,), name=f"judge-worker-cpu{cpu}", daemon=True)
+                         for cpu in self.cpus]
+        self._threads.append(threading.Thread(target=self._heartbeat, name="judge-worker-heartbeat", daemon=True))
+        for t in self._threads:
+            t.start()
+        return self
+
+    def run(self):
+        """start() and block until the coordinator shuts down or stop() is called."""
+        self.start()
+        self._stopping.wait()
+
+    def stop(self):
+        self._stopping.set()
+
+    # internals
+
+    def _connect(self):
+        sock = socket.create_connection(self.address)
+        rfile, wfile = sock.makefile("rb"), sock.makefile("wb")
+        with self._lock:
+            programs = list(self._programs)[-MAX_REPORTED_PROGRAMS:]
+        reply = self._call((sock, rfile, wfile), {"op": "register", "worker": self.name, "slots": len(self.cpus),
+                                                  "secret": self.secret, "holds": self.testdata.keys(),
+                                                  "programs": programs})
+        if not reply.get("ok"):
+            sock.close()
+            raise ConnectionError(reply.get("error", "registration refused"))
+        return sock, rfile, wfile
+
+    @staticmethod
+    def _call(conn, msg):
+        _send(conn[2], msg)
+        reply = _recv(conn[1])
+        if reply is None:
+            raise ConnectionError("coordinator closed the connection")
+        return reply
+
+    def _session(self, work):
+        """Run work(conn) on a fresh registered connection, reconnecting on errors until stopped."""
+        while not self._stopping.is_set():
+            conn = None
+            try:
+                conn = self._connect()
+                work(conn)
+            except (OSError, ValueError):
+                self._stopping.wait(1.0)
+            finally:
+                if conn is not None:
+                    conn[0].close()
+
+    def _heartbeat(self):
+        def beat(conn):
+            while not self._stopping.wait(self.heartbeat_s):
+                if not self._call(conn, {"op": "heartbeat"}).get("ok"):
+                    return  # declared dead meanwhile: register again
+        self._session(beat)
+
+    def _slot(self, cpu):
+        def pull(conn):
+            while not self._stopping.is_set():
+                reply = self._call(conn, {"op": "pull", "wait_s": self.heartbeat_s})
+                if reply.get("shutdown"):
+                    self.stop()
+                    return
+                if not reply.get("ok"):
+                    return
+                job = reply.get("job")
+                if job:
+                    results = self._run(conn, job, cpu)
+                    program = program_key(job["kwargs"].get("language", "python"), job["kwargs"].get("code", ""))
+                    with self._lock:
+                        self._programs.pop(program, None)
+                        self._programs[program] = None
+                        self.jobs_done += 1
+                    self._call(conn, {"op": "result", "id": job["id"], "attempt": job["attempt"], "results": results,
+                                      "programs": [program]})
+        self._session(pull)
+
+    def _run(self, conn, job, cpu):
+        hashes = set(job["input_hashes"]) | {h for h in job["expected_hashes"] if h}
+        data = job["data"]
+        missing = [h for h in hashes if h not in data and h not in self.testdata]
+        if missing:
+            # evicted here since we last reported it
+            data = dict(data, **self._call(conn, {"op": "fetch", "hashes": missing})["data"])
+        for h in hashes:
+            if h in data and h not in self.testdata:
+                self.testdata.register(fileobj=io.BytesIO(base64.b64decode(data[h])))
+        expected = job["expected_hashes"]
+        kwargs = dict(self.runner_kwargs, **job["kwargs"])
+        kwargs.update(
+            input_hashes=job["input_hashes"], testdata=self.testdata, compile_cache=self.compile_cache,
+            cpuset_cpus=str(cpu),
+            expected_outputs=None if not any(expected) else [
+                None if h is None else pathlib.Path(self.testdata.host_path(h)) for h in expected])
+        try:
+            return self.runner(**kwargs)
+        except Exception as e:
+            return [dict(_new_result(), err_message=f"Runner exception: {e}") for _ in job["input_hashes"]]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run a judge worker for a distributed.Coordinator.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    worker = sub.add_parser("worker", help="pull and judge jobs from a coordinator")
+    worker.add_argument("coordinator", help="HOST:PORT of the coordinator")
+    worker.add_argument("--name", help="unique worker name (default: the host name)")
+    worker.add_argument("--cpus", help="comma-separated cores to judge on (default: all)")
+    worker.add_argument("--secret", default=os.environ.get("JUDGE_SECRET"),
+                        help="shared secret of the coordinator (default: $JUDGE_SECRET)")
+    worker.add_argument("--cache-dir", help="directory for this worker's test data and compile caches")
+    worker.add_argument("--memory-budget-mb", type=int,
+                        help="memory the sandboxes may book at once (default: 80%% of the host's)")
+    args = parser.parse_args(argv)
+
+    host, _, port = args.coordinator.rpartition(":")
+    cpus = [int(c) for c in args.cpus.split(",")] if args.cpus else None
+    testdata = compile_cache = None
+    if args.cache_dir:
+        testdata = TestDataCache(os.path.join(args.cache_dir, "testdata"))
+        compile_cache = CompileCache(os.path.join(args.cache_dir, "compile"))
+    # check (and build) the sandbox image before taking jobs
+    for image, err in get_image_manager().warm().items():
+        if err:
+            print(f"image {image}: {err}")
+    JudgeWorker((host or "127.0.0.1", int(port)), cpus=cpus, secret=args.secret, name=args.name,
+                testdata=testdata, compile_cache=compile_cache,
+                admission=AdmissionController(memory_budget_mb=args.memory_budget_mb)).run()
+
+
+if __name__ == "__main__":
+    main()
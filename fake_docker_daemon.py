@@ -0,0 +1,304 @@
+# fake_docker_daemon.py
+"""
+In-process fake of the Docker Engine API on a unix socket, for exercising
+EngineApiBackend (and everything built on it) on machines without Docker.
+
+Containers are plain records; exec commands are answered by an exec handler,
+handler(container, cmd, stdin_bytes) -> (exit_code, stdout_bytes, stderr_bytes).
+The default handler understands the few commands the runner issues for file
+transfer (`tar -xf - -C dir`, `cat path`, `<compiler> --version`) and reports
+success with empty output for everything else.
+"""
+import hashlib
+import io
+import json
+import os
+import re
+import socketserver
+import struct
+import tarfile
+import tempfile
+import threading
+import urllib.parse
+import uuid
+from http.server import BaseHTTPRequestHandler
+
+
+class FakeContainer:
+    def __init__(self, container_id, name, config):
+        self.id = container_id
+        self.name = name
+        self.config = config
+        self.image = config.get("Image")
+        self.running = False
+        self.files = {}  # absolute path -> bytes
+
+
+def default_exec_handler(container, cmd, stdin):
+    if cmd[:3] == ["tar", "-xf", "-"] and "-C" in cmd:
+        target = cmd[cmd.index("-C") + 1]
+        with tarfile.open(fileobj=io.BytesIO(stdin), mode="r|") as tar:
+            for member in tar:
+                if member.isfile():
+                    container.files[f"{target}/{member.name}"] = tar.extractfile(member).read()
+        return 0, b"", b""
+    if cmd[:1] == ["cat"] and len(cmd) == 2:
+        if cmd[1] in container.files:
+            return 0, container.files[cmd[1]], b""
+        return 1, b"", f"cat: {cmd[1]}: No such file or directory\n".encode()
+    if cmd[1:] == ["--version"]:
+        return 0, f"{cmd[0]} (fake) 0.0.0\n".encode(), b""
+    return 0, b"", b""
+
+
+class _Server(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+class FakeDockerDaemon:
+    """
+    Usage:
+        with FakeDockerDaemon(images=["sandbox-image:latest"]) as daemon:
+            backend = EngineApiBackend(daemon.socket_path)
+
+    Every request is recorded in daemon.calls as (method, path); daemon.connections
+    counts accepted connections, which shows whether clients reuse them.
+    """
+
+    def __init__(self, socket_path=None, images=("sandbox-image:latest",), exec_handler=None):
+        if socket_path is None:
+            socket_path = os.path.join(tempfile.mkdtemp(prefix="fake_docker_"), "docker.sock")
+        self.socket_path = socket_path
+        self.images = {name: "sha256:" + hashlib.sha256(name.encode()).hexdigest() for name in images}
+        self.exec_handler = exec_handler or default_exec_handler
+        self.containers = {}
+        self.execs = {}
+        self.calls = []
+        self.connections = 0
+        self._lock = threading.Lock()
+        self._server = None
+        self._thread = None
+
+    def start(self):
+        daemon = self
+
+        class Handler(_Handler):
+            fake = daemon
+
+        self._server = _Server(self.socket_path, Handler)
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+        try:
+            os.remove(self.socket_path)
+        except OSError:
+            pass
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def find_container(self, ref):
+        with self._lock:
+            if ref in self.containers:
+                return self.containers[ref]
+            for c in self.containers.values():
+                if c.name == ref or c.id.startswith(ref):
+                    return c
+        return None
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    fake = None  # set on the per-daemon subclass
+
+    def setup(self):
+        super().setup()
+        with self.fake._lock:
+            self.fake.connections += 1
+
+    def log_message(self, *args):
+        pass
+
+    # plumbing
+
+    def _body(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        return self.rfile.read(length) if length else b""
+
+    def _send(self, status, payload=None):
+        if payload is None:
+            data = b""
+        elif isinstance(payload, bytes):
+            data = payload
+        else:
+            data = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        if data:
+            self.wfile.write(data)
+
+    def _route(self, method):
+        url = urllib.parse.urlsplit(self.path)
+        path = re.sub(r"^/v[\d.]+", "", url.path)
+        query = dict(urllib.parse.parse_qsl(url.query))
+        with self.fake._lock:
+            self.fake.calls.append((method, path))
+        body = self._body() if method in ("POST", "PUT") else b""
+        try:
+            for pattern, handler in self.ROUTES.get(method, ()):
+                m = re.fullmatch(pattern, path)
+                if m:
+                    return getattr(self, handler)(query, body, *[urllib.parse.unquote(g) for g in m.groups()])
+            self._send(404, {"message": f"page not found: {method} {path}"})
+        except (BrokenPipeError, ConnectionResetError):
+            # the client went away (e.g. a cancelled or timed out exec); nothing to answer
+            self.close_connection = True
+
+    def do_GET(self):
+        self._route("GET")
+
+    def do_POST(self):
+        self._route("POST")
+
+    def do_DELETE(self):
+        self._route("DELETE")
+
+    # endpoints
+
+    ROUTES = {
+        "GET": [
+            (r"/_ping", "ping"),
+            (r"/info", "info"),
+            (r"/images/(.+)/json", "image_inspect"),
+            (r"/containers/json", "container_list"),
+            (r"/containers/([^/]+)/json", "container_inspect"),
+            (r"/exec/([^/]+)/json", "exec_inspect"),
+        ],
+        "POST": [
+            (r"/build", "build"),
+            (r"/containers/create", "container_create"),
+            (r"/containers/([^/]+)/start", "container_start"),
+            (r"/containers/([^/]+)/exec", "exec_create"),
+            (r"/exec/([^/]+)/start", "exec_start"),
+        ],
+        "DELETE": [
+            (r"/containers/([^/]+)", "container_remove"),
+        ],
+    }
+
+    def ping(self, query, body):
+        self._send(200, b"OK")
+
+    def info(self, query, body):
+        self._send(200, {"Containers": len(self.fake.containers), "ServerVersion": "fake"})
+
+    def _find_image(self, ref):
+        # like the engine: a tag or an image id
+        if ref in self.fake.images:
+            return ref
+        return next((name for name, image_id in self.fake.images.items() if image_id == ref), None)
+
+    def image_inspect(self, query, body, name):
+        found = self._find_image(name)
+        if found is None:
+            return self._send(404, {"message": f"No such image: {name}"})
+        self._send(200, {"Id": self.fake.images[found], "RepoTags": [found]})
+
+    def build(self, query, body):
+        name = query.get("t", "")
+        self.fake.images[name] = "sha256:" + hashlib.sha256(body).hexdigest()
+        self._send(200, b'{"stream":"Successfully built"}\n')
+
+    def container_create(self, query, body):
+        config = json.loads(body or b"{}")
+        if self._find_image(config.get("Image")) is None:
+            return self._send(404, {"message": f"No such image: {config.get('Image')}"})
+        c = FakeContainer(uuid.uuid4().hex + uuid.uuid4().hex, query.get("name") or "", config)
+        with self.fake._lock:
+            self.fake.containers[c.id] = c
+        self._send(201, {"Id": c.id, "Warnings": []})
+
+    def container_start(self, query, body, ref):
+        c = self.fake.find_container(ref)
+        if c is None:
+            return self._send(404, {"message": f"No such container: {ref}"})
+        c.running = True
+        self._send(204)
+
+    def container_list(self, query, body):
+        labels = json.loads(query.get("filters") or "{}").get("label", [])
+        listed = []
+        with self.fake._lock:
+            for c in self.fake.containers.values():
+                have = c.config.get("Labels") or {}
+                wanted = (f.partition("=") for f in labels)
+                if all(k in have and (not eq or have[k] == v) for k, eq, v in wanted):
+                    if c.running or query.get("all") in ("1", "true"):
+                        listed.append({"Id": c.id, "Names": ["/" + c.name], "Image": c.image, "Labels": have,
+                                       "State": "running" if c.running else "exited"})
+        self._send(200, listed)
+
+    def container_inspect(self, query, body, ref):
+        c = self.fake.find_container(ref)
+        if c is None:
+            return self._send(404, {"message": f"No such container: {ref}"})
+        self._send(200, {"Id": c.id, "Name": "/" + c.name, "State": {"Running": c.running},
+                         "Config": {"Image": c.image, "Cmd": c.config.get("Cmd"),
+                                    "Labels": c.config.get("Labels") or {}},
+                         "HostConfig": c.config.get("HostConfig", {})})
+
+    def container_remove(self, query, body, ref):
+        c = self.fake.find_container(ref)
+        if c is None:
+            return self._send(404, {"message": f"No such container: {ref}"})
+        with self.fake._lock:
+            del self.fake.containers[c.id]
+        self._send(204)
+
+    def exec_create(self, query, body, ref):
+        c = self.fake.find_container(ref)
+        if c is None or not c.running:
+            return self._send(404 if c is None else 409, {"message": f"container {ref} is not running"})
+        config = json.loads(body or b"{}")
+        exec_id = uuid.uuid4().hex
+        with self.fake._lock:
+            self.fake.execs[exec_id] = {"container": c, "config": config, "running": False, "exit_code": None}
+        self._send(201, {"Id": exec_id})
+
+    def exec_start(self, query, body, exec_id):
+        ex = self.fake.execs.get(exec_id)
+        if ex is None:
+            return self._send(404, {"message": f"No such exec instance: {exec_id}"})
+        # hijack the connection like dockerd: 101, then raw multiplexed frames until close
+        self.wfile.write(b"HTTP/1.1 101 UPGRADED\r\n"
+                         b"Content-Type: application/vnd.docker.raw-stream\r\n"
+                         b"Connection: Upgrade\r\nUpgrade: tcp\r\n\r\n")
+        self.wfile.flush()
+        stdin = self.rfile.read() if ex["config"].get("AttachStdin") else b""
+        ex["running"] = True
+        code, out, err = self.fake.exec_handler(ex["container"], list(ex["config"].get("Cmd") or []), stdin)
+        for stream_id, data in ((1, out), (2, err)):
+            for i in range(0, len(data), 32768):
+                chunk = data[i:i + 32768]
+                self.wfile.write(struct.pack(">BxxxL", stream_id, len(chunk)) + chunk)
+        self.wfile.flush()
+        ex["exit_code"] = code
+        ex["running"] = False
+        self.close_connection = True
+
+    def exec_inspect(self, query, body, exec_id):
+        ex = self.fake.execs.get(exec_id)
+        if ex is None:
+            return self._send(404, {"message": f"No such exec instance: {exec_id}"})
+        self._send(200, {"ID": exec_id, "Running": ex["running"], "ExitCode": ex["exit_code"]})
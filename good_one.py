@@ -1,178 +1,182 @@
-import subprocess
-import tempfile
-import os
-import re
+import shlex
 import uuid
-from io import BytesIO
+
+from docker_backend import get_backend
+from image_manager import get_image_manager
+from languages import compile_argv, get_language
+from reaper import container_labels, get_reaper
+from one import (upload_files, OUTPUT_LIMIT_BYTES, OUTPUT_PREVIEW_BYTES, STATS_TAIL_BYTES,
+                 _run_argv, _new_marker, _parse_stats, _host_timeout)
 
 def execute_code(language='python', 
                  code='print("this is test code\\nsubmit ur own code, this is the default code")', 
                  stdin='', 
                  time_limit_s=2, 
-                 memory_limit_mb=1024):
+                 memory_limit_mb=1024,
+                 pool=None,
+                 backend=None,
+                 output_limit_bytes=OUTPUT_LIMIT_BYTES,
+                 images=None):
     """
-    Executes user-provided code in a secure Docker sandbox using subprocess.
+    Executes user-provided code in a secure Docker sandbox (Engine API or docker CLI).
 
     Args:
-        language (str): The programming language ('c', 'c++', 'python').
+        language (str): A language from languages.json ('c', 'c++', 'python', ...).
         code (str): The source code to execute.
         stdin (str): The standard input for the code.
-        time_limit_s (int): The time limit in seconds.
+        time_limit_s (float): The CPU-time limit in seconds (millisecond precision).
         memory_limit_mb (int): The memory limit in megabytes.
+        pool (ContainerPool): Optional pool of warm containers to borrow from
+            instead of starting and removing a container per call.
+        backend: Optional docker backend (Engine API or CLI); defaults to
+            docker_backend.get_backend().
+        output_limit_bytes (int): The run is stopped once stdout or stderr grows
+            past this many bytes ("Output Limit Exceeded").
+        images (ImageManager): Checks the image once and pins its digest;
+            defaults to image_manager.get_image_manager().
 
     Returns:
         dict: A dictionary containing execution results.
     """
     # 1. Validate the language input
-    language = language.lower()
-    file_info = {
-        'c': {'ext': 'c', 'compiler': 'gcc', 'executable': 'a.out'},
-        'c++': {'ext': 'cpp', 'compiler': 'g++', 'executable': 'a.out'},
-        'python': {'ext': 'py', 'compiler': None, 'executable': 'solution.py'}
-    }
-    if language not in file_info:
+    info = get_language(language)
+    if info is None:
         return {
             "stdout": "", "stderr": "", "err": f"Language '{language}' is not supported.",
             "timetaken": 0, "memorytaken": 0, "success": False
         }
 
-    # 2. Check for Docker and prepare the image
+    # 2. Look up the image (checked once and pinned by the image manager, never built here)
     image_name = "sandbox-image:latest"
+    backend = backend or get_backend()
     try:
-        # Check if Docker is running
-        subprocess.run(["docker", "info"], check=True, capture_output=True)
-        # Check if image exists
-        image_check = subprocess.run(["docker", "image", "inspect", image_name], check=False, capture_output=True)
-        
-        if image_check.returncode != 0:
-            print(f"Image '{image_name}' not found. Building...")
-            dockerfile = """
-            FROM ubuntu:22.04
-            ENV DEBIAN_FRONTEND=noninteractive
-            RUN apt-get update && \
-                apt-get install -y --no-install-recommends gcc g++ python3 python3-pip time coreutils && \
-                apt-get clean && \
-                rm -rf /var/lib/apt/lists/*
-            WORKDIR /sandbox/temp
-            """
-            build_process = subprocess.run(
-                ["docker", "build", "-t", image_name, "-"],
-                input=dockerfile.encode('utf-8'),
-                check=True,
-                capture_output=True
-            )
-            print("Image built successfully.")
+        image_ref, image_err = (images or get_image_manager()).resolve(image_name, backend)
+        if image_err:
+            raise RuntimeError(image_err)
 
-    except (subprocess.CalledProcessError, FileNotFoundError) as e:
-        error_message = e.stderr.decode('utf-8') if hasattr(e, 'stderr') and e.stderr else str(e)
+    except (RuntimeError, OSError) as e:
+        error_message = str(e)
         return {
             "stdout": "", "stderr": "", "err": f"Docker error: {error_message}",
             "timetaken": 0, "memorytaken": 0, "success": False
         }
 
-    info = file_info[language]
-    code_filename = f"solution.{info['ext']}"
+    code_filename = info.source
+    time_limit_s = time_limit_s * info.time_multiplier
     container_name = f"sandbox-container-{uuid.uuid4()}"
 
-    # 3. Use a temporary directory on the host to store files
-    with tempfile.TemporaryDirectory() as temp_dir:
-        code_filepath = os.path.join(temp_dir, code_filename)
-        with open(code_filepath, "w") as f:
-            f.write(code)
-
-        stdin_filepath = os.path.join(temp_dir, "input.txt")
-        with open(stdin_filepath, "w") as f:
-            f.write(stdin)
-
-        container_id = None
-        try:
-            # 4. Start the container as root
-            run_cmd = [
-                "docker", "run",
-                "--name", container_name,
-                "--memory", f"{memory_limit_mb}m",
-                "--memory-swap", f"{memory_limit_mb}m", # Prevent swapping
-                "-d", # Detached mode
-                image_name,
-                "sleep", "3600" # Keep it running
-            ]
-            container_id = subprocess.check_output(run_cmd).decode('utf-8').strip()
-
-            # 5. Copy files into the container
-            subprocess.run(["docker", "cp", code_filepath, f"{container_id}:/sandbox/temp/{code_filename}"], check=True)
-            subprocess.run(["docker", "cp", stdin_filepath, f"{container_id}:/sandbox/temp/input.txt"], check=True)
-
-            # 6. Compilation Step (for C/C++)
-            if info['compiler']:
-                compile_cmd = f"{info['compiler']} -o {info['executable']} {code_filename}"
-                compile_proc = subprocess.run(
-                    ["docker", "exec", container_id, "/bin/sh", "-c", compile_cmd],
-                    capture_output=True
-                )
-                if compile_proc.returncode != 0:
-                    return {
-                        "stdout": "", "stderr": compile_proc.stderr.decode('utf-8'), "err": "Compilation Error",
-                        "timetaken": 0, "memorytaken": 0, "success": False
-                    }
-
-            # 7. Execution Step
-            exec_path = info['executable']
-            if language == 'python':
-                run_cmd_main = f"python3 {exec_path}"
-            else:
-                run_cmd_main = f"./{exec_path}"
-            
-            run_cmd_container = f"timeout {time_limit_s}s /usr/bin/time -v {run_cmd_main} < input.txt"
-            
-            exec_proc = subprocess.run(
-                ["docker", "exec", container_id, "/bin/sh", "-c", run_cmd_container],
-                capture_output=True
-            )
-            
-            exit_code = exec_proc.returncode
-            stdout_output = exec_proc.stdout.decode('utf-8')
-            stderr_output = exec_proc.stderr.decode('utf-8')
-
-            # 8. Parse resource usage from stderr
-            time_taken_match = re.search(r"User time \(seconds\): ([\d\.]+)", stderr_output)
-            mem_taken_match = re.search(r"Maximum resident set size \(kbytes\): (\d+)", stderr_output)
-            
-            time_taken = float(time_taken_match.group(1)) if time_taken_match else 0.0
-            mem_taken = float(mem_taken_match.group(1)) / 1024 if mem_taken_match else 0.0
-
-            clean_stderr = re.sub(r"Command being timed:.*\n(.|\n)*", "", stderr_output, 1).strip()
-            
-            # 9. Determine the result
-            if exit_code == 124:
+    container_id = None
+    container_healthy = True
+    try:
+        # 4. Start the container as root (or borrow a warm one from the pool)
+        if pool is not None:
+            container_id, pool_err = pool.acquire(image_ref, memory_limit_mb)
+            if pool_err:
                 return {
-                    "stdout": "", "stderr": "", "err": f"Time Limit Exceeded (> {time_limit_s}s)",
-                    "timetaken": time_limit_s, "memorytaken": mem_taken, "success": False
+                    "stdout": "", "stderr": "", "err": f"Docker error: {pool_err}",
+                    "timetaken": 0, "memorytaken": 0, "success": False
                 }
-            elif exit_code == 137:
-                 return {
-                    "stdout": stdout_output, "stderr": clean_stderr, "err": f"Memory Limit Exceeded (> {memory_limit_mb} MB)",
-                    "timetaken": time_taken, "memorytaken": mem_taken, "success": False
+        else:
+            container_id, run_err = backend.run_container(
+                container_name, image_ref,
+                ["sleep", "3600"], # Keep it running
+                memory_limit_mb, # --memory and --memory-swap, to prevent swapping
+                tmpfs={"/sandbox/temp": f"rw,exec,size={memory_limit_mb}m,mode=1777"}, # Work dir in memory
+                labels=container_labels("3600") # lets the reaper's sweeper find it if we crash
+            )
+            if run_err:
+                return {
+                    "stdout": "", "stderr": "", "err": f"Docker error: {run_err}",
+                    "timetaken": 0, "memorytaken": 0, "success": False
                 }
-            elif exit_code == 0:
+
+        # 5. Stream code and input into the container as one tar archive
+        upload_err = upload_files(container_id, [(code_filename, code), ("input.txt", stdin)], backend=backend)
+        if upload_err:
+            return {
+                "stdout": "", "stderr": "", "err": f"Docker error: {upload_err}",
+                "timetaken": 0, "memorytaken": 0, "success": False
+            }
+
+        # 6. Compilation Step (for C/C++)
+        if info.compiler:
+            # flags (and the precompiled header directory) come from languages.json
+            compile_cmd = shlex.join(compile_argv(info))
+            compile_proc = backend.exec(container_id, ["/bin/sh", "-c", compile_cmd])
+            if compile_proc.exit_code != 0:
                 return {
-                    "stdout": stdout_output, "stderr": clean_stderr, "err": "",
-                    "timetaken": time_taken, "memorytaken": mem_taken, "success": True
+                    "stdout": "", "stderr": compile_proc.stderr.decode('utf-8'), "err": "Compilation Error",
+                    "timetaken": 0, "memorytaken": 0, "success": False
                 }
-            else:
+
+        # 7. Execution Step
+        run_cmd_main = shlex.join(info.run)
+        
+        # judge_run.py enforces the CPU-time limit and reports cgroup measurements on stderr
+        marker = _new_marker()
+        exec_proc = backend.exec(container_id, _run_argv(run_cmd_main, "input.txt", time_limit_s, marker),
+                                 timeout=_host_timeout(time_limit_s), output_limit=output_limit_bytes)
+        with exec_proc.stdout, exec_proc.stderr:
+            if exec_proc.output_exceeded:
+                # the program is still running; the container is scrubbed or removed below
                 return {
-                    "stdout": stdout_output, "stderr": clean_stderr, "err": f"Runtime Error (Exit Code: {exit_code})",
-                    "timetaken": time_taken, "memorytaken": mem_taken, "success": False
+                    "stdout": exec_proc.stdout.read(OUTPUT_PREVIEW_BYTES).decode('utf-8', 'replace'), "stderr": "",
+                    "err": f"Output Limit Exceeded (> {output_limit_bytes} bytes)",
+                    "timetaken": 0, "memorytaken": 0, "success": False
                 }
+            stdout_output = exec_proc.stdout.read().decode('utf-8')
+            stderr_bytes = exec_proc.stderr.read()
+
+        exit_code = exec_proc.exit_code
 
-        finally:
-            # 10. Clean up the container
-            if container_id:
-                subprocess.run(["docker", "rm", "-f", container_id], capture_output=True)
+        # 8. Read resource usage from the wrapper's stats line
+        stats = _parse_stats(stderr_bytes[-STATS_TAIL_BYTES:], marker) or {}
+        time_taken = (stats.get("cpu_time_ms") or 0.0) / 1000
+        mem_taken = (stats.get("peak_memory_kb") or 0.0) / 1024
+
+        clean_stderr = stderr_bytes.rsplit(b"\n" + marker.encode(), 1)[0].decode('utf-8').strip()
+        
+        # 9. Determine the result
+        if exit_code == 124:
+            return {
+                "stdout": "", "stderr": "", "err": f"Time Limit Exceeded (> {time_limit_s}s)",
+                "timetaken": time_limit_s, "memorytaken": mem_taken, "success": False
+            }
+        elif exit_code == 137 or stats.get("oom_killed"):
+             return {
+                "stdout": stdout_output, "stderr": clean_stderr, "err": f"Memory Limit Exceeded (> {memory_limit_mb} MB)",
+                "timetaken": time_taken, "memorytaken": mem_taken, "success": False
+            }
+        elif exit_code == 0:
+            return {
+                "stdout": stdout_output, "stderr": clean_stderr, "err": "",
+                "timetaken": time_taken, "memorytaken": mem_taken, "success": True
+            }
+        else:
+            return {
+                "stdout": stdout_output, "stderr": clean_stderr, "err": f"Runtime Error (Exit Code: {exit_code})",
+                "timetaken": time_taken, "memorytaken": mem_taken, "success": False
+            }
+
+    except Exception:
+        container_healthy = False
+        raise
+
+    finally:
+        # 10. Clean up the container (pooled containers are scrubbed and reused, the rest are
+        # removed in the background)
+        if container_id and pool is not None:
+            pool.release(container_id, healthy=container_healthy)
+        elif container_id:
+            get_reaper().reap(container_id, backend)
 
 if __name__ == '__main__':
     import json
     # --- Example Usage ---
 
+    # check (and build if missing) the sandbox image once, before the first submission
+    print(get_image_manager().warm())
+
     # Example 0: Using all default values
     print("--- Example 0: Python Defaults ---")
     result = execute_code()
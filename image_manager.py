@@ -0,0 +1,208 @@
+# image_manager.py
+"""
+Sandbox image readiness, checked once instead of on every submission.
+
+    manager = get_image_manager()
+    manager.warm()                 # at process startup: check, build if missing, pin the digest
+    ref, err = manager.resolve(IMAGE_NAME, backend)   # request path: a dict lookup
+
+resolve() answers from memory while the last check is younger than ttl_s; an
+older entry costs one `docker image inspect` of the pinned digest. Containers
+are started from the pinned digest ("sha256:..."), not the tag, so retagging
+or rebuilding the image mid-contest does not change what running judges use;
+warm() (or refresh()) pins the tag's current digest again.
+
+Images are never built on the request path. A request that finds its image
+missing starts a build on a background thread and fails at once (or after
+waiting at most wait_s, if that is set); a submission arriving during a cold
+start gets an error instead of spending minutes in apt-get.
+
+resolve() blocks for an inspect when the image is unknown or its check has
+expired, so asyncio callers run it in an executor, never on the event loop.
+"""
+import threading
+import time
+
+from docker_backend import get_backend
+
+
+class ImageManager:
+    """
+    dockerfiles maps image names to the Dockerfile built when the image is missing (images
+    without one are only checked). ttl_s is how long a successful check is trusted;
+    wait_s is how long resolve() waits for a build it finds missing (default: not at all).
+    stats counts resolve() calls answered from memory (hits), re-checks, builds and failures.
+    """
+
+    def __init__(self, backend=None, dockerfiles=None, ttl_s=60.0, wait_s=0.0):
+        self.backend = backend
+        self.dockerfiles = dict(dockerfiles or {})
+        self.ttl_s = ttl_s
+        self.wait_s = wait_s
+        self._lock = threading.Lock()
+        self._pinned = {}    # (backend, image_name) -> (digest, checked_at)
+        self._errors = {}    # (backend, image_name) -> error of the last warm-up
+        self._warming = {}   # (backend, image_name) -> threading.Event set when the warm-up ends
+        self.stats = {"hits": 0, "rechecks": 0, "builds": 0, "failures": 0}
+
+    def warm(self, images=None, build=True, backend=None):
+        """
+        Check every image (default: every image in dockerfiles), build missing ones when build
+        is set and pin their digests. Blocks; returns {image_name: error_message or None}.
+        """
+        backend = backend or self._backend()
+        return {image_name: self._warm_one(backend, image_name, build) for image_name in self._images(images)}
+
+    def warm_in_background(self, images=None, build=True, backend=None):
+        """warm() on a daemon thread (e.g. at process startup); returns the thread."""
+        t = threading.Thread(target=self.warm, args=(images, build, backend), name="image-warmup", daemon=True)
+        t.start()
+        return t
+
+    def refresh(self, image_name, backend=None):
+        """Forget the pinned digest and pin whatever the tag points at now. Returns an error or None."""
+        backend = backend or self._backend()
+        with self._lock:
+            self._pinned.pop((backend, image_name), None)
+        return self._warm_one(backend, image_name, build=False)
+
+    def resolve(self, image_name, backend=None):
+        """
+        The reference (pinned digest) to start containers from: (ref, None), or (None, error)
+        if the image is not ready. Never builds on the caller's thread: an unknown image costs
+        one inspect, and a missing one is built in the background while this call fails.
+        """
+        backend = backend or self._backend()
+        key = (backend, image_name)
+        with self._lock:
+            pinned = self._pinned.get(key)
+            if pinned is not None and time.monotonic() - pinned[1] < self.ttl_s:
+                self.stats["hits"] += 1
+                return pinned[0], None
+        if pinned is not None:
+            with self._lock:
+                self.stats["rechecks"] += 1
+            digest, err = self._inspect(backend, pinned[0])
+            if digest is not None:
+                with self._lock:
+                    self._pinned[key] = (pinned[0], time.monotonic())
+                return pinned[0], None
+            with self._lock:
+                self._pinned.pop(key, None)
+        # unknown, or the pinned image is gone: inspect the tag, and build it in the background if missing
+        with self._lock:
+            building = key in self._warming
+        if not building:
+            digest, err = self._inspect(backend, image_name)
+            if digest is not None:
+                with self._lock:
+                    self._pinned[key] = (digest, time.monotonic())
+                    self._errors.pop(key, None)
+                return digest, None
+            if err is None and image_name not in self.dockerfiles:
+                err = f"Image {image_name} not found"
+            if err is not None:
+                with self._lock:
+                    self._errors[key] = err
+                    self.stats["failures"] += 1
+                return None, err
+        done = self._start_warming(backend, image_name)
+        if self.wait_s:
+            done.wait(self.wait_s)
+        with self._lock:
+            pinned = self._pinned.get(key)
+            if pinned is not None:
+                return pinned[0], None
+            if not done.is_set():
+                return None, f"Image {image_name} is not ready yet (being checked or built in the background)"
+            return None, self._errors.get(key) or f"Image {image_name} is not available"
+
+    def pinned(self):
+        """{image_name: digest} for the default backend's ready images."""
+        backend = self._backend()
+        with self._lock:
+            return {image: digest for (b, image), (digest, _) in self._pinned.items() if b is backend}
+
+    # internals
+
+    def _backend(self):
+        return self.backend or get_backend()
+
+    def _images(self, images):
+        if images is None:
+            return list(self.dockerfiles)
+        return [images] if isinstance(images, str) else list(images)
+
+    def _start_warming(self, backend, image_name):
+        key = (backend, image_name)
+        with self._lock:
+            done = self._warming.get(key)
+            if done is not None:
+                return done
+            done = self._warming[key] = threading.Event()
+        threading.Thread(target=self._warm_one, args=(backend, image_name, True, done), name="image-warmup",
+                         daemon=True).start()
+        return done
+
+    def _warm_one(self, backend, image_name, build, done=None):
+        key = (backend, image_name)
+        if done is None:
+            with self._lock:
+                done = self._warming.setdefault(key, threading.Event())
+        try:
+            digest, err = self._inspect(backend, image_name)
+            if digest is None and err is None and build and image_name in self.dockerfiles:
+                with self._lock:
+                    self.stats["builds"] += 1
+                try:
+                    ok, err = backend.build_image(image_name, self.dockerfiles[image_name])
+                except FileNotFoundError:
+                    ok, err = False, "docker CLI not found"
+                if ok:
+                    digest, err = self._inspect(backend, image_name)
+            if digest is None:
+                err = err or f"Image {image_name} not found"
+            with self._lock:
+                if digest is not None:
+                    self._pinned[key] = (digest, time.monotonic())
+                    self._errors.pop(key, None)
+                else:
+                    self._errors[key] = err
+                    self.stats["failures"] += 1
+            return None if digest is not None else err
+        finally:
+            with self._lock:
+                if self._warming.get(key) is done:
+                    del self._warming[key]
+            done.set()
+
+    @staticmethod
+    def _inspect(backend, ref):
+        """(digest, None); (None, None) if the image does not exist; (None, error) on failure."""
+        try:
+            return backend.image_id(ref), None
+        except FileNotFoundError:
+            return None, "docker CLI not found"
+        except Exception as e:
+            return None, f"image check failed: {e}"
+
+
+_manager = None
+_manager_lock = threading.Lock()
+
+
+def get_image_manager():
+    """The process-wide manager, which knows how to build one.IMAGE_NAME."""
+    global _manager
+    with _manager_lock:
+        if _manager is None:
+            from one import IMAGE_NAME, SANDBOX_DOCKERFILE
+            _manager = ImageManager(dockerfiles={IMAGE_NAME: SANDBOX_DOCKERFILE})
+        return _manager
+
+
+def set_image_manager(manager):
+    """Replace the process-wide manager (e.g. with one bound to a test backend)."""
+    global _manager
+    with _manager_lock:
+        _manager = manager
@@ -0,0 +1,254 @@
+# judge_run.py
+"""
+Runs inside the sandbox container (python3 -c, nothing is written to disk) and
+replaces `timeout` + `/usr/bin/time -v`:
+
+    python3 judge_run.py MARKER WORKDIR INPUT CPU_LIMIT_MS WALL_LIMIT_MS -- PROGRAM [ARGS...]
+    python3 judge_run.py MARKER WORKDIR INPUT CPU_LIMIT_MS WALL_LIMIT_MS --fork-python SCRIPT [ARGS...]
+
+The program runs in its own session with INPUT as stdin and the wrapper's
+stdout/stderr. A watchdog polls CPU usage every few milliseconds and kills the
+whole process group once CPU_LIMIT_MS (or WALL_LIMIT_MS of wall time) is spent.
+
+With --fork-python the wrapper's own, already initialized interpreter (with
+PRELOAD_MODULES imported) forks the child, which runs SCRIPT as __main__
+instead of exec'ing a new python3, so interpreter startup is not charged to
+the submission. Each run is still a fresh process.
+
+CPU time comes from the container's cgroup (cpu.stat usage_usec, which also
+counts child processes), less the CPU the wrapper itself spends polling in
+that cgroup while the program runs (its RUSAGE_SELF time). Peak memory comes
+from memory.peak when the kernel lets us reset it, less the tmpfs files (test
+input, binary) already charged to the cgroup when the program starts, and from
+wait4's ru_maxrss otherwise. OOM kills come from the oom_kill counter in
+memory.events. Without a cgroup it falls back to /proc and rusage.
+
+Measurements are printed as the last line of stderr: MARKER followed by JSON.
+The exit status is 124 on a time limit, 137 on an OOM kill, 128+N on signal N,
+otherwise the program's own.
+"""
+import json
+import os
+import resource
+import signal
+import sys
+import time
+
+CGROUP = "/sys/fs/cgroup"
+POLL_S = 0.005
+# imported before the fork in --fork-python mode, so submissions get them for free
+PRELOAD_MODULES = ("atexit", "bisect", "collections", "functools", "heapq", "io", "itertools", "math",
+                   "re", "string", "traceback", "types")
+
+
+def _read(path):
+    try:
+        with open(path) as f:
+            return f.read()
+    except OSError:
+        return None
+
+
+def _field(text, name):
+    for line in (text or "").splitlines():
+        key, _, value = line.partition(" ")
+        if key == name:
+            return int(value)
+    return None
+
+
+def _cgroup_cpu_usec():
+    usage = _field(_read(f"{CGROUP}/cpu.stat"), "usage_usec")
+    if usage is None:
+        # cgroup v1
+        ns = _read(f"{CGROUP}/cpuacct/cpuacct.usage")
+        usage = int(ns) // 1000 if ns else None
+    return usage
+
+
+def _cgroup_oom_kills():
+    kills = _field(_read(f"{CGROUP}/memory.events"), "oom_kill")
+    if kills is None:
+        kills = _field(_read(f"{CGROUP}/memory/memory.oom_control"), "oom_kill")
+    return kills
+
+
+def _self_cpu_usec():
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    return int((usage.ru_utime + usage.ru_stime) * 1000000)
+
+
+def _cgroup_shmem_bytes():
+    # tmpfs pages charged to the cgroup (the staged files in WORKDIR)
+    return _field(_read(f"{CGROUP}/memory.stat"), "shmem") or 0
+
+
+def _proc_cpu_usec(pid):
+    stat = _read(f"/proc/{pid}/stat")
+    if not stat:
+        return 0
+    fields = stat.rsplit(")", 1)[1].split()
+    return (int(fields[11]) + int(fields[12])) * 1000000 // os.sysconf("SC_CLK_TCK")
+
+
+def _open_peak():
+    # writing to memory.peak resets the watermark for this file descriptor (Linux 6.12+)
+    try:
+        f = open(f"{CGROUP}/memory.peak", "r+")
+        f.write("reset\n")
+        f.flush()
+        return f
+    except OSError:
+        return None
+
+
+def _exit_status(code):
+    """Exit status for SystemExit(code), as the interpreter computes it."""
+    if code is None:
+        return 0
+    if isinstance(code, int):
+        return code & 0xFF
+    sys.stderr.write(f"{code}\n")
+    return 1
+
+
+def _run_python(argv):
+    """Child side of --fork-python: behave like `python3 SCRIPT ARGS...`, then exit."""
+    import atexit
+    import traceback
+    import types
+
+    if sys.stdin is None:
+        # the wrapper started without a stdin; fd 0 is the input file now
+        sys.stdin = open(0, closefd=False)
+    sys.argv = list(argv)
+    sys.path[0] = os.path.dirname(os.path.abspath(argv[0]))
+    # a fresh __main__ module, set up the way the interpreter does it for a script
+    # (runpy.run_path would cost more CPU than a small submission)
+    main_module = types.ModuleType("__main__")
+    main_module.__file__ = argv[0]
+    main_module.__cached__ = None
+    sys.modules["__main__"] = main_module
+    try:
+        with open(argv[0], "rb") as f:
+            source = f.read()
+        exec(compile(source, argv[0], "exec"), main_module.__dict__)
+        status = 0
+    except SystemExit as e:
+        status = _exit_status(e.code)
+    except BaseException as e:
+        # leave out this function's frame, like the interpreter's own report
+        traceback.print_exception(type(e), e, e.__traceback__.tb_next)
+        status = 1
+    atexit._run_exitfuncs()
+    for stream in (sys.stdout, sys.stderr):
+        try:
+            stream.flush()
+        except Exception:
+            status = status or 120
+    os._exit(status)
+
+
+def main(argv):
+    marker, workdir, input_path, cpu_limit_ms, wall_limit_ms, mode = argv[1:7]
+    cmd = argv[7:]
+    fork_python = mode == "--fork-python"
+    cpu_limit_usec = int(cpu_limit_ms) * 1000
+    wall_limit_s = int(wall_limit_ms) / 1000.0
+    os.chdir(workdir)
+    if fork_python:
+        for name in PRELOAD_MODULES:
+            __import__(name)
+
+    peak_file = _open_peak()
+    staged_bytes = _cgroup_shmem_bytes() if peak_file is not None else 0
+    oom_before = _cgroup_oom_kills()
+    cpu_before = _cgroup_cpu_usec()
+    self_before = _self_cpu_usec()
+    started = time.monotonic()
+
+    pid = os.fork()
+    if pid == 0:
+        try:
+            os.setsid()
+            fd = os.open(input_path, os.O_RDONLY)
+            os.dup2(fd, 0)
+            os.close(fd)
+            # backstop in case the watchdog itself is starved
+            cpu_s = int(cpu_limit_ms) // 1000 + 2
+            resource.setrlimit(resource.RLIMIT_CPU, (cpu_s, cpu_s))
+            if fork_python:
+                _run_python(cmd)
+            os.execvp(cmd[0], cmd)
+        except BaseException as e:
+            os.write(2, f"judge_run: cannot start {cmd[0]}: {e}\n".encode())
+        os._exit(127)
+
+    def cpu_used():
+        if cpu_before is not None:
+            # the watchdog's own wakeups are charged to the same cgroup
+            wrapper = _self_cpu_usec() - self_before
+            now = _cgroup_cpu_usec()
+            if now is not None:
+                return max(now - cpu_before - wrapper, 0)
+        return _proc_cpu_usec(pid)
+
+    limit = None
+    while True:
+        done, status, usage = os.wait4(pid, os.WNOHANG)
+        if done:
+            break
+        if cpu_used() > cpu_limit_usec:
+            limit = "cpu"
+        elif time.monotonic() - started > wall_limit_s:
+            limit = "wall"
+        if limit:
+            os.killpg(pid, signal.SIGKILL)
+            _, status, usage = os.wait4(pid, 0)
+            break
+        time.sleep(POLL_S)
+    wall_s = time.monotonic() - started
+    try:
+        # nothing the program started may outlive it
+        os.killpg(pid, signal.SIGKILL)
+    except OSError:
+        pass
+
+    cpu_usec = cpu_used() if cpu_before is not None else int((usage.ru_utime + usage.ru_stime) * 1000000)
+    peak_kb = usage.ru_maxrss
+    if peak_file is not None:
+        try:
+            peak_file.seek(0)
+            peak_kb = max(peak_kb, (int(peak_file.read()) - staged_bytes) // 1024)
+        except (OSError, ValueError):
+            pass
+    oom_after = _cgroup_oom_kills()
+    sig = os.WTERMSIG(status) if os.WIFSIGNALED(status) else None
+    if oom_before is not None and oom_after is not None:
+        oom = oom_after > oom_before
+    else:
+        oom = sig == signal.SIGKILL and limit is None
+
+    stats = {
+        "exit_code": os.WEXITSTATUS(status) if os.WIFEXITED(status) else None,
+        "signal": sig,
+        "cpu_time_ms": cpu_usec / 1000.0,
+        "wall_time_ms": wall_s * 1000.0,
+        "peak_memory_kb": peak_kb,
+        "oom_killed": oom,
+        "limit_exceeded": limit,
+        "cgroup": cpu_before is not None,
+    }
+    sys.stderr.write(f"\n{marker} {json.dumps(stats)}\n")
+    sys.stderr.flush()
+    if limit:
+        return 124
+    if oom:
+        return 137
+    if sig is not None:
+        return 128 + sig
+    return stats["exit_code"]
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))
@@ -0,0 +1,119 @@
+# languages.py
+"""
+Language registry, read from languages.json (or the file named by JUDGE_LANGUAGES).
+
+Each entry maps a language name to:
+  source          file the submission is saved as (in WORKDIR)
+  compiler        compiler executable; omit for interpreted languages
+  flags           compile flags (optimization, standard); precompiled headers are built with these
+  link_flags      flags that only matter when linking (e.g. -lm)
+  run             argv that runs the program, from WORKDIR
+  pch             header to precompile into the image (used automatically when flags match)
+  fork_python     true for CPython, which supports execute_code(python_fork=True)
+  time_multiplier the time limit for this language is time_limit_s times this
+  packages        apt packages the sandbox image needs for this language
+  aliases         other names accepted for this language
+
+Compiled programs are always written to BINARY. Adding a language or a variant (e.g. a
+different -std) only takes a new entry here; rebuild the image if it needs new packages
+or a precompiled header.
+"""
+import json
+import os
+from collections import namedtuple
+
+LANGUAGES_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "languages.json")
+BINARY = "main"
+# precompiled headers live in PCH_DIR/<language>/, one set per flag combination
+PCH_DIR = "/opt/pch"
+
+Language = namedtuple("Language", "name source compiler flags link_flags run pch fork_python time_multiplier "
+                                  "packages aliases")
+
+_languages = None
+
+
+def load_languages(path=None):
+    """Parse a registry file into {name or alias: Language}. Raises ValueError if it is malformed."""
+    path = path or os.environ.get("JUDGE_LANGUAGES") or LANGUAGES_FILE
+    with open(path) as f:
+        entries = json.load(f)
+    languages = {}
+    for name, entry in entries.items():
+        missing = [key for key in ("source", "run") if key not in entry]
+        if missing:
+            raise ValueError(f"{path}: language {name!r} is missing {', '.join(missing)}")
+        lang = Language(
+            name=name.lower(),
+            source=entry["source"],
+            compiler=entry.get("compiler"),
+            flags=list(entry.get("flags", [])),
+            link_flags=list(entry.get("link_flags", [])),
+            run=list(entry["run"]),
+            pch=entry.get("pch"),
+            fork_python=bool(entry.get("fork_python", False)),
+            time_multiplier=float(entry.get("time_multiplier", 1.0)),
+            packages=list(entry.get("packages", [])),
+            aliases=[a.lower() for a in entry.get("aliases", [])],
+        )
+        for key in [lang.name] + lang.aliases:
+            if key in languages:
+                raise ValueError(f"{path}: language name {key!r} is defined twice")
+            languages[key] = lang
+    return languages
+
+
+def get_languages():
+    """The process-wide registry, loaded on first use."""
+    global _languages
+    if _languages is None:
+        _languages = load_languages()
+    return _languages
+
+
+def set_languages(languages):
+    """Replace the process-wide registry (a dict from load_languages, or None to reload)."""
+    global _languages
+    _languages = languages
+
+
+def get_language(name):
+    """The Language for a name or alias (case-insensitive), or None."""
+    return get_languages().get(name.lower())
+
+
+def compile_argv(lang):
+    """Compile command (argv, run from WORKDIR) for a compiled language, or None."""
+    if not lang.compiler:
+        return None
+    pch = ["-I", pch_dir(lang)] if lang.pch else []
+    return [lang.compiler] + lang.flags + pch + [lang.source, "-o", BINARY] + lang.link_flags
+
+
+def pch_dir(lang):
+    return f"{PCH_DIR}/{lang.name}"
+
+
+def image_packages():
+    """Every apt package the registry needs, sorted."""
+    return sorted({p for lang in get_languages().values() for p in lang.packages})
+
+
+def pch_build_steps():
+    """Dockerfile RUN steps that precompile each language's pch header with its own flags."""
+    steps = []
+    unique = {lang.name: lang for lang in get_languages().values()}
+    for name in sorted(unique):
+        lang = unique[name]
+        if not (lang.pch and lang.compiler):
+            continue
+        flags = "".join(f + " " for f in lang.flags)
+        kind = "c" if lang.source.endswith(".c") else "c++"
+        out = f"{pch_dir(lang)}/{lang.pch}.gch"
+        steps.append(
+            f"RUN mkdir -p {os.path.dirname(out)} && \\\n"
+            f"    header=$(echo '#include <{lang.pch}>' | {lang.compiler} {flags}-x {kind} -E -H - 2>&1 >/dev/null"
+            f" | head -n 1 | cut -d ' ' -f 2) && \\\n"
+            f"    {lang.compiler} {flags}-x {kind}-header \"$header\" -o {out}"
+        )
+    return steps
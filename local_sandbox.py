@@ -0,0 +1,346 @@
+# local_sandbox.py
+"""
+Docker-free sandbox backend for trusted-ish traffic (e.g. practice submissions).
+
+A "container" is a host directory plus an optional per-job cgroup; every exec
+runs the command in fresh Linux namespaces on the host:
+
+  - unshare --user --map-root-user --mount --pid --net --ipc --uts, with
+    --kill-child so the whole pid namespace dies with the exec
+  - a throwaway tmpfs root with the host's system directories bind-mounted
+    read-only, the job directory at WORKDIR, /proc, /dev/{null,zero,random,
+    urandom} and the binds, then chroot into it
+  - prlimit CPU, file size and core limits, plus an address-space limit when
+    there is no cgroup to enforce the memory limit
+  - a per-job cgroup (memory limit, pids limit) mounted read-only where
+    judge_run.py looks for it, so CPU time, peak memory and OOM kills are
+    measured the same way as in Docker; the command runs without
+    CAP_SYS_ADMIN, so it cannot remount it (or anything else) writable
+  - kill_processes() kills through that cgroup from the host, since each exec
+    has a pid namespace of its own and `kill -9 -1` cannot reach other execs
+
+Costs a few milliseconds per exec instead of a container start. The isolation
+is weaker than Docker's (the host's /usr and /etc are visible read-only), so
+run it as an unprivileged user and route only traffic you trust to it.
+"""
+import json
+import os
+import shlex
+import shutil
+import subprocess
+import tempfile
+import threading
+import time
+
+from docker_backend import ExecResult, run_process
+
+WORKDIR = "/sandbox/temp"
+CGROUP_MOUNT = "/sys/fs/cgroup"
+DEFAULT_CGROUP_PARENT = "judge"
+# host directories visible (read-only) inside the sandbox; symlinks are recreated as symlinks
+SYSTEM_DIRS = ("/bin", "/sbin", "/lib", "/lib32", "/lib64", "/libx32", "/usr", "/etc")
+DEVICES = ("null", "zero", "random", "urandom")
+SANDBOX_PATH = "/usr/local/sbin:/usr/local/bin:/usr/sbin:/usr/bin:/sbin:/bin"
+PIDS_LIMIT = 256
+STAGE_TMPFS_MB = 64  # the root's own tmpfs (/tmp for compilers); charged to the job's memory
+
+
+class _Job:
+    def __init__(self, name, directory, memory_limit_mb, cpuset_cpus, binds, cgroups, labels):
+        self.name = name
+        self.directory = directory
+        self.memory_limit_mb = memory_limit_mb
+        self.cpuset_cpus = cpuset_cpus
+        self.binds = list(binds or ())
+        self.cgroups = cgroups  # [(host cgroup dir, mount point inside the sandbox)]
+        self.labels = labels
+
+
+class LocalSandboxBackend:
+    """
+    Same interface as the docker backends (see docker_backend), so it can be passed as
+    backend= to execute_code / execute_batch / ContainerPool. Images do not exist here:
+    image_exists() is always true and the host's compilers and python3 are used.
+
+    cgroup_parent is the cgroup (relative to /sys/fs/cgroup, or to each v1 controller) under
+    which per-job cgroups are created; it must be writable by this process. Without it, the
+    memory limit falls back to RLIMIT_AS and running out of memory shows up as a runtime
+    error instead of "Memory Limit Exceeded".
+    """
+
+    name = "local"
+
+    def __init__(self, base_dir=None, cgroup_parent=DEFAULT_CGROUP_PARENT):
+        self.base_dir = base_dir or os.path.join(tempfile.gettempdir(), "judge-sandbox")
+        self.cgroup_parent = cgroup_parent
+        self._jobs = {}
+        self._lock = threading.Lock()
+        self._available = None
+
+    def ping(self):
+        """True if unprivileged namespaces work on this host."""
+        if self._available is None:
+            try:
+                p = subprocess.run(["unshare", "--user", "--map-root-user", "--mount", "--pid", "--fork", "true"],
+                                   capture_output=True, timeout=10)
+                self._available = p.returncode == 0
+            except (OSError, subprocess.TimeoutExpired):
+                self._available = False
+        return self._available
+
+    def image_exists(self, image_name):
+        return True
+
+    def image_id(self, image_name):
+        # the host's toolchain stands in for every image
+        return "local"
+
+    def build_image(self, image_name, dockerfile):
+        return True, None
+
+    def run_container(self, name, image_name, cmd, memory_limit_mb, tmpfs=None, cpuset_cpus=None, binds=None,
+                      labels=None):
+        """
+        Create the job directory (mounted at WORKDIR) and cgroup; cmd (the keepalive) and tmpfs
+        are not needed, as nothing runs between execs. labels are kept next to the job directory
+        for list_containers. Return (name, None) or (None, error).
+        """
+        if not self.ping():
+            return None, "Failed to start sandbox: user namespaces are not available"
+        directory = os.path.join(self.base_dir, name)
+        try:
+            os.makedirs(directory, mode=0o700)
+            os.mkdir(_root_dir(directory))
+            with open(_labels_file(directory), "w") as f:
+                json.dump(dict(labels or {}), f)
+        except OSError as e:
+            return None, f"Failed to start sandbox: {e}"
+        job = _Job(name, directory, memory_limit_mb, cpuset_cpus, binds,
+                   _create_cgroups(self.cgroup_parent, name, memory_limit_mb) if self.cgroup_parent else [],
+                   dict(labels or {}))
+        with self._lock:
+            self._jobs[name] = job
+        return name, None
+
+    def remove_container(self, container):
+        """Remove a job; jobs left behind by another (e.g. crashed) process are found by name."""
+        with self._lock:
+            job = self._jobs.pop(container, None)
+        if job is not None:
+            directory, cgroups = job.directory, job.cgroups
+        elif os.path.isdir(os.path.join(self.base_dir, os.path.basename(container))):
+            directory = os.path.join(self.base_dir, os.path.basename(container))
+            cgroups = _existing_cgroups(self.cgroup_parent, os.path.basename(container)) if self.cgroup_parent else []
+        else:
+            return
+        _remove_cgroups(cgroups)
+        shutil.rmtree(directory, ignore_errors=True)
+        shutil.rmtree(_root_dir(directory), ignore_errors=True)
+        try:
+            os.unlink(_labels_file(directory))
+        except OSError:
+            pass
+
+    def list_containers(self, label):
+        """Jobs under base_dir, from any process, carrying label: [{"id", "name", "labels"}]."""
+        try:
+            names = sorted(os.listdir(self.base_dir))
+        except FileNotFoundError:
+            return []
+        containers = []
+        for name in names:
+            directory = os.path.join(self.base_dir, name)
+            if name.endswith((".root", ".labels")) or not os.path.isdir(directory):
+                continue
+            try:
+                with open(_labels_file(directory)) as f:
+                    labels = json.load(f)
+            except (OSError, ValueError):
+                labels = {}
+            if label in labels:
+                containers.append({"id": name, "name": name, "labels": labels})
+        return containers
+
+    def exec(self, container, cmd, stdin=None, timeout=None, output_limit=None):
+        """
+        Run cmd in a fresh sandbox over the job directory; same semantics as CliBackend.exec,
+        except that a command dropped for exceeding output_limit is already dead (its pid
+        namespace goes with it).
+        """
+        with self._lock:
+            job = self._jobs.get(container)
+        if job is None:
+            return ExecResult(1, b"", f"No such container: {container}\n".encode())
+        return run_process(["sh", "-c", _launch_script(job, timeout), "sandbox", *cmd], stdin, timeout, output_limit)
+
+    def kill_processes(self, container):
+        """
+        Kill every process of a job, in all of its execs, from the host through the job's cgroup.
+        Returns False for a job without a cgroup, whose execs cannot be reached this way.
+        """
+        with self._lock:
+            job = self._jobs.get(container)
+        if job is None or not job.cgroups:
+            return False
+        return all(_kill_cgroup(path) for path, _ in job.cgroups)
+
+
+def _create_cgroups(parent, name, memory_limit_mb):
+    """Per-job cgroup(s) with the memory and pids limits set, or [] if not possible."""
+    limit = str(memory_limit_mb * 1024 * 1024)
+    created = []
+    try:
+        if os.path.exists(f"{CGROUP_MOUNT}/cgroup.controllers"):
+            # cgroup v2: one directory, mounted over /sys/fs/cgroup inside the sandbox
+            parent_dir = f"{CGROUP_MOUNT}/{parent}"
+            os.makedirs(parent_dir, exist_ok=True)
+            _write(f"{parent_dir}/cgroup.subtree_control", "+memory +cpu +pids", ignore_errors=True)
+            path = f"{parent_dir}/{name}"
+            os.mkdir(path)
+            created.append((path, CGROUP_MOUNT))
+            _write(f"{path}/memory.max", limit)
+            _write(f"{path}/memory.swap.max", "0", ignore_errors=True)
+            _write(f"{path}/pids.max", str(PIDS_LIMIT), ignore_errors=True)
+        else:
+            # cgroup v1: one directory per controller, at the paths judge_run.py reads
+            for controller in ("memory", "cpuacct"):
+                path = f"{CGROUP_MOUNT}/{controller}/{parent}/{name}"
+                os.makedirs(path)
+                created.append((path, f"{CGROUP_MOUNT}/{controller}"))
+            _write(f"{created[0][0]}/memory.limit_in_bytes", limit)
+            _write(f"{created[0][0]}/memory.memsw.limit_in_bytes", limit, ignore_errors=True)
+        return created
+    except OSError:
+        _remove_cgroups(created)
+        return []
+
+
+def _existing_cgroups(parent, name):
+    paths = [f"{CGROUP_MOUNT}/{parent}/{name}"] + [f"{CGROUP_MOUNT}/{c}/{parent}/{name}" for c in ("memory", "cpuacct")]
+    return [(path, None) for path in paths if os.path.isdir(path)]
+
+
+def _kill_cgroup(path):
+    """SIGKILL everything in a cgroup: cgroup.kill on v2, otherwise each pid until none is left."""
+    if _write(f"{path}/cgroup.kill", "1", ignore_errors=True):
+        return True
+    for _ in range(100):
+        pids = (_read(f"{path}/cgroup.procs") or "").split()
+        if not pids:
+            return True
+        for pid in pids:
+            try:
+                os.kill(int(pid), 9)
+            except OSError:
+                pass
+        # processes forked meanwhile show up in the next read
+        time.sleep(0.001)
+    return False
+
+
+def _remove_cgroups(cgroups):
+    for path, _ in cgroups:
+        _kill_cgroup(path)
+        for _ in range(100):
+            try:
+                os.rmdir(path)
+                break
+            except FileNotFoundError:
+                break
+            except OSError:
+                # busy until the killed processes are gone
+                time.sleep(0.01)
+
+
+def _launch_script(job, timeout):
+    """
+    Shell script: join the job's cgroups, apply rlimits and CPU affinity, then enter new
+    namespaces and run the inside script, which builds the root and chroots into it.
+    The command to run follows as "$@".
+    """
+    q = shlex.quote
+    file_limit = job.memory_limit_mb * 1024 * 1024
+    limits = [f"--fsize={file_limit}", "--core=0"]
+    if timeout is not None:
+        # backstop for anything judge_run.py does not watch (e.g. a runaway compiler)
+        limits.append(f"--cpu={int(timeout) + 1}")
+    if not job.cgroups:
+        limits.append(f"--as={file_limit}")
+    lines = ["set -e"]
+    lines += [f"echo $$ > {q(path + '/cgroup.procs')}" for path, _ in job.cgroups]
+    launcher = ["prlimit", *limits, "--"]
+    if job.cpuset_cpus is not None:
+        launcher += ["taskset", "-c", str(job.cpuset_cpus)]
+    launcher += ["unshare", "--user", "--map-root-user", "--mount", "--pid", "--fork", "--kill-child",
+                 "--net", "--ipc", "--uts", "--", "sh", "-c", _inside_script(job), "sandbox"]
+    lines.append("exec " + " ".join(q(a) for a in launcher) + ' "$@"')
+    return "\n".join(lines)
+
+
+def _inside_script(job):
+    q = shlex.quote
+    root = q(_root_dir(job.directory))
+    lines = [
+        "set -e",
+        f"mount -t tmpfs -o size={STAGE_TMPFS_MB}m,mode=755 sandbox {root}",
+        f"cd {root}",
+        f"mkdir -p proc dev tmp sys/fs/cgroup {q(WORKDIR.lstrip('/'))}",
+        "chmod 1777 tmp",
+    ]
+    for d in SYSTEM_DIRS:
+        if os.path.islink(d):
+            lines.append(f"ln -s {q(os.readlink(d))} {q(d.lstrip('/'))}")
+        elif os.path.isdir(d):
+            lines.append(_bind(d, d, read_only=True))
+    for dev in DEVICES:
+        lines.append(f"touch dev/{dev} && mount --bind /dev/{dev} dev/{dev}")
+    lines.append(_bind(job.directory, WORKDIR))
+    for spec in job.binds:
+        host, target, *options = spec.split(":")
+        lines.append(_bind(host, target, read_only="ro" in options))
+    for path, target in job.cgroups:
+        # read-only: the limits live in these files
+        lines.append(_bind(path, target, read_only=True))
+    lines.append("mount -t proc proc proc")
+    # without CAP_SYS_ADMIN the command cannot remount (or unmount) any of the above
+    lines.append(f"exec setpriv --bounding-set -sys_admin chroot . "
+                 f"/usr/bin/env -i PATH={SANDBOX_PATH} HOME={WORKDIR} /bin/sh -c 'cd \"$HOME\" && exec \"$@\"' sandbox \"$@\"")
+    return "\n".join(lines)
+
+
+def _root_dir(directory):
+    # empty mount point for the per-exec tmpfs root, next to the job directory
+    return directory + ".root"
+
+
+def _labels_file(directory):
+    # outside the job directory, which the sandboxed program can write to
+    return directory + ".labels"
+
+
+def _bind(host, target, read_only=False):
+    q = shlex.quote
+    target = q(target.lstrip("/"))
+    line = f"mkdir -p {target} && mount --bind {q(host)} {target}"
+    if read_only:
+        line += f" && mount -o remount,bind,ro,nosuid,nodev {target}"
+    return line
+
+
+def _read(path):
+    try:
+        with open(path) as f:
+            return f.read()
+    except OSError:
+        return None
+
+
+def _write(path, value, ignore_errors=False):
+    try:
+        with open(path, "w") as f:
+            f.write(value)
+        return True
+    except OSError:
+        if not ignore_errors:
+            raise
+        return False
@@ -0,0 +1,237 @@
+# metrics.py
+"""
+Process-wide metrics for the runner: counters and histograms with labels,
+exported as Prometheus text or JSON, plus hooks for attaching tracing.
+
+one.execute_batch (and execute_code) time every phase (image, admission,
+container, upload, compile, run, check, cleanup) through a PhaseTimer, which records
+  judge_phase_seconds{phase, language}   histogram
+  judge_runs_total{language, verdict}    counter, one per test case
+in the registry returned by get_registry(), and calls every registered hook.
+"""
+import json
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+class Hook:
+    """
+    Base class for tracing hooks; override what you need and pass an instance to
+    MetricsRegistry.add_hook(). Exceptions raised by hooks are ignored.
+    """
+
+    def phase_started(self, phase, labels):
+        """Called when a phase begins. The return value is passed to phase_finished."""
+        return None
+
+    def phase_finished(self, phase, labels, duration_s, error, context):
+        """error is the exception that ended the phase, or None."""
+
+    def run_finished(self, result, labels):
+        """Called once per test case with its result dict and {language, verdict}."""
+
+
+class MetricsRegistry:
+    """Thread-safe store of labelled counters and histograms."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._meta = {}        # name -> (kind, help, buckets)
+        self._counters = {}    # (name, labels) -> value
+        self._histograms = {}  # (name, labels) -> [bucket counts..., sum, count]
+        self._hooks = []
+
+    def describe(self, name, kind, help_text, buckets=DEFAULT_BUCKETS):
+        """Declare a metric; kind is "counter" or "histogram"."""
+        with self._lock:
+            self._meta[name] = (kind, help_text, tuple(buckets) if kind == "histogram" else None)
+
+    def inc(self, name, labels=None, value=1):
+        key = (name, _label_key(labels))
+        with self._lock:
+            self._meta.setdefault(name, ("counter", "", None))
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def observe(self, name, value, labels=None):
+        key = (name, _label_key(labels))
+        with self._lock:
+            buckets = self._meta.setdefault(name, ("histogram", "", DEFAULT_BUCKETS))[2]
+            h = self._histograms.get(key)
+            if h is None:
+                h = self._histograms[key] = [0] * len(buckets) + [0.0, 0]
+            for i, bound in enumerate(buckets):
+                if value <= bound:
+                    h[i] += 1
+            h[-2] += value
+            h[-1] += 1
+
+    def reset(self):
+        with self._lock:
+            self._counters.clear()
+            self._histograms.clear()
+
+    # hooks
+
+    def add_hook(self, hook):
+        with self._lock:
+            self._hooks = self._hooks + [hook]
+
+    def remove_hook(self, hook):
+        with self._lock:
+            self._hooks = [h for h in self._hooks if h is not hook]
+
+    @property
+    def hooks(self):
+        return self._hooks
+
+    # export
+
+    def snapshot(self):
+        """JSON-serializable dump: {name: {type, help, samples: [{labels, value | buckets, sum, count}]}}."""
+        with self._lock:
+            out = {name: {"type": kind, "help": help_text, "samples": []}
+                   for name, (kind, help_text, _) in self._meta.items()}
+            for (name, labels), value in sorted(self._counters.items()):
+                out[name]["samples"].append({"labels": dict(labels), "value": value})
+            for (name, labels), h in sorted(self._histograms.items()):
+                buckets = self._meta[name][2]
+                out[name]["samples"].append({
+                    "labels": dict(labels),
+                    "buckets": {str(b): c for b, c in zip(buckets, h)},
+                    "sum": h[-2],
+                    "count": h[-1],
+                })
+        return out
+
+    def to_json(self, indent=None):
+        return json.dumps(self.snapshot(), indent=indent)
+
+    def to_prometheus(self):
+        """Prometheus text exposition format (version 0.0.4)."""
+        lines = []
+        for name, metric in sorted(self.snapshot().items()):
+            if metric["help"]:
+                lines.append(f"# HELP {name} {metric['help']}")
+            lines.append(f"# TYPE {name} {metric['type']}")
+            for sample in metric["samples"]:
+                labels = sample["labels"]
+                if metric["type"] == "counter":
+                    lines.append(f"{name}{_format_labels(labels)} {_num(sample['value'])}")
+                    continue
+                for bound, count in sample["buckets"].items():
+                    lines.append(f"{name}_bucket{_format_labels(labels, le=bound)} {count}")
+                lines.append(f"{name}_bucket{_format_labels(labels, le='+Inf')} {sample['count']}")
+                lines.append(f"{name}_sum{_format_labels(labels)} {_num(sample['sum'])}")
+                lines.append(f"{name}_count{_format_labels(labels)} {sample['count']}")
+        return "\n".join(lines) + "\n"
+
+
+class PhaseTimer:
+    """Times the phases of one execute_batch call, feeding the registry and its hooks."""
+
+    def __init__(self, language, registry=None):
+        self.language = language
+        self.registry = registry or get_registry()
+        self.phases = {}  # phase -> seconds, summed over repeats
+
+    @contextmanager
+    def phase(self, name, into=None):
+        """Time the enclosed block as phase `name`; also store the duration in the dict `into`."""
+        labels = {"phase": name, "language": self.language}
+        hooks = self.registry.hooks
+        contexts = [_call(h.phase_started, name, labels) for h in hooks]
+        error = None
+        start = time.perf_counter()
+        try:
+            yield
+        except BaseException as e:
+            error = e
+            raise
+        finally:
+            duration = time.perf_counter() - start
+            self.phases[name] = self.phases.get(name, 0.0) + duration
+            if into is not None:
+                into[name] = duration
+            self.registry.observe("judge_phase_seconds", duration, labels)
+            for h, context in zip(hooks, contexts):
+                _call(h.phase_finished, name, labels, duration, error, context)
+
+    def run_finished(self, result, verdict):
+        labels = {"language": self.language, "verdict": verdict}
+        self.registry.inc("judge_runs_total", labels)
+        for h in self.registry.hooks:
+            _call(h.run_finished, result, labels)
+
+
+def start_http_server(port, host="", registry=None):
+    """Serve /metrics (Prometheus text) and /metrics.json on a daemon thread. Returns the server."""
+    registry = registry or get_registry()
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?")[0] == "/metrics.json":
+                body, ctype = registry.to_json().encode(), "application/json"
+            elif self.path.split("?")[0] == "/metrics":
+                body, ctype = registry.to_prometheus().encode(), "text/plain; version=0.0.4"
+            else:
+                self.send_error(404)
+                return
+            self.send_response(200)
+            self.send_header("Content-Type", ctype)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+    return server
+
+
+def _label_key(labels):
+    return tuple(sorted((labels or {}).items()))
+
+
+def _format_labels(labels, **extra):
+    items = list(labels.items()) + list(extra.items())
+    if not items:
+        return ""
+    escaped = (str(v).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"') for _, v in items)
+    return "{" + ",".join(f'{k}="{v}"' for (k, _), v in zip(items, escaped)) + "}"
+
+
+def _num(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def _call(fn, *args):
+    try:
+        return fn(*args)
+    except Exception:
+        return None
+
+
+_registry = MetricsRegistry()
+_registry.describe("judge_phase_seconds", "histogram", "Time spent in each phase of execute_code.")
+_registry.describe("judge_runs_total", "counter", "Test cases judged, by language and verdict.")
+_registry.describe("judge_containers_reaped_total", "counter",
+                   "Sandbox containers removed by the reaper, after a run (finished) or by the sweeper (swept).")
+_registry.describe("judge_admission_total", "counter",
+                   "Sandboxes admitted, or rejected for lack of room (too_large, queue_full, timeout).")
+_registry.describe("judge_admission_wait_seconds", "histogram", "Time sandboxes waited for memory and CPU.")
+
+
+def get_registry():
+    return _registry
+
+
+def set_registry(registry):
+    """Replace the process-wide registry (e.g. with a fresh one in tests)."""
+    global _registry
+    _registry = registry
@@ -1,259 +1,1030 @@
 # robust_subprocess_runner.py
 import subprocess
-import tempfile
 import os
-import re
+import io
+import json
+import math
+import shlex
+import time
 import uuid
-import shutil
+import queue
+import tarfile
+import threading
 import traceback
+from collections import namedtuple
+from contextlib import nullcontext
+from functools import partial
+
+from checker import MODES as CHECKER_MODES, check_output
+from docker_backend import get_backend
+from image_manager import get_image_manager
+from languages import BINARY, compile_argv, get_language, image_packages, pch_build_steps
+from metrics import PhaseTimer
+from reaper import container_labels, get_reaper
+from verdict_cache import input_digest
 
 # configuration
 IMAGE_NAME = "sandbox-image:latest"
 WORKDIR = "/sandbox/temp"
+# a run is killed once stdout or stderr goes past this ("Output Limit Exceeded")
+OUTPUT_LIMIT_BYTES = 64 * 1024 * 1024
+# results carry at most this much of each stream, plus the full size
+OUTPUT_PREVIEW_BYTES = 64 * 1024
+# the judge_run.py stats line is read from the last bytes of stderr
+STATS_TAIL_BYTES = 4096
+# wall-clock limit for a run, on top of its CPU-time limit (catches sleeping programs)
+WALL_LIMIT_FACTOR = 2
+WALL_LIMIT_EXTRA_MS = 1000
+# memory limit of compile sandboxes (compile_submission)
+COMPILE_MEMORY_MB = 1024
+# files staged in the sandbox's tmpfs (test inputs, a precompiled binary) are charged to its memory
+# cgroup; beyond STAGED_FREE_BYTES the sandbox gets them on top of memory_limit_mb, rounded up to
+# STAGED_MEMORY_STEP_MB (the most the program may gain) so that pooled sandboxes are still shared
+STAGED_FREE_BYTES = 1024 * 1024
+STAGED_MEMORY_STEP_MB = 16
+# lifetime of a sandbox's keepalive (pid 1), in seconds; a batch adds each test case's host timeout
+KEEPALIVE_S = 300
 
-def ensure_image_exists(image_name):
-    """Return (True, None) if exists or built; (False, error_message) on failure."""
-    try:
-        # check image
-        proc = subprocess.run(["docker", "image", "inspect", image_name],
-                              capture_output=True, text=True)
-        if proc.returncode == 0:
-            return True, None
-        # try to build a minimal image if missing
-        dockerfile = r'''
+# in-sandbox run wrapper: cgroup CPU/memory accounting and a millisecond CPU-time watchdog
+with open(os.path.join(os.path.dirname(os.path.abspath(__file__)), "judge_run.py")) as _f:
+    JUDGE_RUN_SOURCE = _f.read()
+# judge_run.py mode for Python: fork the wrapper's interpreter instead of starting python3
+FORK_PYTHON = "--fork-python"
+
+# output of compile_submission, input of execute_batch(compiled=...): binary is None for
+# interpreted languages and failed compiles, compile_error holds the compiler output on failure
+CompiledProgram = namedtuple("CompiledProgram", "language code binary compile_error compile_time_ms")
+
+class CancelToken:
+    """
+    Cooperative cancellation of an execute_batch / execute_stream call. cancel() kills the
+    program running in the sandbox and the remaining test cases are reported as "Cancelled";
+    the sandbox is then released as after any other run.
+    """
+
+    def __init__(self):
+        self.cancelled = False
+        self._lock = threading.Lock()
+        self._callbacks = []
+
+    def cancel(self):
+        """Cancel; registered callbacks run on the calling thread."""
+        with self._lock:
+            if self.cancelled:
+                return
+            self.cancelled = True
+            callbacks, self._callbacks = self._callbacks, []
+        for fn in callbacks:
+            try:
+                fn()
+            except Exception:
+                pass
+
+    def on_cancel(self, fn):
+        """Call fn() on cancel (at once if already cancelled). Returns a function unregistering it."""
+        with self._lock:
+            if not self.cancelled:
+                self._callbacks.append(fn)
+                return partial(self._discard, fn)
+        fn()
+        return lambda: None
+
+    def _discard(self, fn):
+        with self._lock:
+            if fn in self._callbacks:
+                self._callbacks.remove(fn)
+
+# (image_name, compiler) -> first line of `<compiler> --version`, looked up once per process
+_compiler_versions = {}
+
+# minimal image built when the sandbox image is missing: the packages of every language in
+# languages.json and its precompiled headers, built with each language's own flags
+SANDBOX_DOCKERFILE = r'''
 FROM ubuntu:22.04
 ENV DEBIAN_FRONTEND=noninteractive
 RUN apt-get update && \
-    apt-get install -y --no-install-recommends gcc g++ python3 coreutils time && \
+    apt-get install -y --no-install-recommends {packages} && \
     apt-get clean && rm -rf /var/lib/apt/lists/*
+{pch_steps}
 WORKDIR /sandbox/temp
-'''
-        build = subprocess.run(["docker", "build", "-t", image_name, "-"],
-                               input=dockerfile, text=True, capture_output=True)
-        if build.returncode != 0:
-            return False, f"docker build failed: {build.stderr or build.stdout}"
-        return True, None
+'''.format(packages=" ".join(sorted(set(image_packages()) | {"python3", "coreutils", "time"})),
+           pch_steps="\n".join(pch_build_steps()))
+
+def ensure_image_exists(image_name, backend=None):
+    """
+    Return (True, None) if exists or built; (False, error_message) on failure.
+    Checks (and may build) on every call; the runners use image_manager instead.
+    """
+    backend = backend or get_backend()
+    try:
+        # check image
+        if backend.image_exists(image_name):
+            return True, None
+        # try to build a minimal image if missing
+        return backend.build_image(image_name, SANDBOX_DOCKERFILE)
     except FileNotFoundError as e:
         return False, "docker CLI not found"
     except Exception as e:
         return False, f"ensure_image_exists error: {e}"
 
-def safe_remove_container(container_name):
+def safe_remove_container(container_name, backend=None):
     try:
-        subprocess.run(["docker", "rm", "-f", container_name], capture_output=True, text=True)
+        (backend or get_backend()).remove_container(container_name)
     except Exception:
         pass
 
+def start_container(container_name, image_name, memory_limit_mb, keepalive=str(KEEPALIVE_S), backend=None,
+                    cpuset_cpus=None, binds=None):
+    """
+    Start a detached sandbox container, optionally pinned to cpuset_cpus (e.g. "3") and with
+    extra volumes (binds, e.g. TestDataCache.binds), labelled for the reaper's sweeper.
+    Return (container_id, None) or (None, error_message).
+    """
+    backend = backend or get_backend()
+    # start detached container (root inside)
+    # WORKDIR is a tmpfs (charged to the container's memory limit), so nothing touches overlayfs
+    try:
+        return backend.run_container(container_name, image_name, ["sleep", keepalive], memory_limit_mb,
+                                     tmpfs={WORKDIR: f"rw,exec,size={memory_limit_mb}m,mode=1777"},
+                                     cpuset_cpus=cpuset_cpus, binds=binds, labels=container_labels(keepalive))
+    except FileNotFoundError:
+        return None, "docker CLI not found"
+
+def _decode(data):
+    return (data or b"").decode("utf-8", "replace")
+
+def _new_result():
+    return {
+        "success": False,
+        "timed_out": False,
+        "exit_code": None,
+        "stdout": "",
+        "stderr": "",
+        "stdout_size": 0,
+        "output_truncated": False,
+        "cpu_time_ms": None,
+        "wall_time_ms": None,
+        "peak_memory_mb": None,
+        "checker_passed": None,
+        "checker_message": "",
+        "compile_error": "",
+        "compile_time_ms": None,
+        "cached": False,
+        "err_message": ""
+    }
+
+def _normalize_stdin(stdin):
+    # binary file objects, paths and bytes are streamed as they are
+    if hasattr(stdin, "read") or isinstance(stdin, (bytes, os.PathLike)):
+        return stdin
+    try:
+        if stdin is None:
+            stdin = ""
+        stdin = stdin.replace("\r\n", "\n")
+        if stdin and not stdin.endswith("\n"):
+            stdin += "\n"
+    except Exception:
+        stdin = str(stdin)
+    return stdin
+
+def _data_size(data):
+    """Bytes upload_files sends for data (a file object from its current position)."""
+    if isinstance(data, str):
+        return len(data.encode("utf-8"))
+    if isinstance(data, bytes):
+        return len(data)
+    if isinstance(data, os.PathLike):
+        return os.path.getsize(data)
+    start = data.tell()
+    size = data.seek(0, io.SEEK_END) - start
+    data.seek(start)
+    return size
+
+def _sandbox_memory_mb(memory_limit_mb, staged_bytes):
+    """Sandbox memory for memory_limit_mb left to the program next to staged_bytes of staged files."""
+    if staged_bytes <= STAGED_FREE_BYTES:
+        return memory_limit_mb
+    step = STAGED_MEMORY_STEP_MB * 1024 * 1024
+    return memory_limit_mb + -(-staged_bytes // step) * STAGED_MEMORY_STEP_MB
+
+def _add_to_tar(tar, name, data, mode=0o644):
+    info = tarfile.TarInfo(name)
+    info.mode = mode
+    info.mtime = int(time.time())
+    if isinstance(data, str):
+        data = data.encode("utf-8")
+    if isinstance(data, bytes):
+        info.size = len(data)
+        tar.addfile(info, io.BytesIO(data))
+    elif isinstance(data, os.PathLike):
+        with open(data, "rb") as f:
+            info.size = os.fstat(f.fileno()).st_size
+            tar.addfile(info, f)
+    else:
+        # seekable binary file object: send from the current position to the end
+        start = data.tell()
+        info.size = data.seek(0, io.SEEK_END) - start
+        data.seek(start)
+        tar.addfile(info, data)
+
+def upload_files(container_id, files, backend=None):
+    """
+    Stream files into WORKDIR with a single `docker exec ... tar -x` (docker cp cannot write
+    into the tmpfs WORKDIR). files is a list of (name, data) or (name, data, mode) where data
+    is str, bytes, an os.PathLike path or a seekable binary file object. Files are packed on
+    the fly, so large inputs are copied in chunks rather than held in memory.
+    Return None or an error message.
+    """
+    def write_tar(fileobj):
+        with tarfile.open(fileobj=fileobj, mode="w|") as tar:
+            for entry in files:
+                _add_to_tar(tar, *entry)
+
+    res = (backend or get_backend()).exec(container_id, ["tar", "-xf", "-", "-C", WORKDIR], stdin=write_tar)
+    if res.exit_code != 0:
+        return _decode(res.stderr).strip() or f"tar exited with {res.exit_code}"
+    return None
+
+def _compile_command(lang):
+    """Shell command compiling a languages.Language's source into BINARY."""
+    argv = shlex.join(compile_argv(lang))
+    # cd to WORKDIR so compiled binary is there
+    return f"cd {WORKDIR} && {argv} 2>&1"
+
+def _compile(backend, container_id, lang):
+    """Compile inside the container. Return (True, "") or (False, compiler_output)."""
+    cp = backend.exec(container_id, ["sh", "-c", _compile_command(lang)])
+    if cp.exit_code != 0:
+        # compilation failed: capture both stdout/stderr
+        return False, _decode(cp.stdout) + _decode(cp.stderr)
+    return True, ""
+
+def _compiler_version(backend, container_id, image_name, compiler):
+    key = (image_name, compiler)
+    if key not in _compiler_versions:
+        p = backend.exec(container_id, [compiler, "--version"])
+        if p.exit_code != 0:
+            return None
+        _compiler_versions[key] = _decode(p.stdout).splitlines()[0] if p.stdout else ""
+    return _compiler_versions[key]
+
+def _compile_cached(backend, compile_cache, container_id, image_name, lang, code):
+    """
+    Like _compile, but serve the binary (or the compile error) from compile_cache when possible.
+    A hit copies the cached binary into the container and skips the compiler entirely.
+    """
+    version = _compiler_version(backend, container_id, image_name, lang.compiler)
+    if version is None:
+        return _compile(backend, container_id, lang)
+    key = compile_cache.key(lang.name, code, version, lang.flags + lang.link_flags)
+
+    entry = compile_cache.get(key)
+    if entry is not None:
+        if not entry["ok"]:
+            return False, entry["compile_error"]
+        err = upload_files(container_id, [(BINARY, entry["binary"], 0o755)], backend=backend)
+        if err is None:
+            return True, ""
+        # could not place the cached binary, fall back to compiling
+
+    ok, compile_out = _compile(backend, container_id, lang)
+    if not ok:
+        compile_cache.put_error(key, compile_out)
+        return False, compile_out
+    cat = backend.exec(container_id, ["cat", f"{WORKDIR}/{BINARY}"])
+    if cat.exit_code == 0:
+        compile_cache.put_binary(key, cat.stdout)
+    return True, ""
+
+def compile_submission(language, code, image_name=IMAGE_NAME, memory_limit_mb=COMPILE_MEMORY_MB,
+                       compile_cache=None, backend=None, cpuset_cpus=None, pool=None, reaper=None, images=None,
+                       admission=None):
+    """
+    Compile code in a sandbox of its own and copy the binary out, so that execute_batch
+    (compiled=...) can run it in another sandbox without a compile step. Interpreted languages
+    need no sandbox here. Returns (CompiledProgram, None), also when compilation failed (see
+    its compile_error), or (None, error_message) if the sandbox itself failed.
+    images is an ImageManager and admission an AdmissionController, as in execute_batch.
+    """
+    backend = backend or get_backend()
+    lang = get_language(language)
+    if lang is None:
+        return None, f"Unsupported language: {language}"
+    if not lang.compiler:
+        return CompiledProgram(lang.name, code, None, "", None), None
+    timer = PhaseTimer(lang.name)
+    container_name = f"judge_compile_{uuid.uuid4().hex[:8]}"
+    container_id = None
+    reservation = None
+    try:
+        with timer.phase("image"):
+            image_ref, err = (images or get_image_manager()).resolve(image_name, backend)
+        if err:
+            return None, err
+        if admission is not None:
+            with timer.phase("admission"):
+                reservation, err = admission.acquire(memory_limit_mb)
+            if err:
+                return None, err
+        with timer.phase("container"):
+            if pool is not None:
+                container_id, err = pool.acquire(image_ref, memory_limit_mb, cpuset_cpus=cpuset_cpus)
+            else:
+                container_id, err = start_container(container_name, image_ref, memory_limit_mb, backend=backend,
+                                                    cpuset_cpus=cpuset_cpus)
+        if err:
+            container_id = None
+            return None, err
+        with timer.phase("upload"):
+            err = upload_files(container_id, [(lang.source, code)], backend=backend)
+        if err:
+            return None, f"Uploading files failed: {err}"
+        with timer.phase("compile"):
+            if compile_cache is not None:
+                ok, compile_out = _compile_cached(backend, compile_cache, container_id, image_ref, lang, code)
+            else:
+                ok, compile_out = _compile(backend, container_id, lang)
+        compile_time_ms = round(timer.phases["compile"] * 1000.0, 3)
+        if not ok:
+            return CompiledProgram(lang.name, code, None, compile_out, compile_time_ms), None
+        cat = backend.exec(container_id, ["cat", f"{WORKDIR}/{BINARY}"])
+        if cat.exit_code != 0:
+            return None, f"Reading the compiled binary failed: {_decode(cat.stderr).strip()}"
+        return CompiledProgram(lang.name, code, cat.stdout, "", compile_time_ms), None
+    except Exception as e:
+        return None, f"Runner exception: {e}\n{traceback.format_exc()}"
+    finally:
+        release = partial(admission.release, reservation) if reservation is not None else None
+        try:
+            if container_id is not None:
+                with timer.phase("cleanup"):
+                    if pool is not None:
+                        pool.release(container_id)
+                    else:
+                        # the sandbox's memory stays booked until the container is really gone
+                        (reaper or get_reaper()).reap(container_name, backend, on_removed=release)
+                        release = None
+        except Exception:
+            pass
+        if release is not None:
+            release()
+
+def _run_main(lang, python_fork=False):
+    """Run command for a languages.Language; python_fork only applies to CPython entries."""
+    if python_fork and lang.fork_python:
+        return shlex.join([FORK_PYTHON] + lang.run[1:])
+    return shlex.join(lang.run)
+
+def _wall_limit_ms(time_limit_s):
+    return int(time_limit_s * 1000) * WALL_LIMIT_FACTOR + WALL_LIMIT_EXTRA_MS
+
+def _host_timeout(time_limit_s):
+    """Seconds to wait for a run on the host side before giving up on the exec."""
+    return _wall_limit_ms(time_limit_s) / 1000.0 + 4
+
+def _batch_keepalive(time_limit_s, cases):
+    """Keepalive outlasting a batch whose every test case runs to its host timeout, after the compile."""
+    return str(KEEPALIVE_S + int(math.ceil(cases * _host_timeout(time_limit_s))))
+
+def _run_argv(run_main, input_name, time_limit_s, marker):
+    """
+    argv running run_main under judge_run.py; its stats line on stderr starts with marker.
+    A run_main starting with FORK_PYTHON runs the script in a child of the wrapper's interpreter.
+    """
+    cmd = shlex.split(run_main)
+    if cmd[0] != FORK_PYTHON:
+        cmd = ["--"] + cmd
+    return (["python3", "-c", JUDGE_RUN_SOURCE, marker, WORKDIR, input_name,
+             str(int(round(time_limit_s * 1000))), str(_wall_limit_ms(time_limit_s))] + cmd)
+
+def _new_marker():
+    # random per run, so program output cannot be mistaken for the wrapper's stats line
+    return f"judge-stats-{uuid.uuid4().hex}"
+
+def _parse_stats(stderr_tail, marker):
+    """The judge_run.py stats dict from the end of stderr, or None if it is missing."""
+    idx = stderr_tail.rfind(marker.encode("ascii") + b" ")
+    if idx < 0:
+        return None
+    try:
+        return json.loads(stderr_tail[idx + len(marker) + 1:].split(b"\n", 1)[0])
+    except ValueError:
+        return None
+
+def _run_program(backend, container_id, run_main, input_name, time_limit_s, memory_limit_mb, result,
+                 output_limit_bytes=OUTPUT_LIMIT_BYTES, check=None, timer=None, phases=None, on_run=None):
+    """
+    Run one program invocation with input_name as stdin and fill result in place.
+    check(stdout_file) -> (ok, message) compares the full output of a successful run.
+    timer (a metrics.PhaseTimer) times the "run" and "check" phases into the dict phases.
+    on_run(result, stdout) sees the classified but unchecked result and the full stdout.
+    Returns False if the container should not be trusted afterwards (host-side timeout).
+    """
+    marker = _new_marker()
+
+    # execute inside container, interactive not needed because input redirected from file
+    try:
+        with _phase(timer, "run", phases):
+            exec_proc = backend.exec(container_id, _run_argv(run_main, input_name, time_limit_s, marker),
+                                     timeout=_host_timeout(time_limit_s), output_limit=output_limit_bytes)
+    except subprocess.TimeoutExpired as te:
+        # Host side timeout — best effort cleanup and report TLE
+        result["timed_out"] = True
+        result["err_message"] = f"Host-side timeout expired: {te}"
+        return False
+
+    try:
+        _fill_run_result(result, exec_proc, time_limit_s, memory_limit_mb, output_limit_bytes, marker)
+        if on_run is not None:
+            on_run(result, exec_proc.stdout)
+        if check is not None and result["success"]:
+            with _phase(timer, "check", phases):
+                _apply_checker(result, exec_proc.stdout, check)
+    finally:
+        _close_output(exec_proc)
+    if exec_proc.output_exceeded:
+        # only the exec session was dropped; the program is still printing inside the container
+        return _kill_programs(backend, container_id)
+    return True
+
+def _phase(timer, name, phases=None):
+    return timer.phase(name, into=phases) if timer is not None else nullcontext()
+
+def _verdict(result):
+    """
+    Short verdict label for metrics: OK, CE, TLE, MLE, OLE, RE, WA, SKIPPED, CANCELLED, BUSY,
+    CHECKER_ERROR or ERROR.
+    """
+    if result["success"]:
+        return "OK"
+    if result["compile_error"] or result["err_message"] == "Compilation failed":
+        return "CE"
+    if result["timed_out"]:
+        return "TLE"
+    for prefix, verdict in (("Memory Limit", "MLE"), ("Output Limit", "OLE"), ("Runtime Error", "RE"),
+                            ("Wrong Answer", "WA"), ("Skipped", "SKIPPED"), ("Cancelled", "CANCELLED"),
+                            ("Judge busy", "BUSY"),
+                            ("Checker error", "CHECKER_ERROR")):
+        if result["err_message"].startswith(prefix):
+            return verdict
+    return "ERROR"
+
+def _kill_programs(backend, container_id):
+    """Kill every process in the container except the keepalive (pid 1). Returns True on success."""
+    try:
+        return backend.kill_processes(container_id)
+    except Exception:
+        return False
+
+def _apply_checker(result, stdout, check):
+    """
+    Compare the whole program output (not just the preview) and record the verdict.
+    check returns (ok, message); ok is None when a special judge's checker itself failed.
+    """
+    if hasattr(stdout, "seek"):
+        stdout.seek(0)
+    ok, message = check(stdout)
+    result["checker_passed"] = ok
+    result["checker_message"] = message
+    if ok is None:
+        result["success"] = False
+        result["err_message"] = f"Checker error: {message}"
+    elif not ok:
+        result["success"] = False
+        result["err_message"] = f"Wrong Answer: {message}"
+
+def _verdict_keys(verdict_cache, image_id, lang, code, inputs, input_hashes, time_limit_s, memory_limit_mb,
+                  output_limit_bytes, python_fork):
+    """One VerdictCache key per test case; image_id is the pinned image digest."""
+    options = [lang.compiler, lang.flags, lang.link_flags, lang.run, output_limit_bytes,
+               bool(python_fork and lang.fork_python)]
+    digests = input_hashes if input_hashes is not None else [input_digest(stdin) for stdin in inputs]
+    return [verdict_cache.key(lang.name, code, digest, time_limit_s, memory_limit_mb, image_id, options)
+            for digest in digests]
+
+def _serve_cached(verdict_cache, key, result, time_limit_s, memory_limit_mb, check):
+    """Fill result from verdict_cache (checking the cached stdout again). Returns False on a miss."""
+    hit = verdict_cache.get(key, time_limit_s, memory_limit_mb, need_output=check is not None)
+    if hit is None:
+        return False
+    cached, stdout = hit
+    result.update(cached, cached=True)
+    if check is not None and result["success"]:
+        _apply_checker(result, io.BytesIO(stdout), check)
+    return True
+
+def _store_unless_cancelled(verdict_cache, key, cancel, result, stdout):
+    # a run killed by a cancel looks like a runtime error; it must not be cached as one
+    if cancel is None or not cancel.cancelled:
+        verdict_cache.put(key, result, stdout)
+
+def _compile_failed(results, keys, served, verdict_cache, compile_error, compile_time_ms):
+    """Report a failed compile in every test case not served from the verdict cache (and cache it)."""
+    for i, r in enumerate(results):
+        if i in served:
+            continue
+        r.update(compile_error=compile_error, compile_time_ms=compile_time_ms, err_message="Compilation failed")
+        if keys[i] is not None:
+            verdict_cache.put(keys[i], r)
+    return results
+
+def _make_checks(expected_outputs, count, checker_mode, checker_eps, special_judge=None, inputs=None,
+                 input_hashes=None, testdata=None):
+    """One check callable (or None) per test case, for _run_program."""
+    if special_judge is not None:
+        # every test case goes through the checker, with or without an expected output
+        expected_outputs = expected_outputs or [None] * count
+        return [partial(special_judge.check, input=inputs[i], expected=expected_outputs[i],
+                        input_hash=None if input_hashes is None else input_hashes[i], testdata=testdata)
+                for i in range(count)]
+    if expected_outputs is None:
+        return [None] * count
+    return [None if expected is None else partial(check_output, expected, mode=checker_mode, eps=checker_eps)
+            for expected in expected_outputs]
+
+def _close_output(run):
+    for data in (run.stdout, run.stderr):
+        if hasattr(data, "close"):
+            data.close()
+
+def _output_parts(data, preview_bytes, tail_bytes=0):
+    """(head, tail, size) of captured output, given as bytes or a rewound spill file."""
+    if data is None or isinstance(data, (bytes, bytearray)):
+        data = data or b""
+        return data[:preview_bytes], data[-tail_bytes:] if tail_bytes else b"", len(data)
+    head = data.read(preview_bytes)
+    size = data.seek(0, io.SEEK_END)
+    tail = b""
+    if tail_bytes:
+        data.seek(max(0, size - tail_bytes))
+        tail = data.read()
+    return head, tail, size
+
+def _fill_run_result(result, run, time_limit_s, memory_limit_mb, output_limit_bytes=OUTPUT_LIMIT_BYTES,
+                     marker=None):
+    """
+    Classify one finished run (an ExecResult from the backend) into result.
+    Only the first OUTPUT_PREVIEW_BYTES of each stream are kept; stdout_size has the full size.
+    marker identifies the judge_run.py stats line at the end of stderr.
+    """
+    # collect outputs
+    result["exit_code"] = run.exit_code
+    stdout_head, _, stdout_size = _output_parts(run.stdout, OUTPUT_PREVIEW_BYTES)
+    stderr_head, stderr_tail, stderr_size = _output_parts(run.stderr, OUTPUT_PREVIEW_BYTES, STATS_TAIL_BYTES)
+    stdout_output = _decode(stdout_head)
+    stderr_output = _decode(stderr_head)
+    result["stdout_size"] = stdout_size
+    result["output_truncated"] = stdout_size > len(stdout_head) or stderr_size > len(stderr_head)
+
+    # measurements from the wrapper's stats line (cgroup cpu.stat / memory.peak / memory.events)
+    stats = _parse_stats(stderr_tail, marker) if marker else None
+    if stats:
+        result["cpu_time_ms"] = stats.get("cpu_time_ms")
+        result["wall_time_ms"] = stats.get("wall_time_ms")
+        if stats.get("peak_memory_kb") is not None:
+            result["peak_memory_mb"] = stats["peak_memory_kb"] / 1024.0
+
+    # clean program stderr by removing the stats line
+    if marker:
+        idx = stderr_head.rfind(b"\n" + marker.encode("ascii"))
+        if idx >= 0:
+            stderr_output = _decode(stderr_head[:idx])
+
+    result["stdout"] = stdout_output
+    result["stderr"] = stderr_output
+
+    # determine statuses
+    exit_code = run.exit_code
+    if run.output_exceeded:
+        result["err_message"] = f"Output Limit Exceeded (> {output_limit_bytes} bytes)"
+        result["success"] = False
+        return
+    if exit_code == 124:
+        result["timed_out"] = True
+        if stats and stats.get("limit_exceeded") == "wall":
+            result["err_message"] = f"Time Limit Exceeded (wall clock > {_wall_limit_ms(time_limit_s) / 1000.0}s)"
+        else:
+            result["err_message"] = f"Time Limit Exceeded (> {time_limit_s}s)"
+        result["success"] = False
+        return
+    if exit_code == 137 or (stats and stats.get("oom_killed")):
+        result["err_message"] = f"Memory Limit Exceeded (> {memory_limit_mb} MB)"
+        result["success"] = False
+        return
+    if exit_code != 0:
+        result["err_message"] = f"Runtime Error (Exit Code: {exit_code})"
+        result["success"] = False
+        return
+
+    # success
+    result["success"] = True
+
 def execute_code(language='python',
                  code='print("this is test code\\nsubmit ur own code, this is the default code")',
                  stdin='',
                  time_limit_s=2,
                  memory_limit_mb=1024,
-                 image_name=IMAGE_NAME):
+                 image_name=IMAGE_NAME,
+                 pool=None,
+                 compile_cache=None,
+                 backend=None,
+                 cpuset_cpus=None,
+                 output_limit_bytes=OUTPUT_LIMIT_BYTES,
+                 expected_output=None,
+                 checker_mode="tokens",
+                 checker_eps=1e-6,
+                 input_hash=None,
+                 testdata=None,
+                 timings=False,
+                 python_fork=False,
+                 reaper=None,
+                 verdict_cache=None,
+                 images=None,
+                 admission=None,
+                 special_judge=None):
     """
-    Run user code inside a docker container using subprocess (docker CLI).
-    This function always attempts to remove the container and delete temp files, no matter what.
+    Run user code inside a docker container, through the Engine API or the docker CLI
+    (see docker_backend.get_backend; pass backend= to override). This function always attempts to remove the container, no matter what.
+    The removal happens in the background, on reaper (default reaper.get_reaper()).
+    stdin may be a str, bytes, an os.PathLike path or a seekable binary file object;
+    non-str inputs are streamed into the container unchanged.
+    If a ContainerPool is given, a warm container is borrowed from it and handed back
+    (scrubbed in the background) instead of being created and removed here.
+    If a CompileCache is given, an identical earlier C/C++ compile is reused.
+    cpuset_cpus pins the sandbox to the given cores (docker --cpuset-cpus).
+    time_limit_s is a CPU-time limit (millisecond precision, enforced by judge_run.py);
+    wall time is capped at WALL_LIMIT_FACTOR times that plus WALL_LIMIT_EXTRA_MS.
+    Output is streamed into a bounded buffer; a run writing more than output_limit_bytes
+    to stdout or stderr is killed with "Output Limit Exceeded".
+    If expected_output is given (str, bytes, path or binary file), the whole output is
+    streamed through checker.check_output with checker_mode ("exact", "tokens",
+    "whitespace", "float", "float_abs", "float_rel") and checker_eps; a mismatch
+    fails the run with "Wrong Answer: <first mismatch>".
+    With input_hash (from TestDataCache.register) and testdata, stdin is read from the
+    read-only test-data volume instead of being uploaded.
+    Every phase is timed into the metrics registry (see metrics.py); with timings=True
+    the durations are also returned under "phases_ms".
+    With python_fork=True, Python code runs in a child forked from judge_run.py's already
+    initialized interpreter instead of a new python3, so interpreter startup is neither
+    timed nor charged to the submission.
+    With a VerdictCache, an identical earlier run (same code, input, limits and image) is
+    served from the cache and only checked again; see verdict_cache.py for what is re-run.
+    images is an image_manager.ImageManager (default: the process-wide one). The sandbox is
+    started from the digest it pinned; an image that is not ready fails the run instead of
+    being built here.
+    With an admission.AdmissionController, the sandbox's memory limit and one CPU are booked
+    against the host budget before it starts; a run that gets no room fails with
+    "Judge busy: ..." instead of overcommitting the host.
+    With a special_judge.SpecialJudge, its checker judges the output instead of checker_mode,
+    given the input, expected_output (which may be None) and the output; its verdict fills
+    checker_passed / checker_message, and a failing checker gives "Checker error: ...".
     Returns a dict with keys:
       - success (bool)
       - timed_out (bool)
       - exit_code (int or None)
-      - stdout (str)
-      - stderr (str)
+      - stdout (str, first OUTPUT_PREVIEW_BYTES only)
+      - stderr (str, first OUTPUT_PREVIEW_BYTES only)
+      - stdout_size (int, bytes the program wrote to stdout)
+      - output_truncated (bool, stdout or stderr is longer than the preview)
+      - cpu_time_ms (float, from the container's cgroup), wall_time_ms (float)
+      - peak_memory_mb (float)
+      - checker_passed (bool, or None if no expected_output was given or the special judge failed)
+      - checker_message (str, where the first mismatch is)
       - compile_error (str or "")
+      - compile_time_ms (float, C/C++ only; wall time of the compile step)
+      - cached (bool, the run was served from verdict_cache)
       - err_message (str or "")
+      - phases_ms (dict phase -> float, only with timings=True)
     """
-    # Normalize stdin
-    try:
-        if stdin is None:
-            stdin = ""
-        stdin = stdin.replace("\r\n", "\n")
-        if stdin and not stdin.endswith("\n"):
-            stdin += "\n"
-    except Exception:
-        stdin = str(stdin)
+    return execute_batch(language=language, code=code, inputs=[stdin],
+                         time_limit_s=time_limit_s, memory_limit_mb=memory_limit_mb,
+                         image_name=image_name, pool=pool, compile_cache=compile_cache,
+                         backend=backend, cpuset_cpus=cpuset_cpus,
+                         output_limit_bytes=output_limit_bytes,
+                         expected_outputs=None if expected_output is None else [expected_output],
+                         checker_mode=checker_mode, checker_eps=checker_eps,
+                         input_hashes=None if input_hash is None else [input_hash], testdata=testdata,
+                         timings=timings, python_fork=python_fork, reaper=reaper,
+                         verdict_cache=verdict_cache, images=images, admission=admission,
+                         special_judge=special_judge)[0]
 
-    lang = language.lower()
-    if lang not in ("python", "c", "c++"):
-        return {"success": False, "timed_out": False, "exit_code": None,
-                "stdout": "", "stderr": "", "compile_error": "", "err_message": f"Unsupported language: {language}"}
+def execute_batch(language='python',
+                  code='print("this is test code\\nsubmit ur own code, this is the default code")',
+                  inputs=('',),
+                  time_limit_s=2,
+                  memory_limit_mb=1024,
+                  image_name=IMAGE_NAME,
+                  pool=None,
+                  stop_on_first_failure=False,
+                  compile_cache=None,
+                  backend=None,
+                  cpuset_cpus=None,
+                  output_limit_bytes=OUTPUT_LIMIT_BYTES,
+                  expected_outputs=None,
+                  checker_mode="tokens",
+                  checker_eps=1e-6,
+                  input_hashes=None,
+                  testdata=None,
+                  timings=False,
+                  python_fork=False,
+                  reaper=None,
+                  verdict_cache=None,
+                  compiled=None,
+                  images=None,
+                  admission=None,
+                  special_judge=None,
+                  on_event=None,
+                  cancel=None):
+    """
+    Compile once and run the program against every stdin in `inputs`, all in one container.
+    Each input may be anything execute_code accepts as stdin.
+    Returns a list with one result dict per input (same keys as execute_code).
+    A compile failure is reported in every result. With stop_on_first_failure=True the
+    remaining test cases are skipped after the first unsuccessful one.
+    If a CompileCache is given, C/C++ binaries and compile errors are reused across calls.
+    expected_outputs, if given, has one expected output (or None) per input and is checked
+    as in execute_code.
+    input_hashes, if given, replaces inputs: one TestDataCache hash per test case, read
+    from testdata's read-only volume (mounted into the container) instead of uploaded.
+    With timings=True each result gets "phases_ms": the shared phases (image, container,
+    upload, compile, cleanup) plus that test case's run and check, in milliseconds.
+    python_fork is as in execute_code; it matters most here, where every test case would
+    otherwise pay a full interpreter startup.
+    With a VerdictCache, test cases found in it are served from it and the others run; when
+    every test case is served, no container is started at all.
+    compiled (a CompiledProgram from compile_submission) replaces language and code: its
+    binary is uploaded instead of compiling, and a failed compile is reported without
+    starting a container. images, admission and special_judge are as in execute_code.
+    on_event(event), if given, is called on this thread with dicts as judging goes:
+    {"event": "compiled", "compile_error", "compile_time_ms"} once the program is built (or
+    found in compiled), {"event": "judging", "test_cases"} before the first test case runs,
+    and {"event": "result", "index", "result"} once per test case, as soon as it is known.
+    cancel (a CancelToken) stops the run early: see CancelToken.
+    """
+    backend = backend or get_backend()
+    if compiled is not None:
+        language, code = compiled.language, compiled.code
+    if input_hashes is not None:
+        inputs = [None] * len(input_hashes)
+    inputs = [_normalize_stdin(stdin) for stdin in inputs]
+    results = [_new_result() for _ in inputs]
 
-    ext = {"python": ".py", "c": ".c", "c++": ".cpp"}[lang]
-    exec_name = "main"  # output binary for c/c++, ignored for python
+    def fail_all(message, compile_error=""):
+        for r in results:
+            if not r["err_message"] and not r["success"]:
+                r["compile_error"] = compile_error
+                r["err_message"] = message
+        return results
+
+    reported = set()
+
+    def emit(event, **fields):
+        if on_event is not None:
+            on_event(dict(event=event, **fields))
+
+    def report(i):
+        if i not in reported:
+            reported.add(i)
+            emit("result", index=i, result=results[i])
+
+    def cancelled():
+        return cancel is not None and cancel.cancelled
+
+    lang = get_language(language)
+    if lang is None:
+        return fail_all(f"Unsupported language: {language}")
+    time_limit_s = time_limit_s * lang.time_multiplier
+    if expected_outputs is not None and len(expected_outputs) != len(inputs):
+        return fail_all("expected_outputs must have one entry per input")
+    if checker_mode not in CHECKER_MODES:
+        return fail_all(f"Unknown checker mode: {checker_mode}")
+    checks = _make_checks(expected_outputs, len(inputs), checker_mode, checker_eps, special_judge, inputs,
+                          input_hashes, testdata)
+    timer = PhaseTimer(lang.name)
+    case_phases = [{} for _ in inputs]
 
-    tmp_dir = None
     container_name = f"judge_{uuid.uuid4().hex[:8]}"
     container_started = False
+    container_id = None
+    container_healthy = True
+    pinned = []
+    binds = None
+    uncancel = None
+    reservation = None
 
-    result = {
-        "success": False,
-        "timed_out": False,
-        "exit_code": None,
-        "stdout": "",
-        "stderr": "",
-        "compile_error": "",
-        "err_message": ""
-    }
+    keys = [None] * len(inputs)
+    served = set()
 
     try:
-        # make temp dir and files on host
-        tmp_dir = tempfile.mkdtemp(prefix="judge_")
-        code_filename = f"main{ext}"
-        code_path = os.path.join(tmp_dir, code_filename)
-        input_path = os.path.join(tmp_dir, "input.txt")
+        # the pinned image digest; a memory lookup once the image manager has checked the image
+        with timer.phase("image"):
+            image_ref, err = (images or get_image_manager()).resolve(image_name, backend)
+        if err:
+            return fail_all(err)
 
-        with open(code_path, "w", encoding="utf-8") as f:
-            f.write(code)
+        if verdict_cache is not None:
+            keys = _verdict_keys(verdict_cache, image_ref, lang, code, inputs, input_hashes, time_limit_s,
+                                 memory_limit_mb, output_limit_bytes, python_fork)
+            served = {i for i, key in enumerate(keys)
+                      if key is not None
+                      and _serve_cached(verdict_cache, key, results[i], time_limit_s, memory_limit_mb, checks[i])}
+            for i in sorted(served):
+                report(i)
+            if len(served) == len(inputs):
+                return results
 
-        with open(input_path, "w", encoding="utf-8") as f:
-            f.write(stdin)
+        if compiled is not None:
+            emit("compiled", compile_error=compiled.compile_error, compile_time_ms=compiled.compile_time_ms)
+        if compiled is not None and compiled.compile_error:
+            return _compile_failed(results, keys, served, verdict_cache, compiled.compile_error,
+                                   compiled.compile_time_ms)
 
-        # ensure docker is available & image exists (or build)
-        ok, err = ensure_image_exists(image_name)
-        if not ok:
-            result["err_message"] = err or "docker image not available"
-            return result
-
-        # start detached container (root inside)
-        run_cmd = [
-            "docker", "run", "--name", container_name,
-            "--memory", f"{memory_limit_mb}m",
-            "--memory-swap", f"{memory_limit_mb}m",
-            "-d", image_name, "sleep", "300"
-        ]
-        p = subprocess.run(run_cmd, capture_output=True, text=True)
-        if p.returncode != 0:
-            result["err_message"] = f"Failed to start container: {p.stderr.strip() or p.stdout.strip()}"
-            return result
+        if input_hashes is not None:
+            if testdata is None:
+                return fail_all("input_hashes needs a testdata cache")
+            # pinned inputs cannot be evicted while this run reads them
+            for i, h in enumerate(input_hashes):
+                if i in served:
+                    continue
+                if not testdata.pin(h):
+                    return fail_all(f"Test input not in cache: {h}")
+                pinned.append(h)
+            input_names = [testdata.container_path(h) for h in input_hashes]
+            uploads = []
+            binds = testdata.binds
+        else:
+            input_names = ["input.txt"] if len(inputs) == 1 else [f"input_{i}.txt" for i in range(len(inputs))]
+            uploads = [upload for i, upload in enumerate(zip(input_names, inputs)) if i not in served]
+
+        # staged files are charged to the sandbox's memory cgroup, so they must not eat into the
+        # program's memory limit (inputs from testdata are mounted and cost nothing)
+        staged = sum(_data_size(data) for _, data in uploads)
+        if compiled is not None and compiled.binary:
+            staged += len(compiled.binary)
+        sandbox_mb = _sandbox_memory_mb(memory_limit_mb, staged)
+
+        # book memory and a CPU for the sandbox, or wait for running ones to finish
+        if admission is not None:
+            with timer.phase("admission"):
+                reservation, err = admission.acquire(sandbox_mb)
+            if err:
+                return fail_all(err)
+
+        # borrow a warm container from the pool, or start a fresh one
+        with timer.phase("container"):
+            if pool is not None:
+                container_id, err = pool.acquire(image_ref, sandbox_mb, cpuset_cpus=cpuset_cpus, binds=binds)
+            else:
+                container_id, err = start_container(container_name, image_ref, sandbox_mb, backend=backend,
+                                                    keepalive=_batch_keepalive(time_limit_s, len(inputs)),
+                                                    cpuset_cpus=cpuset_cpus, binds=binds)
+        if err:
+            return fail_all(err)
 
         container_started = True
-        container_id = p.stdout.strip()
-
-        # create target dir just in case
-        subprocess.run(["docker", "exec", container_id, "mkdir", "-p", WORKDIR], capture_output=True, text=True)
-
-        # copy code and input into container
-        cp1 = subprocess.run(["docker", "cp", code_path, f"{container_id}:{WORKDIR}/{code_filename}"],
-                             capture_output=True, text=True)
-        if cp1.returncode != 0:
-            result["err_message"] = f"docker cp code failed: {cp1.stderr.strip() or cp1.stdout.strip()}"
-            return result
-
-        cp2 = subprocess.run(["docker", "cp", input_path, f"{container_id}:{WORKDIR}/input.txt"],
-                             capture_output=True, text=True)
-        if cp2.returncode != 0:
-            result["err_message"] = f"docker cp input failed: {cp2.stderr.strip() or cp2.stdout.strip()}"
-            return result
-
-        # compile if needed
-        if lang in ("c", "c++"):
-            compiler = "gcc" if lang == "c" else "g++"
-            # cd to WORKDIR so compiled binary is there
-            compile_cmd = f"cd {WORKDIR} && {compiler} {code_filename} -o {exec_name} 2>&1"
-            cp = subprocess.run(["docker", "exec", container_id, "sh", "-c", compile_cmd],
-                                capture_output=True, text=True)
-            if cp.returncode != 0:
-                # compilation failed: capture both stdout/stderr
-                compile_out = (cp.stdout or "") + (cp.stderr or "")
-                result["compile_error"] = compile_out
-                result["err_message"] = "Compilation failed"
-                return result
+        if cancel is not None:
+            # kills whatever runs in the sandbox (compiler or program) the moment it is cancelled
+            uncancel = cancel.on_cancel(partial(_kill_programs, backend, container_id))
 
-        # prepare run command inside container
-        if lang == "python":
-            run_main = f"python3 {code_filename}"
-        else:
-            run_main = f"./{exec_name}"
+        # stream code (or the precompiled binary) and inputs into the container in one go
+        program = [(lang.source, code)]
+        if compiled is not None and compiled.binary is not None:
+            program = [(BINARY, compiled.binary, 0o755)]
+            for r in results:
+                r["compile_time_ms"] = compiled.compile_time_ms
+        with timer.phase("upload"):
+            err = upload_files(container_id, program + uploads, backend=backend)
+        if err:
+            return fail_all(f"Uploading files failed: {err}")
 
-        inner_cmd = f"cd {WORKDIR} && /usr/bin/timeout {int(time_limit_s)}s /usr/bin/time -v {run_main} < input.txt"
+        # compile once if needed
+        if lang.compiler and compiled is None:
+            with timer.phase("compile"):
+                if compile_cache is not None:
+                    ok, compile_out = _compile_cached(backend, compile_cache, container_id, image_ref, lang, code)
+                else:
+                    ok, compile_out = _compile(backend, container_id, lang)
+            if cancelled():
+                return fail_all("Cancelled")
+            compile_time_ms = round(timer.phases["compile"] * 1000.0, 3)
+            emit("compiled", compile_error="" if ok else compile_out, compile_time_ms=compile_time_ms)
+            if not ok:
+                return _compile_failed(results, keys, served, verdict_cache, compile_out, compile_time_ms)
+            for r in results:
+                r["compile_time_ms"] = compile_time_ms
+        elif compiled is None:
+            emit("compiled", compile_error="", compile_time_ms=None)
 
-        # execute inside container, interactive not needed because input redirected from file
-        try:
-            exec_proc = subprocess.run(["docker", "exec", "-i", container_id, "sh", "-c", inner_cmd],
-                                       capture_output=True, text=True, timeout=time_limit_s + 4)
-        except subprocess.TimeoutExpired as te:
-            # Host side timeout — best effort cleanup and report TLE
-            result["timed_out"] = True
-            result["err_message"] = f"Host-side timeout expired: {te}"
-            return result
-
-        # collect outputs
-        result["exit_code"] = exec_proc.returncode
-        stdout_output = exec_proc.stdout or ""
-        stderr_output = exec_proc.stderr or ""
-
-        # parse time output (if present in stderr)
-        time_taken = 0.0
-        mem_mb = 0.0
-        tm = re.search(r"User time \(seconds\): ([\d\.]+)", stderr_output)
-        mm = re.search(r"Maximum resident set size \(kbytes\): (\d+)", stderr_output)
-        if tm:
-            try:
-                time_taken = float(tm.group(1))
-            except Exception:
-                pass
-        if mm:
-            try:
-                mem_mb = int(mm.group(1)) / 1024.0
-            except Exception:
-                pass
+        # prepare run command inside container
+        run_main = _run_main(lang, python_fork)
 
-        # clean program stderr by removing time output
-        cleaned_stderr = stderr_output
-        split_marker = None
-        if "Command being timed:" in stderr_output:
-            split_marker = "Command being timed:"
-        elif "User time (seconds):" in stderr_output:
-            split_marker = "User time (seconds):"
-        if split_marker:
-            cleaned_stderr = stderr_output.split(split_marker)[0].rstrip()
-
-        result["stdout"] = stdout_output
-        result["stderr"] = cleaned_stderr
-
-        # determine statuses
-        if exec_proc.returncode == 124:
-            result["timed_out"] = True
-            result["err_message"] = f"Time Limit Exceeded (> {time_limit_s}s)"
-            result["success"] = False
-            return result
-        if exec_proc.returncode == 137:
-            result["err_message"] = f"Memory Limit Exceeded (> {memory_limit_mb} MB)"
-            result["success"] = False
-            return result
-        if exec_proc.returncode != 0:
-            result["err_message"] = f"Runtime Error (Exit Code: {exec_proc.returncode})"
-            result["success"] = False
-            return result
-
-        # success
-        result["success"] = True
-        return result
+        # run every test case against the same program
+        emit("judging", test_cases=len(inputs) - len(served))
+        for i, input_name in enumerate(input_names):
+            if i in served:
+                if stop_on_first_failure and not results[i]["success"]:
+                    return fail_all("Skipped (stopped after first failure)")
+                continue
+            if cancelled():
+                return fail_all("Cancelled")
+            on_run = None if keys[i] is None else partial(_store_unless_cancelled, verdict_cache, keys[i], cancel)
+            if not _run_program(backend, container_id, run_main, input_name, time_limit_s, memory_limit_mb,
+                                results[i], output_limit_bytes, checks[i], timer, case_phases[i], on_run):
+                container_healthy = False
+            if cancelled():
+                # killed halfway; whatever it was classified as is not its verdict
+                results[i].update(_new_result(), err_message="Cancelled")
+                return fail_all("Cancelled")
+            report(i)
+            if stop_on_first_failure and not results[i]["success"]:
+                return fail_all("Skipped (stopped after first failure)")
+
+        return results
 
     except Exception as e:
         # Capture traceback for debugging but don't crash
         tb = traceback.format_exc()
-        result["err_message"] = f"Runner exception: {e}\n{tb}"
-        return result
+        container_healthy = False
+        return fail_all(f"Runner exception: {e}\n{tb}")
 
     finally:
-        # cleanup container if it was started
+        if uncancel is not None:
+            uncancel()
+        for h in pinned:
+            testdata.unpin(h)
+        # cleanup container if it was started (pooled containers go back to the pool, the rest
+        # are removed in the background so the verdict does not wait for docker rm)
+        release = partial(admission.release, reservation) if reservation is not None else None
         try:
             if container_started:
-                safe_remove_container(container_name)
+                with timer.phase("cleanup"):
+                    if pool is not None:
+                        pool.release(container_id, healthy=container_healthy)
+                    else:
+                        # the sandbox's memory stays booked until the container is really gone
+                        (reaper or get_reaper()).reap(container_name, backend, on_removed=release)
+                        release = None
         except Exception:
             pass
-        # cleanup temp dir
+        if release is not None:
+            release()
+        shared = {name: timer.phases[name] for name in timer.phases if name not in ("run", "check")}
+        for r, phases in zip(results, case_phases):
+            timer.run_finished(r, _verdict(r))
+            if timings:
+                r["phases_ms"] = {name: round(s * 1000.0, 3) for name, s in dict(shared, **phases).items()}
+        # compile errors, skipped and cancelled test cases, failures before the first run
+        for i in range(len(results)):
+            report(i)
+
+def execute_stream(language='python',
+                   code='print("this is test code\\nsubmit ur own code, this is the default code")',
+                   inputs=('',),
+                   cancel=None,
+                   **kwargs):
+    """
+    execute_batch as a generator: yields its events (see on_event there) while the batch runs
+    on a worker thread, then {"event": "finished", "results": [...]} with the full list.
+
+        token = CancelToken()
+        for event in execute_stream('c++', code, inputs, cancel=token):
+            if event["event"] == "result" and not event["result"]["success"]:
+                token.cancel()      # the remaining test cases come back as "Cancelled"
+
+    Closing the generator early (break, garbage collection) cancels the run. kwargs are
+    passed to execute_batch.
+    """
+    cancel = cancel or CancelToken()
+    events = queue.Queue()
+
+    def run():
         try:
-            if tmp_dir and os.path.isdir(tmp_dir):
-                shutil.rmtree(tmp_dir, ignore_errors=True)
-        except Exception:
-            pass
+            results = execute_batch(language=language, code=code, inputs=inputs, on_event=events.put,
+                                    cancel=cancel, **kwargs)
+        except BaseException as e:
+            count = len(kwargs.get("input_hashes") or inputs)
+            results = [dict(_new_result(), err_message=f"Runner exception: {e}") for _ in range(count)]
+        events.put({"event": "finished", "results": results})
+
+    threading.Thread(target=run, name="judge-stream", daemon=True).start()
+    finished = False
+    try:
+        while not finished:
+            event = events.get()
+            finished = event["event"] == "finished"
+            yield event
+    finally:
+        if not finished:
+            cancel.cancel()
 
 
 if __name__ == '__main__':
     import json
     # --- Example Usage ---
 
+    # check (and build if missing) the sandbox image once, before the first submission
+    print(get_image_manager().warm())
+
     # Example 0: Using all default values
     print("--- Example 0: Python Defaults ---")
     result = execute_code()
@@ -0,0 +1,170 @@
+# pipeline.py
+"""
+Two-stage judging: compiles and runs of different submissions overlap.
+
+    with JudgePipeline(compile_cpus=[0, 1], run_cpus=[2, 3, 4, 5]) as pipe:
+        future = pipe.submit("contest", language="c++", code=src, inputs=["1 2", "3 4"])
+        results = future.result()   # one result dict per input, as from execute_batch
+
+The compile stage has its own workers (one per compile CPU, pinned to it) that
+build each submission in a compile sandbox with one.compile_submission. The
+binary then goes to the run stage, a scheduler.JudgeScheduler whose per-core
+workers run one.execute_batch(compiled=...) in a fresh run sandbox. While
+submission N's test cases run, submission N+1 is already compiling. A compile
+error is reported straight from the compile stage; no run sandbox is started
+for it. Interpreted languages pass through the compile stage without a sandbox.
+"""
+import heapq
+import itertools
+import os
+import threading
+import time
+from concurrent.futures import Future
+
+from one import IMAGE_NAME, COMPILE_MEMORY_MB, compile_submission, execute_batch, _new_result
+from scheduler import JudgeScheduler, PRIORITIES, PRIORITY_PRACTICE
+
+
+class JudgePipeline:
+    """
+    compile_cpus: cores for the compile stage, one compile sandbox at a time per core
+    (default: the first core). run_cpus: cores for the run stage (default: every other core).
+    compile_cache, backend and compile_pool apply to the compile stage; run_kwargs (backend,
+    pool, memory_limit_mb, verdict_cache, ...) go to every execute_batch call, below the
+    arguments of each submit().
+    """
+
+    def __init__(self, compile_cpus=None, run_cpus=None, compile_cache=None, compile_pool=None,
+                 compile_memory_mb=COMPILE_MEMORY_MB, **run_kwargs):
+        cpus = sorted(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else range(os.cpu_count() or 1)
+        cpus = list(cpus)
+        if compile_cpus is None:
+            compile_cpus = cpus[:1]
+        if run_cpus is None:
+            run_cpus = [cpu for cpu in cpus if cpu not in compile_cpus] or cpus
+        self.compile_cpus = list(compile_cpus)
+        self.compile_cache = compile_cache
+        self.compile_pool = compile_pool
+        self.compile_memory_mb = compile_memory_mb
+        self.backend = run_kwargs.get("backend")
+        self.runs = JudgeScheduler(cpus=run_cpus, runner=execute_batch, **run_kwargs)
+        self._heap = []
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+        self._closed = False
+        self._compiling = 0
+        self._counts = {"submitted": 0, "compiled": 0, "compile_errors": 0, "failed": 0, "cancelled": 0}
+        self._compile_seconds = 0.0
+        self._workers = [threading.Thread(target=self._compile_work, args=(cpu,), name=f"judge-compile-cpu{cpu}",
+                                          daemon=True)
+                         for cpu in self.compile_cpus]
+        for t in self._workers:
+            t.start()
+
+    def submit(self, priority=PRIORITY_PRACTICE, language="python", code="", **job_kwargs):
+        """
+        Queue a submission and return a concurrent.futures.Future for its list of result dicts.
+        priority is as in JudgeScheduler.submit and orders both stages; job_kwargs go to
+        execute_batch (inputs, time_limit_s, expected_outputs, ...).
+        """
+        priority = PRIORITIES.get(priority, priority)
+        future = Future()
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("pipeline is shut down")
+            heapq.heappush(self._heap, (priority, next(self._seq), time.monotonic(), future,
+                                        language, code, job_kwargs))
+            self._counts["submitted"] += 1
+            self._cond.notify()
+        return future
+
+    def stats(self):
+        """Compile stage counters and queue depth; the run stage's JudgeScheduler.stats() under "run"."""
+        with self._cond:
+            compiled = self._counts["compiled"] + self._counts["compile_errors"]
+            return dict(
+                self._counts,
+                compile_workers=len(self.compile_cpus),
+                compiling=self._compiling,
+                compile_queue_depth=len(self._heap),
+                compile_avg_s=self._compile_seconds / compiled if compiled else 0.0,
+                run=self.runs.stats(),
+            )
+
+    def shutdown(self, wait=True, cancel_pending=False):
+        """Stop accepting submissions; queued ones are still judged unless cancel_pending is set."""
+        with self._cond:
+            self._closed = True
+            if cancel_pending:
+                for item in self._heap:
+                    item[3].cancel()
+                    self._counts["cancelled"] += 1
+                self._heap.clear()
+            self._cond.notify_all()
+        if wait:
+            for t in self._workers:
+                t.join()
+        # every compiled submission has reached the run stage by now
+        self.runs.shutdown(wait=wait, cancel_pending=cancel_pending)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.shutdown()
+
+    def _compile_work(self, cpu):
+        while True:
+            with self._cond:
+                while not self._heap and not self._closed:
+                    self._cond.wait()
+                if not self._heap:
+                    return
+                priority, _, _, future, language, code, job_kwargs = heapq.heappop(self._heap)
+                if not future.set_running_or_notify_cancel():
+                    self._counts["cancelled"] += 1
+                    continue
+                self._compiling += 1
+            started = time.monotonic()
+            kwargs = dict(self.runs.runner_kwargs, **job_kwargs)
+            try:
+                compiled, err = compile_submission(
+                    language, code, image_name=kwargs.get("image_name", IMAGE_NAME),
+                    memory_limit_mb=self.compile_memory_mb, compile_cache=self.compile_cache,
+                    backend=self.backend, cpuset_cpus=str(cpu), pool=self.compile_pool,
+                    images=kwargs.get("images"), admission=kwargs.get("admission"))
+                if err:
+                    outcome = "failed"
+                    future.set_result(_failed_results(job_kwargs, err))
+                elif compiled.compile_error:
+                    # short-circuits inside execute_batch, before any run sandbox
+                    outcome = "compile_errors"
+                    future.set_result(execute_batch(compiled=compiled, **kwargs))
+                else:
+                    outcome = "compiled"
+                    run = self.runs.submit(priority, compiled=compiled, **job_kwargs)
+                    run.add_done_callback(lambda done, future=future: _copy_outcome(done, future))
+            except BaseException as e:
+                outcome = "failed"
+                if not future.done():
+                    future.set_exception(e)
+            with self._cond:
+                self._compiling -= 1
+                self._counts[outcome] += 1
+                if outcome in ("compiled", "compile_errors"):
+                    self._compile_seconds += time.monotonic() - started
+
+
+def _failed_results(job_kwargs, message):
+    """execute_batch-shaped results for a submission whose compile sandbox failed."""
+    count = len(job_kwargs.get("input_hashes") or job_kwargs.get("inputs", ("",)))
+    return [dict(_new_result(), err_message=message) for _ in range(count)]
+
+
+def _copy_outcome(source, target):
+    if source.cancelled():
+        target.set_exception(RuntimeError("run stage cancelled"))
+    elif source.exception() is not None:
+        target.set_exception(source.exception())
+    else:
+        target.set_result(source.result())
@@ -0,0 +1,244 @@
+# reaper.py
+"""
+Background removal of sandbox containers, and a sweeper for the ones a crashed
+judge left behind.
+
+Every container the runner starts carries LABEL, the owning process
+(OWNER_LABEL, "host:pid") and, unless it is meant to live indefinitely (pool
+containers), the time its keepalive runs out (DEADLINE_LABEL, unix seconds);
+see container_labels. execute_batch hands finished containers to a
+ContainerReaper instead of removing them itself, so the verdict returns as soon
+as the last test case is judged and worker threads pay for `docker rm -f`.
+
+The sweeper lists labelled containers (backend.list_containers) when the reaper
+starts and every sweep_interval_s after that, and removes the ones past their
+deadline, and the ones owned by a process on this host that no longer exists.
+Containers orphaned by a crash are reclaimed instead of sleeping out their
+keepalive and then lingering as stopped containers.
+"""
+import atexit
+import math
+import os
+import queue
+import socket
+import threading
+import time
+
+from docker_backend import get_backend
+from metrics import get_registry
+
+LABEL = "annaforces.judge"
+OWNER_LABEL = "annaforces.judge.owner"
+DEADLINE_LABEL = "annaforces.judge.deadline"
+# how long the sweeper waits past a container's keepalive before removing it
+DEADLINE_SLACK_S = 60
+
+
+def _owner():
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def container_labels(keepalive):
+    """Labels for a container whose keepalive is `sleep keepalive` (seconds, or "infinity")."""
+    labels = {LABEL: "1", OWNER_LABEL: _owner()}
+    try:
+        seconds = float(keepalive)
+    except ValueError:
+        seconds = math.inf
+    if math.isfinite(seconds):
+        labels[DEADLINE_LABEL] = str(int(time.time() + seconds) + DEADLINE_SLACK_S)
+    return labels
+
+
+def is_expired(labels, now=None):
+    """True if a labelled container is past its deadline or its owner process is gone."""
+    now = time.time() if now is None else now
+    try:
+        if now > int(labels[DEADLINE_LABEL]):
+            return True
+    except (KeyError, ValueError):
+        pass
+    host, _, pid = labels.get(OWNER_LABEL, "").rpartition(":")
+    if host != socket.gethostname() or not pid.isdigit():
+        return False
+    try:
+        os.kill(int(pid), 0)
+    except ProcessLookupError:
+        return True
+    except OSError:
+        pass
+    return False
+
+
+class ContainerReaper:
+    """
+    Removes containers on background threads. reap() only queues the container and returns;
+    `workers` threads remove queued containers. With sweep_interval_s, another thread sweeps
+    expired containers (see is_expired) from `backend` (default: docker_backend.get_backend()).
+
+    stats counts containers queued by reap(), removed by the workers, errors raised while
+    removing, containers reclaimed by the sweeper and sweeps run; pending is the queue length.
+    Removals are also counted in judge_containers_reaped_total{reason="finished"|"swept"}.
+    """
+
+    def __init__(self, backend=None, workers=2, sweep_interval_s=60.0):
+        self.backend = backend
+        self.workers = workers
+        self.sweep_interval_s = sweep_interval_s
+        self._queue = queue.Queue()
+        self._pending = set()
+        self._cond = threading.Condition()
+        self._threads = []
+        self._stopping = threading.Event()
+        self._stats = {"queued": 0, "removed": 0, "errors": 0, "swept": 0, "sweeps": 0}
+
+    @property
+    def stats(self):
+        with self._cond:
+            return dict(self._stats, pending=len(self._pending))
+
+    def start(self):
+        """Start the worker and sweeper threads; reap() calls this on first use."""
+        with self._cond:
+            if self._threads or self._stopping.is_set():
+                return self
+            for i in range(self.workers):
+                self._threads.append(threading.Thread(target=self._work, name=f"container-reaper-{i}", daemon=True))
+            if self.sweep_interval_s:
+                self._threads.append(threading.Thread(target=self._sweep_loop, name="container-sweeper",
+                                                      daemon=True))
+        for t in self._threads:
+            t.start()
+        return self
+
+    def reap(self, container, backend=None, on_removed=None):
+        """
+        Queue a container for removal (from backend, default the reaper's own) and return at once.
+        on_removed() is called once the removal is done, or has failed and is left to the sweeper.
+        """
+        self.start()
+        with self._cond:
+            if self._stopping.is_set() and not self._threads:
+                closed = True
+            else:
+                closed = False
+                self._pending.add(container)
+                self._stats["queued"] += 1
+        if closed:
+            # too late for the workers; remove it on the caller's thread
+            self._remove(backend or self._backend(), container, "finished", on_removed)
+            return
+        self._queue.put((backend or self._backend(), container, "finished", on_removed))
+
+    def sweep(self, now=None):
+        """Queue every expired labelled container for removal. Returns how many were found."""
+        if self._stopping.is_set():
+            return 0
+        self.start()
+        backend = self._backend()
+        try:
+            containers = backend.list_containers(LABEL)
+        except Exception:
+            return 0
+        found = 0
+        for c in containers:
+            if not is_expired(c["labels"], now):
+                continue
+            with self._cond:
+                if c["id"] in self._pending or c["name"] in self._pending:
+                    continue
+                self._pending.add(c["id"])
+            self._queue.put((backend, c["id"], "swept", None))
+            found += 1
+        with self._cond:
+            self._stats["sweeps"] += 1
+        return found
+
+    def drain(self, timeout=None):
+        """Wait until every queued container is removed. Returns False on timeout."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            while self._pending:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._cond.wait(remaining)
+        return True
+
+    def close(self, timeout=None):
+        """Finish the queued removals (up to timeout) and stop the threads."""
+        self._stopping.set()
+        self.drain(timeout)
+        with self._cond:
+            threads, self._threads = self._threads, []
+        for _ in range(self.workers):
+            self._queue.put(None)
+        for t in threads:
+            t.join(timeout)
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.close()
+
+    # internals
+
+    def _backend(self):
+        return self.backend or get_backend()
+
+    def _remove(self, backend, container, reason, on_removed=None):
+        try:
+            backend.remove_container(container)
+            ok = True
+        except Exception:
+            ok = False
+        with self._cond:
+            self._pending.discard(container)
+            if ok:
+                self._stats["removed"] += 1
+                if reason == "swept":
+                    self._stats["swept"] += 1
+            else:
+                self._stats["errors"] += 1
+            self._cond.notify_all()
+        if ok:
+            get_registry().inc("judge_containers_reaped_total", {"reason": reason})
+        if on_removed is not None:
+            try:
+                on_removed()
+            except Exception:
+                pass
+
+    def _work(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            self._remove(*item)
+
+    def _sweep_loop(self):
+        while not self._stopping.is_set():
+            self.sweep()
+            self._stopping.wait(self.sweep_interval_s)
+
+
+_reaper = None
+_reaper_lock = threading.Lock()
+
+
+def get_reaper():
+    """The process-wide reaper; queued removals are finished at interpreter exit."""
+    global _reaper
+    with _reaper_lock:
+        if _reaper is None:
+            _reaper = ContainerReaper()
+            atexit.register(_reaper.close, 30)
+        return _reaper
+
+
+def set_reaper(reaper):
+    """Replace the process-wide reaper (e.g. with one bound to a test backend)."""
+    global _reaper
+    with _reaper_lock:
+        _reaper = reaper
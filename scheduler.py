@@ -0,0 +1,143 @@
+# scheduler.py
+import heapq
+import itertools
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+
+from one import execute_code
+
+# lower runs first
+PRIORITY_CONTEST = 0
+PRIORITY_PRACTICE = 1
+PRIORITY_REJUDGE = 2
+PRIORITIES = {"contest": PRIORITY_CONTEST, "practice": PRIORITY_PRACTICE, "rejudge": PRIORITY_REJUDGE}
+
+
+class JudgeScheduler:
+    """
+    Priority job queue with one worker per CPU core.
+
+    Each worker owns a single core and passes it to the runner as cpuset_cpus, so
+    exactly one sandbox runs per core and CPU time is not skewed by neighbours.
+    Jobs are served by priority (contest > practice > rejudge), FIFO within a
+    priority. stats() reports queue depth, wait times and saturation.
+
+    Usage:
+        sched = JudgeScheduler(cpus=[2, 3, 4, 5], pool=pool)
+        future = sched.submit("contest", language="c++", code=src, stdin="1 2")
+        result = future.result()
+    """
+
+    def __init__(self, cpus=None, runner=execute_code, wait_samples=1000, **runner_kwargs):
+        if cpus is None:
+            cpus = sorted(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else range(os.cpu_count() or 1)
+        self.cpus = list(cpus)
+        self.runner = runner
+        self.runner_kwargs = runner_kwargs
+        self._heap = []
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+        self._closed = False
+        self._busy = 0
+        self._waits = deque(maxlen=wait_samples)
+        self._counts = {"submitted": 0, "completed": 0, "failed": 0, "cancelled": 0}
+        self._workers = [threading.Thread(target=self._work, args=(cpu,), name=f"judge-cpu{cpu}", daemon=True)
+                         for cpu in self.cpus]
+        for t in self._workers:
+            t.start()
+
+    def submit(self, priority=PRIORITY_PRACTICE, runner=None, **job_kwargs):
+        """
+        Queue a job and return a concurrent.futures.Future for its result dict.
+        priority is a PRIORITY_* value or one of "contest", "practice", "rejudge".
+        job_kwargs go to the runner (execute_code unless runner= is given, e.g. execute_batch).
+        """
+        priority = PRIORITIES.get(priority, priority)
+        future = Future()
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("scheduler is shut down")
+            heapq.heappush(self._heap, (priority, next(self._seq), time.monotonic(), future,
+                                        runner or self.runner, job_kwargs))
+            self._counts["submitted"] += 1
+            self._cond.notify()
+        return future
+
+    def stats(self):
+        with self._cond:
+            depth = {name: 0 for name in PRIORITIES}
+            names = {v: k for k, v in PRIORITIES.items()}
+            now = time.monotonic()
+            oldest = 0.0
+            for priority, _, queued_at, _, _, _ in self._heap:
+                name = names.get(priority, str(priority))
+                depth[name] = depth.get(name, 0) + 1
+                oldest = max(oldest, now - queued_at)
+            waits = sorted(self._waits)
+            return dict(
+                self._counts,
+                workers=len(self.cpus),
+                busy_workers=self._busy,
+                queue_depth=len(self._heap),
+                queue_depth_by_priority=depth,
+                oldest_wait_s=oldest,
+                wait_avg_s=sum(waits) / len(waits) if waits else 0.0,
+                wait_p50_s=_percentile(waits, 0.50),
+                wait_p95_s=_percentile(waits, 0.95),
+                wait_max_s=waits[-1] if waits else 0.0,
+                saturated=self._busy == len(self.cpus) and bool(self._heap),
+            )
+
+    def shutdown(self, wait=True, cancel_pending=False):
+        """Stop accepting jobs. Queued jobs still run unless cancel_pending is set."""
+        with self._cond:
+            self._closed = True
+            if cancel_pending:
+                for item in self._heap:
+                    item[3].cancel()
+                    self._counts["cancelled"] += 1
+                self._heap.clear()
+            self._cond.notify_all()
+        if wait:
+            for t in self._workers:
+                t.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.shutdown()
+
+    def _work(self, cpu):
+        while True:
+            with self._cond:
+                while not self._heap and not self._closed:
+                    self._cond.wait()
+                if not self._heap:
+                    return
+                _, _, queued_at, future, runner, job_kwargs = heapq.heappop(self._heap)
+                if not future.set_running_or_notify_cancel():
+                    self._counts["cancelled"] += 1
+                    continue
+                self._waits.append(time.monotonic() - queued_at)
+                self._busy += 1
+            try:
+                kwargs = dict(self.runner_kwargs, **job_kwargs)
+                kwargs["cpuset_cpus"] = str(cpu)
+                future.set_result(runner(**kwargs))
+                outcome = "completed"
+            except BaseException as e:
+                future.set_exception(e)
+                outcome = "failed"
+            with self._cond:
+                self._busy -= 1
+                self._counts[outcome] += 1
+
+
+def _percentile(sorted_values, q):
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(q * len(sorted_values)))]
@@ -0,0 +1,334 @@
+# special_judge.py
+"""
+Custom checkers: compiled once per problem and kept running in a sandbox of their own.
+
+    judge = get_special_judge("c++", checker_src)    # one per checker source, kept for the process
+    results = execute_batch(language="c++", code=src, inputs=tests, expected_outputs=answers,
+                            special_judge=judge)
+
+On first use a SpecialJudge starts a long-lived sandbox and compiles the
+checker there, through compile_cache when one is given, so restarts and other
+processes reuse the binary. From then on, each test case costs a single exec
+in that sandbox:
+
+    checker INPUT EXPECTED ACTUAL       (see arg_order; testlib checkers want TESTLIB_ORDER)
+
+Inputs and expected outputs are copied into the sandbox once, keyed by their
+content hash, and reused by later test cases and submissions. Inputs held in
+a TestDataCache are read from its read-only volume and never copied. Only the
+contestant's output is uploaded per check, and it is removed afterwards.
+
+Exit status 0 accepts the output. 1 and 2 (testlib's WA and PE) reject it,
+and the checker's output becomes checker_message. Any other status, a crash,
+or a checker running longer than time_limit_s is a checker error. A checker
+error is reported as "Checker error: ..." and is not blamed on the submission.
+"""
+import atexit
+import hashlib
+import os
+import pathlib
+import shlex
+import subprocess
+import threading
+import uuid
+from collections import Counter, OrderedDict
+
+from docker_backend import get_backend
+from image_manager import get_image_manager
+from languages import BINARY, get_language
+from one import (IMAGE_NAME, WORKDIR, start_container, upload_files, _compile, _compile_cached, _decode)
+from reaper import get_reaper
+from verdict_cache import input_digest
+
+DEFAULT_ORDER = ("input", "expected", "actual")
+TESTLIB_ORDER = ("input", "actual", "expected")
+# exit statuses meaning "wrong answer" (testlib: 1 = WA, 2 = presentation error)
+REJECT_CODES = (1, 2)
+# checker_message is cut to this many characters
+MESSAGE_CHARS = 1000
+# special judges kept by get_special_judge; the least recently used beyond this are closed
+MAX_SPECIAL_JUDGES = 32
+
+
+def _size(data):
+    if isinstance(data, str):
+        return len(data.encode("utf-8"))
+    if isinstance(data, (bytes, bytearray)):
+        return len(data)
+    if hasattr(data, "seek"):
+        size = data.seek(0, 2)
+        data.seek(0)
+        return size
+    return os.path.getsize(data)
+
+
+class SpecialJudge:
+    """
+    A checker program (language, code) in a sandbox of its own, with memory_limit_mb of memory
+    and time_limit_s per check. Copied test files are kept up to data_limit_mb (default: half
+    of the sandbox memory, which its tmpfs is charged to), least recently used evicted first.
+    testdata (a TestDataCache) is mounted read-only so that input_hash arguments need no copy.
+    stats counts checks, accepted / rejected outputs, checker errors, uploaded files and restarts.
+    """
+
+    def __init__(self, language, code, image_name=IMAGE_NAME, memory_limit_mb=256, time_limit_s=10,
+                 compile_cache=None, testdata=None, backend=None, images=None, reaper=None,
+                 arg_order=DEFAULT_ORDER, data_limit_mb=None):
+        self.lang = get_language(language)
+        if self.lang is None:
+            raise ValueError(f"Unsupported language: {language}")
+        self.code = code
+        self.image_name = image_name
+        self.memory_limit_mb = memory_limit_mb
+        self.time_limit_s = time_limit_s
+        self.compile_cache = compile_cache
+        self.testdata = testdata
+        self.backend = backend
+        self.images = images
+        self.reaper = reaper
+        self.arg_order = tuple(arg_order)
+        self.data_limit_bytes = (data_limit_mb or memory_limit_mb // 2) * 1024 * 1024
+        self.compile_error = ""
+        self._lock = threading.Lock()
+        self._container = None   # (name, id)
+        self._files = OrderedDict()  # digest -> size of the copies in the sandbox, oldest first
+        self._in_use = Counter()     # digest -> checks reading it right now
+        self._data_bytes = 0
+        self._counts = {"checks": 0, "accepted": 0, "rejected": 0, "errors": 0, "uploads": 0, "restarts": 0}
+
+    @property
+    def stats(self):
+        with self._lock:
+            return dict(self._counts, files=len(self._files), data_bytes=self._data_bytes,
+                        running=self._container is not None)
+
+    def start(self):
+        """Start the sandbox and compile the checker (check() does this on first use). Returns an error or None."""
+        with self._lock:
+            return self._start()
+
+    def check(self, actual, input=None, expected=None, input_hash=None, testdata=None):
+        """
+        Run the checker on the program output actual (bytes, str or a binary file object).
+        input / expected are test files as execute_batch accepts them (None for an empty file);
+        input_hash names an input in testdata instead: the judge's own (mounted) or else the
+        given one (copied in). Returns (True, message) if accepted, (False, message) if
+        rejected and (None, message) if the checker itself failed.
+        """
+        for attempt in range(2):
+            try:
+                with self._lock:
+                    err = self._start()
+                    if not err:
+                        container_id = self._container[1]
+                        paths, digests = self._stage(container_id, input, expected, input_hash, testdata)
+                if err:
+                    return self._count("errors", None, err)
+                try:
+                    return self._run(container_id, actual, paths)
+                finally:
+                    with self._lock:
+                        self._in_use.subtract(digests)
+            except LookupError as e:
+                # the input is in neither testdata; an empty file in its place could pass the check
+                return self._count("errors", None, str(e))
+            except subprocess.TimeoutExpired:
+                # hung past `timeout -s KILL`; a fresh sandbox gets rid of it
+                with self._lock:
+                    self._drop()
+                    self._counts["restarts"] += 1
+                return self._count("errors", None, f"checker ran over {self.time_limit_s} s")
+            except Exception as e:
+                # the sandbox is gone (or broken); start a fresh one once
+                with self._lock:
+                    self._drop()
+                    self._counts["restarts"] += 1
+                if attempt:
+                    return self._count("errors", None, f"{e}")
+
+    def close(self):
+        """Remove the sandbox; the next check() starts a new one."""
+        with self._lock:
+            self._drop()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    # internals (the caller holds the lock unless noted)
+
+    def _backend(self):
+        return self.backend or get_backend()
+
+    def _count(self, name, ok, message):
+        with self._lock:
+            self._counts["checks"] += 1
+            self._counts[name] += 1
+        return ok, message
+
+    def _start(self):
+        if self._container is not None:
+            return None
+        if self.compile_error:
+            return f"checker does not compile: {self.compile_error[:MESSAGE_CHARS]}"
+        backend = self._backend()
+        image_ref, err = (self.images or get_image_manager()).resolve(self.image_name, backend)
+        if err:
+            return err
+        name = f"judge_checker_{uuid.uuid4().hex[:8]}"
+        container_id, err = start_container(name, image_ref, self.memory_limit_mb, keepalive="infinity",
+                                            backend=backend, binds=self.testdata.binds if self.testdata else None)
+        if err:
+            return err
+        err = upload_files(container_id, [(self.lang.source, self.code)], backend=backend)
+        ok = err is None
+        if ok and self.lang.compiler:
+            if self.compile_cache is not None:
+                ok, out = _compile_cached(backend, self.compile_cache, container_id, image_ref, self.lang, self.code)
+            else:
+                ok, out = _compile(backend, container_id, self.lang)
+            if not ok:
+                self.compile_error = out
+                err = f"checker does not compile: {out[:MESSAGE_CHARS]}"
+        if not ok:
+            (self.reaper or get_reaper()).reap(name, backend)
+            return err
+        self._container = (name, container_id)
+        return None
+
+    def _drop(self):
+        if self._container is not None:
+            (self.reaper or get_reaper()).reap(self._container[0], self._backend())
+        self._container = None
+        self._files.clear()
+        self._data_bytes = 0
+
+    def _stage(self, container_id, input, expected, input_hash, testdata=None):
+        """
+        Sandbox paths for the checker's input and expected files, copying what is not there yet.
+        An input_hash is read from the mounted self.testdata, or copied from testdata's file;
+        LookupError if neither has it.
+        """
+        files = [("expected", expected, None)]
+        mounted = pinned = None
+        if input_hash is None:
+            files.insert(0, ("input", input, None))
+        elif self.testdata is not None and input_hash in self.testdata:
+            mounted = self.testdata.container_path(input_hash)
+        elif input_hash in self._files:
+            files.insert(0, ("input", None, input_hash))
+        elif testdata is not None and testdata.pin(input_hash):
+            # kept on disk until it is copied in
+            pinned = testdata
+            files.insert(0, ("input", pathlib.Path(testdata.host_path(input_hash)), input_hash))
+        else:
+            raise LookupError(f"input {input_hash} unavailable (not in the test data cache)")
+        try:
+            paths, digests = self._copy(container_id, files)
+        finally:
+            if pinned is not None:
+                pinned.unpin(input_hash)
+        if mounted is not None:
+            paths["input"] = mounted
+        return paths, digests
+
+    def _copy(self, container_id, files):
+        """Copy (role, data, digest or None) files into the sandbox unless there. Returns (paths, digests)."""
+        paths, digests, uploads = {}, [], []
+        for role, data, digest in files:
+            data = b"" if data is None else data
+            if digest is None:
+                if hasattr(data, "seek"):
+                    data.seek(0)
+                digest = input_digest(data)
+            paths[role] = f"{WORKDIR}/data/{digest}"
+            digests.append(digest)
+            self._in_use[digest] += 1
+            if digest in self._files:
+                self._files.move_to_end(digest)
+            elif digest not in (d for d, _ in uploads):
+                uploads.append((digest, data))
+        if uploads:
+            err = upload_files(container_id, [(f"data/{digest}", data) for digest, data in uploads],
+                               backend=self._backend())
+            if err:
+                self._in_use.subtract(digests)
+                raise RuntimeError(f"copying test files into the checker sandbox failed: {err}")
+            for digest, data in uploads:
+                self._files[digest] = _size(data)
+                self._data_bytes += self._files[digest]
+                self._counts["uploads"] += 1
+            self._evict(container_id)
+        return paths, digests
+
+    def _evict(self, container_id):
+        victims = []
+        for digest in list(self._files):
+            if self._data_bytes <= self.data_limit_bytes:
+                break
+            if self._in_use[digest] > 0:
+                continue
+            self._data_bytes -= self._files.pop(digest)
+            victims.append(f"{WORKDIR}/data/{digest}")
+        if victims:
+            self._backend().exec(container_id, ["rm", "-f"] + victims)
+
+    def _run(self, container_id, actual, paths):
+        # called without the lock; concurrent checks run side by side in the sandbox
+        out_name = f"actual_{uuid.uuid4().hex[:12]}"
+        if isinstance(actual, str):
+            actual = actual.encode("utf-8")
+        elif hasattr(actual, "seek"):
+            # uploads send a file from its current position; a retry finds it at the end
+            actual.seek(0)
+        err = upload_files(container_id, [(out_name, actual)], backend=self._backend())
+        if err:
+            raise RuntimeError(f"copying the output into the checker sandbox failed: {err}")
+        paths = dict(paths, actual=f"{WORKDIR}/{out_name}")
+        program = [f"{WORKDIR}/{BINARY}"] if self.lang.compiler else list(self.lang.run)
+        checker = shlex.join(["timeout", "-s", "KILL", str(self.time_limit_s)] + program
+                             + [paths[role] for role in self.arg_order])
+        script = f"cd {WORKDIR} && {checker}; s=$?; rm -f {shlex.quote(paths['actual'])}; exit $s"
+        p = self._backend().exec(container_id, ["sh", "-c", script], timeout=self.time_limit_s + 10)
+        message = (_decode(p.stdout) + _decode(p.stderr)).strip()[:MESSAGE_CHARS]
+        if p.exit_code == 0:
+            return self._count("accepted", True, message)
+        if p.exit_code in REJECT_CODES:
+            return self._count("rejected", False, message or "rejected by the checker")
+        if p.exit_code in (124, 137):
+            # timeout's KILL, or the sandbox's OOM killer
+            return self._count("errors", None, f"checker was killed after {self.time_limit_s} s "
+                                               f"or at {self.memory_limit_mb} MB")
+        return self._count("errors", None, f"checker exited with {p.exit_code}: {message}")
+
+
+_judges = OrderedDict()
+_judges_lock = threading.Lock()
+
+
+def get_special_judge(language, code, **kwargs):
+    """
+    The process-wide SpecialJudge for a checker source (in practice, one per problem), created
+    with kwargs on first use. Beyond MAX_SPECIAL_JUDGES, the least recently used is closed.
+    """
+    key = (language, hashlib.sha256(code.encode("utf-8")).hexdigest())
+    with _judges_lock:
+        judge = _judges.get(key)
+        if judge is None:
+            judge = _judges[key] = SpecialJudge(language, code, **kwargs)
+        _judges.move_to_end(key)
+        evicted = [_judges.popitem(last=False)[1] for _ in range(len(_judges) - MAX_SPECIAL_JUDGES)]
+    for old in evicted:
+        old.close()
+    return judge
+
+
+@atexit.register
+def _close_special_judges():
+    with _judges_lock:
+        judges = list(_judges.values())
+        _judges.clear()
+    for judge in judges:
+        judge.close()
@@ -0,0 +1,43 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from admission import AdmissionController
+from one import execute_code
+
+
+if __name__ == '__main__':
+    import json
+    # --- Example Usage ---
+
+    python_code_sleep = """
+import time
+time.sleep(0.5)
+print("done")
+"""
+
+    # Example 1: Six 128 MB sandboxes on a 300 MB budget run two at a time
+    print("--- Example 1: Queued until memory is free ---")
+    admission = AdmissionController(memory_budget_mb=300, max_wait_s=10)
+    started = time.monotonic()
+    with ThreadPoolExecutor(6) as ex:
+        results = list(ex.map(lambda _: execute_code(language='python', code=python_code_sleep, memory_limit_mb=128,
+                                                     admission=admission, timings=True), range(6)))
+    print(f"{[r['stdout'].strip() for r in results]} in {time.monotonic() - started:.2f} s")
+    print(f"waited (ms): {[r['phases_ms']['admission'] for r in results]}")
+    print(json.dumps(admission.stats, indent=2))
+    print("-" * 20)
+
+    # Example 2: A sandbox larger than the whole budget is rejected at once
+    print("--- Example 2: Too large for the host ---")
+    result = execute_code(language='python', code=python_code_sleep, memory_limit_mb=1024, admission=admission)
+    print(result["err_message"])
+    print("-" * 20)
+
+    # Example 3: Backpressure with a short queue and no patience
+    print("--- Example 3: Busy ---")
+    admission = AdmissionController(memory_budget_mb=200, max_queue=1, max_wait_s=0.2)
+    with ThreadPoolExecutor(3) as ex:
+        results = list(ex.map(lambda _: execute_code(language='python', code=python_code_sleep, memory_limit_mb=128,
+                                                     admission=admission), range(3)))
+    print([r["err_message"] or r["stdout"].strip() for r in results])
+    print("-" * 20)
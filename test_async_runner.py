@@ -0,0 +1,46 @@
+from async_runner import execute_code_async, ContainerLimiter
+
+
+if __name__ == '__main__':
+    import asyncio
+    import json
+    # --- Example Usage ---
+
+    async def main():
+        limiter = ContainerLimiter(max_containers=2)
+
+        # Example 1: Several submissions at once, at most two containers alive
+        print("--- Example 1: Concurrent Python runs (limit 2) ---")
+        python_code = """
+import sys
+name = sys.stdin.readline()
+print(f"Hello, {name.strip()}!")
+"""
+        results = await asyncio.gather(*[
+            execute_code_async(language='python', code=python_code, stdin=f'World {i}',
+                               time_limit_s=5, memory_limit_mb=128, limiter=limiter)
+            for i in range(4)
+        ])
+        print(json.dumps(results, indent=2))
+        print("-" * 20)
+
+        # Example 2: Cancelling a long run still removes its container
+        print("--- Example 2: C Time Limit Exceeded, cancelled early ---")
+        c_code_tle = """
+#include <stdio.h>
+int main() {
+    while(1); // Infinite loop
+    return 0;
+}
+"""
+        task = asyncio.ensure_future(execute_code_async(language='c', code=c_code_tle, time_limit_s=10,
+                                                        memory_limit_mb=128, limiter=limiter))
+        await asyncio.sleep(3)
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            print("cancelled; container removed")
+        print("-" * 20)
+
+    asyncio.run(main())
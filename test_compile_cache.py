@@ -0,0 +1,37 @@
+from compile_cache import CompileCache
+from one import execute_code
+
+
+if __name__ == '__main__':
+    import json
+    import tempfile
+    import time
+    # --- Example Usage ---
+
+    cache = CompileCache(directory=tempfile.mkdtemp(prefix="compile_cache_"), max_bytes=64 * 1024 * 1024)
+
+    # Example 1: The second identical submission skips the compiler
+    print("--- Example 1: C++ compiled once, served from cache afterwards ---")
+    cpp_code = """
+#include <bits/stdc++.h>
+int main() {
+    std::cout << "cached" << std::endl;
+    return 0;
+}
+"""
+    for attempt in range(2):
+        start = time.time()
+        result = execute_code(language='c++', code=cpp_code, time_limit_s=2, memory_limit_mb=256,
+                              compile_cache=cache)
+        print(json.dumps(result, indent=2))
+        print(f"attempt {attempt}: {time.time() - start:.2f}s")
+    print(json.dumps(cache.stats, indent=2))
+    print("-" * 20)
+
+    # Example 2: Compile errors are cached too
+    print("--- Example 2: C compile error from cache ---")
+    for attempt in range(2):
+        result = execute_code(language='c', code='int main() { return x; }', compile_cache=cache)
+        print(json.dumps(result, indent=2))
+    print(json.dumps(cache.stats, indent=2))
+    print("-" * 20)
@@ -0,0 +1,45 @@
+from container_pool import ContainerPool
+from one import execute_code
+
+
+if __name__ == '__main__':
+    import json
+    import time
+    # --- Example Usage ---
+
+    with ContainerPool(size=2, max_uses=20) as pool:
+        pool.warm(memory_limit_mb=128)
+
+        # Example 1: Many small submissions share the warm containers
+        print("--- Example 1: Python Success (pooled) ---")
+        python_code = """
+import sys
+name = sys.stdin.readline()
+print(f"Hello, {name.strip()}!")
+"""
+        start = time.time()
+        for i in range(5):
+            result = execute_code(language='python', code=python_code, stdin=f'World {i}',
+                                  time_limit_s=5, memory_limit_mb=128, pool=pool)
+            print(json.dumps(result, indent=2))
+        print(f"5 runs in {time.time() - start:.2f}s")
+        print("-" * 20)
+
+        # Example 2: A submission leaving a background process behind; the next run gets a clean container
+        print("--- Example 2: Leftover processes are killed between uses ---")
+        python_code = """
+import os, subprocess
+subprocess.Popen(["sleep", "1000"])
+open("leftover.txt", "w").write("x")
+print("spawned")
+"""
+        result = execute_code(language='python', code=python_code, time_limit_s=5, memory_limit_mb=128, pool=pool)
+        print(json.dumps(result, indent=2))
+        python_code = """
+import os
+print(os.listdir("."))
+"""
+        result = execute_code(language='python', code=python_code, time_limit_s=5, memory_limit_mb=128, pool=pool)
+        print(json.dumps(result, indent=2))
+        print(json.dumps(pool.stats, indent=2))
+        print("-" * 20)
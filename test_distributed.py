@@ -0,0 +1,61 @@
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+from distributed import Coordinator
+
+
+if __name__ == '__main__':
+    import json
+    # --- Example Usage ---
+
+    # a coordinator in this process and two worker processes on this machine, each with its own caches
+    coord = Coordinator(port=0, secret="example", heartbeat_s=0.5, worker_timeout_s=3).start()
+    host, port = coord.address
+    cache_dir = tempfile.mkdtemp()
+    workers = [subprocess.Popen([sys.executable, "distributed.py", "worker", f"{host}:{port}", "--name", f"worker{i}",
+                                 "--secret", "example", "--cache-dir", os.path.join(cache_dir, f"worker{i}")])
+               for i in range(2)]
+    while len(coord.stats()["workers"]) < 2:
+        time.sleep(0.1)
+
+    python_code_double = """
+n = int(input())
+print(n * 2)
+"""
+
+    # Example 1: Submissions of four problems spread over the workers
+    print("--- Example 1: Judging on two workers ---")
+    problems = {p: [str(p * 10 + i) for i in range(3)] for p in range(4)}
+    futures = [coord.submit("contest", language='python', code=python_code_double, inputs=inputs,
+                            expected_outputs=[str(int(x) * 2) for x in inputs], time_limit_s=1)
+               for inputs in problems.values()]
+    for future in futures:
+        print([r["success"] for r in future.result()])
+    print("-" * 20)
+
+    # Example 2: A rejudge goes to the workers that already hold each problem's test data
+    print("--- Example 2: Data-locality routing ---")
+    futures = [coord.submit("rejudge", language='python', code=python_code_double, inputs=inputs, time_limit_s=1)
+               for inputs in problems.values()]
+    for future in futures:
+        print([r["stdout"].strip() for r in future.result()])
+    print(json.dumps(coord.stats(), indent=2))
+    print("-" * 20)
+
+    # Example 3: A worker dies halfway through a job, which is re-queued on the other one
+    print("--- Example 3: Worker death ---")
+    slow = coord.submit("contest", language='python', code='import time\ntime.sleep(1.5)\nprint("done")',
+                        inputs=[''], time_limit_s=5)
+    while not any(w["busy"] for w in coord.stats()["workers"].values()):
+        time.sleep(0.05)
+    busy = next(name for name, w in coord.stats()["workers"].items() if w["busy"])
+    workers[int(busy[len("worker"):])].kill()
+    print(f"killed {busy}: {slow.result()[0]['stdout'].strip()}, requeued: {coord.stats()['requeued']}")
+    print("-" * 20)
+
+    coord.shutdown()
+    for w in workers:
+        w.wait()
@@ -0,0 +1,36 @@
+from docker_backend import EngineApiBackend, CliBackend, get_backend
+from fake_docker_daemon import FakeDockerDaemon
+from one import execute_code
+
+
+if __name__ == '__main__':
+    import json
+    # --- Example Usage ---
+
+    # Example 0: Which backend this machine would use
+    print("--- Example 0: Default backend ---")
+    print(get_backend().name)
+    print("-" * 20)
+
+    # Example 1: The Engine API backend against the fake daemon (no Docker needed)
+    print("--- Example 1: Engine API backend on a fake daemon ---")
+
+    def exec_handler(container, cmd, stdin):
+        if cmd[:2] == ["sh", "-c"] and "time -v" in cmd[2]:
+            return 0, b"Hello, World!\n", b"\tUser time (seconds): 0.01\n\tMaximum resident set size (kbytes): 3772\n"
+        return 0, b"", b""
+
+    with FakeDockerDaemon(exec_handler=exec_handler) as daemon:
+        backend = EngineApiBackend(daemon.socket_path)
+        for i in range(3):
+            result = execute_code(language='python', code='print("Hello, World!")', backend=backend)
+            print(json.dumps(result, indent=2))
+        print(f"{len(daemon.calls)} API calls over {daemon.connections} connections (exec streams use their own)")
+        print(f"containers left behind: {len(daemon.containers)}")
+    print("-" * 20)
+
+    # Example 2: The CLI fallback, same result shape
+    print("--- Example 2: CLI backend ---")
+    result = execute_code(language='python', code='print("Hello, World!")', backend=CliBackend())
+    print(json.dumps(result, indent=2))
+    print("-" * 20)
@@ -0,0 +1,35 @@
+import time
+
+from image_manager import ImageManager
+from one import IMAGE_NAME, SANDBOX_DOCKERFILE, execute_code
+from docker_backend import get_backend
+
+
+if __name__ == '__main__':
+    import json
+    # --- Example Usage ---
+
+    backend = get_backend()
+    images = ImageManager(backend=backend, dockerfiles={IMAGE_NAME: SANDBOX_DOCKERFILE}, ttl_s=60)
+
+    # Example 1: Warm-up at startup checks (and builds if missing) the image and pins its digest
+    print("--- Example 1: Warm-up ---")
+    print(images.warm())
+    print(images.pinned())
+    print("-" * 20)
+
+    # Example 2: Submissions resolve the image from memory
+    print("--- Example 2: Request path ---")
+    for _ in range(3):
+        result = execute_code(language='python', code='print("hi")', backend=backend, images=images, timings=True)
+        print(f"{result['stdout'].strip()}: image phase {result['phases_ms']['image']} ms")
+    print(json.dumps(images.stats, indent=2))
+    print("-" * 20)
+
+    # Example 3: An image that does not exist fails fast instead of being built on the request path
+    print("--- Example 3: Missing image ---")
+    started = time.monotonic()
+    result = execute_code(language='python', code='print("hi")', image_name="no-such-image:latest",
+                          backend=backend, images=images)
+    print(f"{result['err_message']} ({time.monotonic() - started:.2f} s)")
+    print("-" * 20)
@@ -0,0 +1,41 @@
+import languages
+from one import execute_code
+
+
+if __name__ == '__main__':
+    import json
+    # --- Example Usage ---
+
+    # Example 1: The registry, as read from languages.json
+    print("--- Example 1: Registered languages ---")
+    for name, lang in sorted(languages.get_languages().items()):
+        print(f"{name:8} -> {lang.name:7} compile: {languages.compile_argv(lang)}  run: {lang.run}")
+    print("-" * 20)
+
+    # Example 2: C++ is compiled with -O2, so this loop fits comfortably in the limit
+    print("--- Example 2: C++17 with -O2 ---")
+    cpp_code = """
+#include <bits/stdc++.h>
+int main() {
+    std::vector<long long> v(20000000);
+    std::iota(v.begin(), v.end(), 0);
+    std::cout << std::accumulate(v.begin(), v.end(), 0LL) << std::endl;
+}
+"""
+    result = execute_code(language='c++17', code=cpp_code, time_limit_s=2, memory_limit_mb=512)
+    print(json.dumps(result, indent=2))
+    print("-" * 20)
+
+    # Example 3: C++20 and PyPy are just other entries
+    print("--- Example 3: C++20 and PyPy ---")
+    cpp20_code = """
+#include <bits/stdc++.h>
+int main() { std::vector<int> v{3, 1, 2}; std::ranges::sort(v); std::cout << v[0] << v[1] << v[2] << std::endl; }
+"""
+    print(json.dumps(execute_code(language='c++20', code=cpp20_code), indent=2))
+    print(json.dumps(execute_code(language='pypy', code='print(sum(range(10 ** 7)))'), indent=2))
+    print("-" * 20)
+
+    # Example 4: Unknown languages are rejected before any container starts
+    print("--- Example 4: Unsupported language ---")
+    print(execute_code(language='cobol', code='')["err_message"])
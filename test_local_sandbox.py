@@ -0,0 +1,46 @@
+from local_sandbox import LocalSandboxBackend
+from one import execute_batch, execute_code
+
+
+if __name__ == '__main__':
+    import json
+    # --- Example Usage ---
+
+    backend = LocalSandboxBackend()
+    print(f"namespaces available: {backend.ping()}")
+
+    # Example 1: Same result dict as the docker backends, without starting a container
+    print("--- Example 1: C++ in a namespace sandbox ---")
+    cpp_code = """
+#include <iostream>
+int main() { long long a, b; std::cin >> a >> b; std::cout << a + b << std::endl; }
+"""
+    results = execute_batch(language='c++', code=cpp_code, inputs=['1 2', '3 4'], expected_outputs=['3', '7'],
+                            memory_limit_mb=256, backend=backend, timings=True)
+    print(json.dumps(results, indent=2))
+    print("-" * 20)
+
+    # Example 2: The host's file system is read-only and there is no network
+    print("--- Example 2: Python trying to escape ---")
+    python_code = """
+import os, socket
+print(sorted(os.listdir('/')))
+try:
+    open('/usr/evil', 'w')
+except OSError as e:
+    print('write:', e)
+try:
+    socket.create_connection(('1.1.1.1', 80), timeout=1)
+except OSError as e:
+    print('network:', e)
+"""
+    result = execute_code(language='python', code=python_code, memory_limit_mb=256, backend=backend)
+    print(json.dumps(result, indent=2))
+    print("-" * 20)
+
+    # Example 3: Memory and time limits still come from the per-job cgroup and judge_run.py
+    print("--- Example 3: Memory Limit Exceeded ---")
+    result = execute_code(language='python', code='x = bytearray(512 * 1024 * 1024)', memory_limit_mb=128,
+                          backend=backend)
+    print(json.dumps(result, indent=2))
+    print("-" * 20)
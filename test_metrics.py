@@ -0,0 +1,49 @@
+import metrics
+from one import execute_batch, execute_code
+
+
+class PrintingHook(metrics.Hook):
+    """Prints every phase as it finishes, the way a tracing hook would open and close spans."""
+
+    def phase_started(self, phase, labels):
+        print(f"  start {phase} ({labels['language']})")
+
+    def phase_finished(self, phase, labels, duration_s, error, context):
+        print(f"  end   {phase} after {duration_s * 1000:.1f} ms" + (f" with {error!r}" if error else ""))
+
+
+if __name__ == '__main__':
+    import json
+    import urllib.request
+    # --- Example Usage ---
+
+    registry = metrics.get_registry()
+    hook = PrintingHook()
+    registry.add_hook(hook)
+
+    # Example 1: Per-phase timings in the result dict
+    print("--- Example 1: C++ batch with timings=True ---")
+    cpp_code = """
+#include <iostream>
+int main() { long long a, b; std::cin >> a >> b; std::cout << a + b << std::endl; }
+"""
+    results = execute_batch(language='c++', code=cpp_code, inputs=['1 2', '3 4'], expected_outputs=['3', '8'],
+                            timings=True)
+    print(json.dumps([r["phases_ms"] for r in results], indent=2))
+    registry.remove_hook(hook)
+    print("-" * 20)
+
+    # Example 2: Runs are counted by language and verdict
+    print("--- Example 2: Python runs ending in OK, RE and TLE ---")
+    for code in ('print("ok")', 'raise SystemExit(3)', 'while True: pass'):
+        execute_code(language='python', code=code, time_limit_s=1)
+    print(registry.to_prometheus())
+    print("-" * 20)
+
+    # Example 3: The same metrics over HTTP, for a Prometheus scrape
+    print("--- Example 3: /metrics.json ---")
+    server = metrics.start_http_server(0, host="127.0.0.1")
+    url = f"http://127.0.0.1:{server.server_address[1]}/metrics.json"
+    print(json.dumps(json.loads(urllib.request.urlopen(url).read())["judge_runs_total"], indent=2))
+    server.shutdown()
+    print("-" * 20)
@@ -1,4 +1,4 @@
-from one import execute_code
+from one import CancelToken, execute_code, execute_batch, execute_stream
 
 
 if __name__ == '__main__':
@@ -65,3 +65,65 @@ int main() {
     result = execute_code(language='c++', code=cpp_code_mle, stdin='', time_limit_s=5, memory_limit_mb=128)
     print(json.dumps(result, indent=2))
     print("-" * 20)
+
+    # Example 5: Several test cases, compiled once and run in one container
+    print("--- Example 5: C++ Batch ---")
+    cpp_code_sum = """
+#include <iostream>
+int main() {
+    long long a, b;
+    std::cin >> a >> b;
+    std::cout << a + b << std::endl;
+    return 0;
+}
+"""
+    results = execute_batch(language='c++', code=cpp_code_sum, inputs=['1 2', '3 4', 'x y', '5 6'],
+                            time_limit_s=2, memory_limit_mb=128, stop_on_first_failure=True)
+    print(json.dumps(results, indent=2))
+    print("-" * 20)
+
+    # Example 6: Printing forever is stopped at the output limit
+    print("--- Example 6: Python Output Limit Exceeded ---")
+    python_code_ole = """
+while True:
+    print("spam" * 100)
+"""
+    result = execute_code(language='python', code=python_code_ole, time_limit_s=5, memory_limit_mb=128,
+                          output_limit_bytes=1024 * 1024)
+    print(json.dumps(result, indent=2))
+    print("-" * 20)
+
+    # Example 7: Output checked against the expected answer
+    print("--- Example 7: C++ Batch with expected outputs ---")
+    results = execute_batch(language='c++', code=cpp_code_sum, inputs=['1 2', '3 4'],
+                            expected_outputs=['3\n', '8\n'], checker_mode='tokens',
+                            time_limit_s=2, memory_limit_mb=128)
+    print(json.dumps(results, indent=2))
+    print("-" * 20)
+
+    # Example 8: Many small Python test cases without an interpreter start per case
+    print("--- Example 8: Python Batch with python_fork ---")
+    python_code_double = """
+n = int(input())
+print(n * 2)
+"""
+    results = execute_batch(language='python', code=python_code_double, inputs=[str(i) for i in range(100)],
+                            expected_outputs=[str(i * 2) for i in range(100)], python_fork=True,
+                            time_limit_s=1, memory_limit_mb=128)
+    print(f"passed: {sum(r['success'] for r in results)}/100, "
+          f"max cpu_time_ms: {max(r['cpu_time_ms'] or 0 for r in results)}")
+    print("-" * 20)
+
+    # Example 9: Verdicts streamed per test case, cancelled at the first failure
+    print("--- Example 9: Streaming with early cancel ---")
+    token = CancelToken()
+    for event in execute_stream(language='python', code=python_code_double, inputs=['1', '2', 'x', '4', '5'],
+                                expected_outputs=['2', '4', '6', '8', '10'], cancel=token,
+                                time_limit_s=1, memory_limit_mb=128):
+        if event["event"] == "result":
+            print(f"test {event['index']}: {event['result']['success']} {event['result']['err_message'][:40]}")
+            if not event["result"]["success"]:
+                token.cancel()
+        elif event["event"] != "finished":
+            print(event)
+    print("-" * 20)
@@ -0,0 +1,32 @@
+from one import compile_submission, execute_batch
+from pipeline import JudgePipeline
+
+
+if __name__ == '__main__':
+    import json
+    # --- Example Usage ---
+
+    cpp_code = """
+#include <bits/stdc++.h>
+int main() { long long a, b; std::cin >> a >> b; std::cout << a + b << std::endl; }
+"""
+
+    # Example 1: Compile in one sandbox, run the binary in another
+    print("--- Example 1: compile_submission + execute_batch(compiled=...) ---")
+    compiled, err = compile_submission("c++", cpp_code)
+    print(f"error: {err}, binary: {len(compiled.binary)} bytes, compile: {compiled.compile_time_ms} ms")
+    results = execute_batch(compiled=compiled, inputs=['1 2', '3 4'], expected_outputs=['3', '7'])
+    print(json.dumps(results, indent=2))
+    print("-" * 20)
+
+    # Example 2: Submissions flow through both stages; the compile error never gets a run sandbox
+    print("--- Example 2: JudgePipeline ---")
+    with JudgePipeline() as pipe:
+        futures = [
+            pipe.submit("contest", language="c++", code=cpp_code, inputs=['1 2', '5 5']),
+            pipe.submit("practice", language="c", code="int main() { return missing; }", inputs=['']),
+            pipe.submit("rejudge", language="python", code="print(sum(map(int, input().split())))", inputs=['2 2']),
+        ]
+        for future in futures:
+            print([r["err_message"] or r["stdout"].strip() for r in future.result()])
+        print(json.dumps(pipe.stats(), indent=2))
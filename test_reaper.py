@@ -0,0 +1,34 @@
+import time
+
+from reaper import ContainerReaper, DEADLINE_LABEL, LABEL
+from one import IMAGE_NAME, execute_code, start_container
+from docker_backend import get_backend
+
+
+if __name__ == '__main__':
+    import json
+    # --- Example Usage ---
+
+    backend = get_backend()
+    reaper = ContainerReaper(backend=backend, sweep_interval_s=5)
+
+    # Example 1: The verdict comes back before the container is removed
+    print("--- Example 1: Background removal ---")
+    result = execute_code(language='python', code='print("hi")', backend=backend, reaper=reaper, timings=True)
+    print(f"cleanup took {result['phases_ms']['cleanup']} ms, pending: {reaper.stats['pending']}")
+    reaper.drain()
+    print(json.dumps(reaper.stats, indent=2))
+    print("-" * 20)
+
+    # Example 2: A labelled container past its deadline, as a crashed judge would leave it
+    print("--- Example 2: Sweeping an orphan ---")
+    backend.run_container("judge_orphan_example", IMAGE_NAME, ["sleep", "300"], 64,
+                          labels={LABEL: "1", DEADLINE_LABEL: str(int(time.time()) - 1)})
+    # a live container of this process is left alone
+    live_id, _ = start_container("judge_live_example", IMAGE_NAME, 64, backend=backend)
+    print(f"expired containers found: {reaper.sweep()}")
+    reaper.drain()
+    print([c["name"] for c in backend.list_containers(LABEL)])
+    reaper.reap(live_id)
+    reaper.close()
+    print(json.dumps(reaper.stats, indent=2))
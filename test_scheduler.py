@@ -0,0 +1,39 @@
+from container_pool import ContainerPool
+from one import execute_batch
+from scheduler import JudgeScheduler
+
+
+if __name__ == '__main__':
+    import json
+    # --- Example Usage ---
+
+    with ContainerPool(size=1) as pool, JudgeScheduler(pool=pool, time_limit_s=5, memory_limit_mb=128) as sched:
+        print(f"workers pinned to cpus {sched.cpus}")
+
+        # Example 1: A rejudge backlog does not delay live contest submissions
+        print("--- Example 1: Contest jobs jump the rejudge queue ---")
+        python_code = """
+import sys
+name = sys.stdin.readline()
+print(f"Hello, {name.strip()}!")
+"""
+        rejudges = [sched.submit("rejudge", language='python', code=python_code, stdin=f'Rejudge {i}')
+                    for i in range(8)]
+        contest = sched.submit("contest", language='python', code=python_code, stdin='Contestant')
+        print(json.dumps(contest.result(), indent=2))
+        print(json.dumps(sched.stats(), indent=2))
+        for f in rejudges:
+            f.result()
+        print("-" * 20)
+
+        # Example 2: Batch jobs go through the same queue
+        print("--- Example 2: execute_batch on a pinned core ---")
+        cpp_code = """
+#include <iostream>
+int main() { long long a, b; std::cin >> a >> b; std::cout << a + b << std::endl; }
+"""
+        future = sched.submit("practice", runner=execute_batch, language='c++', code=cpp_code,
+                              inputs=['1 2', '3 4'])
+        print(json.dumps(future.result(), indent=2))
+        print(json.dumps(sched.stats(), indent=2))
+        print("-" * 20)
@@ -0,0 +1,55 @@
+from one import execute_batch
+from special_judge import SpecialJudge, get_special_judge
+
+
+if __name__ == '__main__':
+    import json
+    # --- Example Usage ---
+
+    # accepts any output within 1e-3 of the expected number
+    c_checker = r"""
+#include <math.h>
+#include <stdio.h>
+int main(int argc, char** argv) {
+    FILE* expected = fopen(argv[2], "r");
+    FILE* actual = fopen(argv[3], "r");
+    double want, got;
+    if (fscanf(expected, "%lf", &want) != 1) return 3;
+    if (fscanf(actual, "%lf", &got) != 1) { printf("no number in the output\n"); return 1; }
+    if (fabs(want - got) > 1e-3) { printf("expected %g, got %g\n", want, got); return 1; }
+    printf("ok %g\n", got);
+    return 0;
+}
+"""
+
+    python_code_third = """
+n = int(input())
+print(n / 3 + (0.1 if n == 5 else 0))
+"""
+
+    # Example 1: One checker sandbox for every test case; case 5 is off by 0.1
+    print("--- Example 1: Floating-point checker ---")
+    judge = get_special_judge('c', c_checker)
+    inputs = [str(i) for i in range(1, 7)]
+    answers = [f"{i / 3:.6f}" for i in range(1, 7)]
+    results = execute_batch(language='python', code=python_code_third, inputs=inputs, expected_outputs=answers,
+                            special_judge=judge)
+    for r in results:
+        print(r["checker_passed"], r["checker_message"])
+    print("-" * 20)
+
+    # Example 2: A second submission reuses the compiled checker and the copied test files
+    print("--- Example 2: Warm checker ---")
+    results = execute_batch(language='python', code='print(int(input()) / 3)', inputs=inputs,
+                            expected_outputs=answers, special_judge=judge, timings=True)
+    print(f"checks (ms): {[r['phases_ms']['check'] for r in results]}")
+    print(json.dumps(judge.stats, indent=2))
+    print("-" * 20)
+
+    # Example 3: A checker that hangs is a checker error, not a verdict on the submission
+    print("--- Example 3: Checker error ---")
+    with SpecialJudge('python', 'while True: pass', time_limit_s=1) as hanging:
+        result = execute_batch(language='python', code='print(1)', inputs=[''], expected_outputs=['1'],
+                               special_judge=hanging)[0]
+    print(result["err_message"])
+    print("-" * 20)
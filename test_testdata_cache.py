@@ -0,0 +1,31 @@
+from container_pool import ContainerPool
+from one import execute_batch
+from testdata_cache import TestDataCache
+
+
+if __name__ == '__main__':
+    import json
+    import tempfile
+    # --- Example Usage ---
+
+    cache = TestDataCache(directory=tempfile.mkdtemp(prefix="testdata_"), max_bytes=256 * 1024 * 1024)
+
+    # register a problem's tests once; the hashes are what runs refer to
+    inputs = ["1 2", "3 4", " ".join(["5"] * 100000) + "\n0"]
+    hashes = [cache.register(data) for data in inputs]
+
+    # Example 1: Two submissions to the same problem read the same cached inputs
+    print("--- Example 1: Python submissions reading inputs from the test-data volume ---")
+    python_code = """
+import sys
+print(sum(map(int, sys.stdin.read().split())))
+"""
+    with ContainerPool(size=1) as pool:
+        pool.warm(memory_limit_mb=128, binds=cache.binds)
+        for submission in range(2):
+            results = execute_batch(language='python', code=python_code, input_hashes=hashes, testdata=cache,
+                                    expected_outputs=['3', '7', '500000'], time_limit_s=5, memory_limit_mb=128,
+                                    pool=pool)
+            print(json.dumps(results, indent=2))
+    print(json.dumps(cache.stats, indent=2))
+    print("-" * 20)
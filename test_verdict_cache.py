@@ -0,0 +1,33 @@
+import tempfile
+
+from one import execute_batch, execute_code
+from verdict_cache import VerdictCache
+
+
+if __name__ == '__main__':
+    import json
+    # --- Example Usage ---
+
+    cache = VerdictCache(tempfile.mkdtemp(prefix="verdict_cache_example_"))
+    code = "n = int(input())\nprint(n * 2)"
+
+    # Example 1: The first judging runs everything, with a wrong answer file for the last case
+    print("--- Example 1: First judging ---")
+    results = execute_batch(language='python', code=code, inputs=['1', '2', '3'], expected_outputs=['2', '4', '7'],
+                            verdict_cache=cache)
+    print([(r["err_message"], r["cached"]) for r in results])
+    print("-" * 20)
+
+    # Example 2: The rejudge after fixing the answer file runs nothing and is checked again
+    print("--- Example 2: Rejudge ---")
+    results = execute_batch(language='python', code=code, inputs=['1', '2', '3'], expected_outputs=['2', '4', '6'],
+                            verdict_cache=cache)
+    print([(r["err_message"], r["cached"]) for r in results])
+    print("-" * 20)
+
+    # Example 3: Time limit exceeded is near the limit by definition, so it is run again
+    print("--- Example 3: TLE is re-run ---")
+    for _ in range(2):
+        result = execute_code(language='python', code='while True: pass', time_limit_s=1, verdict_cache=cache)
+        print(result["err_message"], result["cached"])
+    print(json.dumps(cache.stats, indent=2))
@@ -0,0 +1,92 @@
+# testdata_cache.py
+import hashlib
+import os
+
+from disk_cache import DiskLRUCache
+from one import _normalize_stdin
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "annaforces-judge", "testdata")
+# where the cache directory appears inside sandbox containers (read-only)
+DATA_DIR = "/sandbox/data"
+
+
+class TestDataCache:
+    """
+    Host-side store of test inputs keyed by the sha256 of their content.
+
+    register() stores an input once and returns its hash; runs then pass the hash
+    (execute_batch(input_hashes=..., testdata=cache)) and read the file straight from
+    the cache directory, which is bind-mounted read-only at DATA_DIR, instead of
+    uploading stdin for every submission. The cache is bounded to max_bytes with
+    least-recently-used eviction, so the inputs of busy problems stay resident;
+    inputs of a run in progress are pinned and never evicted. See stats.
+
+    The directory must be on the Docker host, since the daemon does the bind mount.
+    """
+
+    __test__ = False  # not a pytest test class, despite the name
+
+    def __init__(self, directory=DEFAULT_CACHE_DIR, max_bytes=2 * 1024 * 1024 * 1024):
+        self.directory = os.path.abspath(directory)
+        self._store = DiskLRUCache(self.directory, max_bytes)
+        self._registered = 0
+        self._reused = 0
+
+    @property
+    def binds(self):
+        """Volume specs for start_container / ContainerPool.acquire."""
+        return [f"{self.directory}:{DATA_DIR}:ro"]
+
+    def register(self, data=None, path=None, fileobj=None, chunk_size=1 << 20):
+        """
+        Store a test input given as str/bytes, a host file path or a seekable binary file
+        object, and return its content hash. Registering the same content again is cheap.
+        str data is normalized like execute_batch's str inputs (LF line ends, final newline).
+        """
+        if path is not None:
+            with open(path, "rb") as f:
+                return self.register(fileobj=f, chunk_size=chunk_size)
+        if fileobj is None:
+            if isinstance(data, str):
+                data = _normalize_stdin(data).encode("utf-8")
+            digest = hashlib.sha256(data).hexdigest()
+        else:
+            start = fileobj.tell()
+            h = hashlib.sha256()
+            for chunk in iter(lambda: fileobj.read(chunk_size), b""):
+                h.update(chunk)
+            digest = h.hexdigest()
+            fileobj.seek(start)
+        if digest in self._store:
+            self._reused += 1
+            return digest
+        self._store.put(digest, data=data, fileobj=fileobj, chunk_size=chunk_size)
+        self._registered += 1
+        return digest
+
+    def __contains__(self, digest):
+        return digest in self._store
+
+    def keys(self):
+        """Hashes of the cached inputs, least recently used first."""
+        return self._store.keys()
+
+    def host_path(self, digest):
+        return self._store.path(digest)
+
+    @staticmethod
+    def container_path(digest):
+        return f"{DATA_DIR}/{digest}"
+
+    def pin(self, digest):
+        """Keep an input on disk while a run uses it. Returns False if it is not cached."""
+        return self._store.pin(digest)
+
+    def unpin(self, digest):
+        self._store.unpin(digest)
+
+    @property
+    def stats(self):
+        """hits/misses count runs finding (or not finding) their input; evictions, entries, bytes."""
+        return dict(self._store.stats, entries=len(self._store), bytes=self._store.total_bytes,
+                    max_bytes=self._store.max_bytes, registered=self._registered, reused=self._reused)
@@ -0,0 +1,137 @@
+# verdict_cache.py
+import hashlib
+import json
+import os
+import threading
+
+from disk_cache import DiskLRUCache
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "annaforces-judge", "verdicts")
+
+# outcomes that only depend on the code, the input, the limits and the image
+_DETERMINISTIC = ("Compilation failed", "Time Limit Exceeded", "Memory Limit Exceeded", "Output Limit Exceeded",
+                  "Runtime Error")
+# filled in by the checker, which runs again on every hit
+_CHECKER_KEYS = ("checker_passed", "checker_message")
+
+
+def input_digest(stdin):
+    """sha256 of a test input given as str, bytes, a path or a seekable binary file (left where it was)."""
+    h = hashlib.sha256()
+    if isinstance(stdin, str):
+        h.update(stdin.encode("utf-8"))
+    elif isinstance(stdin, (bytes, bytearray)):
+        h.update(stdin)
+    elif isinstance(stdin, os.PathLike):
+        with open(stdin, "rb") as f:
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                h.update(chunk)
+    else:
+        start = stdin.tell()
+        for chunk in iter(lambda: stdin.read(1 << 20), b""):
+            h.update(chunk)
+        stdin.seek(start)
+    return h.hexdigest()
+
+
+class VerdictCache:
+    """
+    Host-side cache of run results, for rejudges where nothing but the checker changed.
+
+    Entries are keyed by a hash of (language and toolchain options, code, input digest, time
+    and memory limits, image id), so a new image or a changed limit is a miss. What is stored
+    is the result before checking plus the program's full stdout (up to max_output_bytes);
+    execute_batch(verdict_cache=...) checks a hit against the current expected output again,
+    so a fixed checker or corrected answer file takes effect without re-running anything.
+
+    Near-limit policy: a result whose CPU time or peak memory reached near_limit times its
+    limit (TLE and MLE included) is not served but re-run, since the same program may land
+    on either side of the limit on another run. near_limit=None serves everything.
+    Only deterministic outcomes (OK, CE, TLE, MLE, OLE, RE) are stored. The cache is bounded
+    to max_bytes on disk with least-recently-used eviction; see stats.
+    """
+
+    def __init__(self, directory=DEFAULT_CACHE_DIR, max_bytes=512 * 1024 * 1024, near_limit=0.9,
+                 max_output_bytes=1024 * 1024):
+        self._store = DiskLRUCache(directory, max_bytes)
+        self.near_limit = near_limit
+        self.max_output_bytes = max_output_bytes
+        self._lock = threading.Lock()
+        self._counts = {"served": 0, "reruns": 0, "stored": 0, "uncacheable": 0}
+
+    @staticmethod
+    def key(language, code, input_digest, time_limit_s, memory_limit_mb, image_id, options=()):
+        payload = json.dumps([language, input_digest, round(time_limit_s * 1000), memory_limit_mb, image_id,
+                              list(options)]).encode("utf-8")
+        h = hashlib.sha256(payload)
+        h.update(b"\0")
+        h.update(code.encode("utf-8"))
+        return h.hexdigest()
+
+    def get(self, key, time_limit_s, memory_limit_mb, need_output=False):
+        """
+        Return None on a miss (or when the near-limit policy asks for a re-run), else
+        (result, stdout): the unchecked result dict and the full stdout bytes, or None for
+        stdout if it was too large to keep. With need_output, a hit without stdout is a miss.
+        """
+        data = self._store.get(key)
+        if data is None:
+            return None
+        header, _, stdout = data.partition(b"\n")
+        entry = json.loads(header)
+        result = entry["result"]
+        if self._near_limit(result, time_limit_s, memory_limit_mb):
+            self._count("reruns")
+            return None
+        if not entry["has_output"]:
+            stdout = None
+            if need_output and result["success"]:
+                return None
+        self._count("served")
+        return result, stdout
+
+    def put(self, key, result, stdout=None):
+        """Store an unchecked result; stdout is the full output (bytes or a file, rewound afterwards)."""
+        if not self.cacheable(result):
+            self._count("uncacheable")
+            return
+        if hasattr(stdout, "read"):
+            stdout.seek(0)
+            data = stdout.read(self.max_output_bytes + 1)
+            stdout.seek(0)
+            stdout = data
+        has_output = stdout is not None and len(stdout) <= self.max_output_bytes
+        result = {k: v for k, v in result.items() if k not in _CHECKER_KEYS and k != "phases_ms"}
+        header = json.dumps({"result": result, "has_output": has_output}).encode("utf-8")
+        self._store.put(key, header + b"\n" + (stdout if has_output else b""))
+        self._count("stored")
+
+    def _count(self, name):
+        with self._lock:
+            self._counts[name] += 1
+
+    @staticmethod
+    def cacheable(result):
+        return bool(result["success"] or result["err_message"].startswith(_DETERMINISTIC))
+
+    def _near_limit(self, result, time_limit_s, memory_limit_mb):
+        if self.near_limit is None:
+            return False
+        if result["timed_out"] or result["err_message"].startswith("Memory Limit"):
+            return True
+        cpu, peak = result.get("cpu_time_ms"), result.get("peak_memory_mb")
+        return ((cpu is not None and cpu >= self.near_limit * time_limit_s * 1000)
+                or (peak is not None and peak >= self.near_limit * memory_limit_mb))
+
+    @property
+    def hits(self):
+        return self._counts["served"]
+
+    @property
+    def misses(self):
+        return self._store.stats["misses"] + self._counts["reruns"]
+
+    @property
+    def stats(self):
+        """served hits, reruns (near-limit entries not served), stored / uncacheable puts, disk stats."""
+        return dict(self._store.stats, **self._counts, entries=len(self._store), bytes=self._store.total_bytes)